@@ -0,0 +1,444 @@
+from datetime import date
+from operator import itemgetter
+
+import numpy as np
+
+from pnl import SIDE_SIGNS, PNL_TOLERANCE, format_number
+from dates import parse_date
+from trade_store import ADDED, UPDATED, DELETED, trade_key
+from trade_view import parse_number, EMPTY_FIELDS
+
+GROUPINGS = {"Strategy": "Strategy_Name", "Instrument": "Instrument", "Month": "Month"}
+
+STAT_COLUMNS = [
+    "Trades", "P&L", "Margin", "Return_on_Margin", "Win_Rate",
+    "Avg_Win", "Avg_Loss", "Expectancy", "Max_Drawdown"]
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def format_stat(name, value):
+    if name == "Trades":
+        return str(value)
+    if value != value:
+        return "-"
+    if name in ("Return_on_Margin", "Win_Rate"):
+        return f"{value:.2f}%"
+    return f"{value:.2f}"
+
+
+# TradeArrays' float columns and the journal columns they hold.
+NUMBER_COLUMNS = {"pnl": "P&L", "margin": "Margin_Used", "holding": "Holding_Period", "lots": "Lots",
+                  "trade_date": "Trade_Date"}
+NAME_COLUMNS = ("Strategy_Name", "Instrument")
+
+
+def month_codes(trade_date):
+    # Months since 1970 of trade date ordinals; -1 where there is no date.
+    months = np.full(len(trade_date), -1, dtype=np.int64)
+    valid = ~np.isnan(trade_date)
+    days = (trade_date[valid] - EPOCH_ORDINAL).astype("datetime64[D]")
+    months[valid] = days.astype("datetime64[M]").astype(np.int64)
+    return months
+
+
+class TradeArrays:
+    # The journal as typed NumPy columns, one slot per trade. Built with
+    # whole-column parses, then patched a trade at a time from store
+    # notifications (see patch). Slots are not kept in row id order: a
+    # deleted trade's slot is given to the last one, so `rid` is carried
+    # along for ordering ties.
+    def __init__(self, store):
+        self.store = store
+        ids = list(store.rows)
+        rows = list(store.rows.values())
+        self.size = len(ids)
+        # Slot of each row id, made on the first patch.
+        self.position = None
+        rid = np.fromiter(ids, dtype=np.int64, count=len(ids))
+        self._columns = {"rid": rid}
+        for name, column in NUMBER_COLUMNS.items():
+            if column in store.dates:
+                # None (unparsed) becomes NaN when NumPy builds a float array.
+                self._columns[name] = np.array(list(map(store.dates[column].get, ids)), dtype=float)
+            else:
+                self._columns[name] = number_array(list(map(itemgetter(store.headers.index(column)), rows)))
+        self._columns["month"] = month_codes(self._columns["trade_date"])
+        # Name codes come from the store's name -> row ids indexes, a whole
+        # group at a time.
+        slot = np.zeros(int(rid.max()) + 1 if len(ids) else 0, dtype=np.int64)
+        slot[rid] = np.arange(len(ids))
+        self.names = {}
+        for column, index in zip(NAME_COLUMNS, (store.strategy_index, store.instrument_index)):
+            codes = self._columns[column] = np.empty(len(ids), dtype=np.int64)
+            self.names[column] = {}
+            for code, (name, rids) in enumerate(index.items()):
+                self.names[column][name] = code
+                codes[slot[np.fromiter(rids, dtype=np.int64, count=len(rids))]] = code
+
+    def __len__(self):
+        return self.size
+
+    def __getattr__(self, name):
+        # pnl, margin, holding, lots, trade_date, rid: the live slots.
+        try:
+            return self._columns[name][:self.size]
+        except KeyError:
+            raise AttributeError(name)
+
+    def groups(self, grouping):
+        # (code per slot, label per code) for a GROUPINGS column; -1 for
+        # no group.
+        if grouping == "Month":
+            months = self.month
+            valid = months >= 0
+            present, inverse = np.unique(months[valid], return_inverse=True)
+            codes = np.full(self.size, -1, dtype=np.int64)
+            codes[valid] = inverse
+            return codes, [str(m) for m in present.astype("datetime64[M]")]
+        return self._columns[grouping][:self.size], list(self.names[grouping])
+
+    def patch(self, event, rid, row):
+        if self.position is None:
+            self.position = dict(zip(self.rid.tolist(), range(self.size)))
+        if event == DELETED:
+            i = self.position.pop(rid)
+            self.size -= 1
+            if i != self.size:
+                for column in self._columns.values():
+                    column[i] = column[self.size]
+                self.position[int(self._columns["rid"][i])] = i
+            return
+        i = self.position.get(rid)
+        if i is None:
+            i = self.position[rid] = self.size
+            self.size += 1
+            if self.size > len(self._columns["rid"]):
+                for name, column in self._columns.items():
+                    grown = np.empty(max(2 * len(column), 16), dtype=column.dtype)
+                    grown[:len(column)] = column
+                    self._columns[name] = grown
+        columns, store = self._columns, self.store
+        columns["rid"][i] = rid
+        for name, column in NUMBER_COLUMNS.items():
+            if column in store.dates:
+                value = store.dates[column].get(rid)
+            else:
+                value = parse_number(row[store.headers.index(column)])
+            columns[name][i] = np.nan if value is None else value
+        columns["month"][i] = month_codes(columns["trade_date"][i:i + 1])[0]
+        for column in NAME_COLUMNS:
+            names = self.names[column]
+            columns[column][i] = names.setdefault(row[store.headers.index(column)], len(names))
+
+
+def group_drawdown(codes, dates, rids, pnl, ngroups):
+    # Max drawdown of each group's equity curve in trade-date order (row id
+    # order within a day), computed for all groups at once: rows are sorted
+    # by (group, date, row id), cumulative sums are re-based at each group
+    # start, and the running peak is reset per group by lifting every group
+    # above the previous one.
+    result = np.zeros(ngroups)
+    if not len(codes):
+        return result
+    order = np.lexsort((rids, dates, codes))
+    g = codes[order]
+    p = pnl[order]
+    starts = np.flatnonzero(np.r_[True, g[1:] != g[:-1]])
+    equity = np.cumsum(p)
+    equity -= np.repeat(equity[starts] - p[starts], np.diff(np.r_[starts, len(g)]))
+    span = equity.max() - min(equity.min(), 0.0) + 1.0
+    lift = g * span
+    peak = np.maximum(np.maximum.accumulate(equity + lift) - lift, 0.0)
+    result[g[starts]] = np.maximum.reduceat(peak - equity, starts)
+    return result
+
+
+def group_stats(arrays, grouping):
+    # One row of STAT_COLUMNS per group, all computed with bincount
+    # reductions over the code array rather than per-row Python loops.
+    # Groups left without trades by deletions are not reported.
+    codes, labels = arrays.groups(grouping) if grouping else (np.zeros(len(arrays), dtype=np.int64), ["All trades"])
+    ngroups = len(labels)
+    keep = (codes >= 0) & ~np.isnan(arrays.pnl)
+    codes_all = codes[codes >= 0]
+    codes, pnl = codes[keep], arrays.pnl[keep]
+    margin = np.nan_to_num(arrays.margin[keep])
+    trades = np.bincount(codes_all, minlength=ngroups)
+    counted = np.bincount(codes, minlength=ngroups)
+    total = np.bincount(codes, weights=pnl, minlength=ngroups)
+    margin_total = np.bincount(codes, weights=margin, minlength=ngroups)
+    wins = pnl > 0
+    losses = pnl < 0
+    win_count = np.bincount(codes[wins], minlength=ngroups)
+    loss_count = np.bincount(codes[losses], minlength=ngroups)
+    win_total = np.bincount(codes[wins], weights=pnl[wins], minlength=ngroups)
+    loss_total = np.bincount(codes[losses], weights=pnl[losses], minlength=ngroups)
+    drawdown = group_drawdown(codes, arrays.trade_date[keep], arrays.rid[keep], pnl, ngroups)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return_on_margin = np.where(margin_total > 0, total / margin_total * 100, np.nan)
+        win_rate = np.where(counted > 0, win_count / counted * 100, np.nan)
+        avg_win = np.where(win_count > 0, win_total / win_count, 0.0)
+        avg_loss = np.where(loss_count > 0, loss_total / loss_count, 0.0)
+        expectancy = np.where(counted > 0, total / counted, np.nan)
+    return [
+        (labels[i], dict(zip(STAT_COLUMNS, (
+            int(trades[i]), total[i], margin_total[i], return_on_margin[i], win_rate[i],
+            avg_win[i], avg_loss[i], expectancy[i], drawdown[i]))))
+        for i in range(ngroups) if trades[i] or not grouping]
+
+
+def equity_curve(arrays):
+    # Cumulative P&L in trade-date order, for plotting.
+    keep = ~np.isnan(arrays.pnl)
+    order = np.lexsort((arrays.rid[keep], arrays.trade_date[keep]))
+    return np.cumsum(arrays.pnl[keep][order])
+
+
+LEG_COLUMNS = ("trade", "strike", "call", "sign", "expiry", "lots", "entry", "exit")
+# The trade columns each leg's fields come from: the main leg, then the
+# hedge leg (which shares the trade's type, expiry and lots).
+MAIN_LEG = ("Strike_Price", "Type", "Buy/Sell", "Expiry_Date", "Lots", "Entry_Price", "Exit_Price")
+HEDGE_LEG = ("Hedged_Strike_Price", "Type", "Hedged_Buy/Sell", "Expiry_Date", "Lots",
+             "Hedged_Entry_Price", "Hedged_Exit_Price")
+OPTION_CALLS = {"ce": 1.0, "pe": 0.0}
+
+
+def text_columns(store, columns, ids):
+    # The given columns' text for the rows `ids`, one list per column.
+    # (Taking a column at a time out of the rows is several times faster
+    # than transposing them with zip.)
+    rows = list(map(store.rows.__getitem__, ids))
+    return {column: list(map(itemgetter(store.headers.index(column)), rows)) for column in columns}
+
+
+def number_array(texts):
+    # float() over the whole column at C speed; blanks and "-" become NaN,
+    # and text float() cannot read at all (thousands separators, notes)
+    # goes through parse_number field by field.
+    try:
+        return np.fromiter(map(float, texts), dtype=float, count=len(texts))
+    except ValueError:
+        pass
+    texts = [text if text not in EMPTY_FIELDS else "nan" for text in texts]
+    try:
+        return np.array(texts, dtype=float)
+    except ValueError:
+        return np.array([parse_number(text) for text in texts], dtype=float)
+
+
+def lookup_array(texts, table):
+    # Maps each distinct field once, e.g. "SELL" -> 1.0.
+    values = {text: table(text) for text in set(texts)}
+    return np.fromiter(map(values.__getitem__, texts), dtype=float, count=len(texts))
+
+
+def side_sign(text):
+    return SIDE_SIGNS.get(text.strip().casefold(), np.nan)
+
+
+def option_call(text):
+    return OPTION_CALLS.get(text.strip().casefold(), np.nan)
+
+
+def leg_arrays(trade, fields, expiry):
+    # LEG_COLUMNS arrays from leg text columns in MAIN_LEG order.
+    strike, option_type, side, _, lots, entry, exit_price = fields
+    return {"trade": np.asarray(trade, dtype=np.int64), "strike": number_array(strike),
+            "call": lookup_array(option_type, option_call), "sign": lookup_array(side, side_sign),
+            "expiry": expiry, "lots": number_array(lots), "entry": number_array(entry),
+            "exit": number_array(exit_price)}
+
+
+class LegTable:
+    # Every leg of every trade in parallel NumPy columns (LEG_COLUMNS), with
+    # `trade` holding the store row id each leg belongs to, so per-position
+    # figures are bincount reductions over flat arrays rather than loops
+    # over per-trade lists. Built on first use from the trades' main and
+    # hedge columns plus store.legs, then patched from store notifications:
+    # a changed trade's legs are marked free (trade -1) and its new ones
+    # appended, and free slots are packed away before the columns are read.
+    def __init__(self, store):
+        self.store = store
+        self._columns = None
+        self._size = 0
+        self._free = 0
+        store.subscribe(self._on_change)
+
+    def _on_change(self, event, rid, old_row, new_row):
+        if self._columns is None:
+            return
+        if event not in (ADDED, UPDATED, DELETED):
+            self._columns = None
+            return
+        if old_row is not None:
+            free = np.flatnonzero(self._columns["trade"][:self._size] == rid)
+            self._columns["trade"][free] = -1
+            self._free += len(free)
+        if new_row is not None:
+            self._append(self._build([rid]))
+
+    def _build(self, ids):
+        store = self.store
+        # (Expiry dates come parsed from store.dates, not from the text.)
+        text = text_columns(store, set(MAIN_LEG + HEDGE_LEG) - {"Expiry_Date"}, ids)
+        dates = store.dates.get("Expiry_Date")
+        expiry = np.array([dates.get(rid) for rid in ids] if dates is not None else [None] * len(ids), dtype=float)
+        main = leg_arrays(ids, [text.get(column) for column in MAIN_LEG], expiry)
+        hedged = np.flatnonzero(lookup_array(text["Hedged_Buy/Sell"],
+                                             lambda side: side.strip() not in EMPTY_FIELDS).astype(bool))
+        # The hedge leg's type, lots and expiry are the main leg's, so only
+        # its own columns are parsed.
+        hedge = {name: main[name][hedged] for name in ("trade", "call", "expiry", "lots")}
+        own = {column: np.array(text[column], dtype=object)[hedged]
+               for column in HEDGE_LEG if column not in MAIN_LEG}
+        hedge.update(strike=number_array(own["Hedged_Strike_Price"]),
+                     sign=lookup_array(own["Hedged_Buy/Sell"], side_sign),
+                     entry=number_array(own["Hedged_Entry_Price"]), exit=number_array(own["Hedged_Exit_Price"]))
+        parts = [main, hedge]
+        # For the whole store, walking store.legs is the shorter loop.
+        extra = [(rid, leg) for rid in (store.legs if len(ids) == len(store.rows) else ids)
+                 if rid in store.legs and rid in store.rows for leg in store.legs[rid]]
+        if extra:
+            fields = list(zip(*(leg for rid, leg in extra)))
+            parts.append(leg_arrays([rid for rid, leg in extra], fields,
+                                    np.array([parse_date(text) for text in fields[3]], dtype=float)))
+        return {name: np.concatenate([part[name] for part in parts]) for name in LEG_COLUMNS}
+
+    def _append(self, columns):
+        count = len(columns["trade"])
+        if self._size + count > len(self._columns["trade"]):
+            capacity = max(2 * len(self._columns["trade"]), self._size + count)
+            for name, column in self._columns.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self._size] = column[:self._size]
+                self._columns[name] = grown
+        for name, column in columns.items():
+            self._columns[name][self._size:self._size + count] = column
+        self._size += count
+
+    def columns(self):
+        # LEG_COLUMNS name -> array, one entry per live leg.
+        if self._columns is None:
+            self._columns = self._build(list(self.store.rows))
+            self._size = len(self._columns["trade"])
+            self._free = 0
+        elif self._free:
+            keep = self._columns["trade"][:self._size] >= 0
+            self._columns = {name: column[:self._size][keep] for name, column in self._columns.items()}
+            self._size = len(self._columns["trade"])
+            self._free = 0
+        return {name: column[:self._size] for name, column in self._columns.items()}
+
+
+def position_totals(legs, size):
+    # Per-position reductions over the legs table, indexed by row id (size
+    # is one past the largest): leg count, open legs, net premium collected
+    # and P&L per unit of lot size, NaN where a closed leg cannot be priced.
+    columns = legs.columns()
+    trade = columns["trade"]
+    quantity = columns["sign"] * columns["lots"]
+    leg_pnl = quantity * (columns["entry"] - columns["exit"])
+    unpriced = np.isnan(leg_pnl)
+    # (An empty bincount is int64 even with weights, hence the casts.)
+    pnl = np.bincount(trade, weights=np.where(unpriced, 0.0, leg_pnl), minlength=size).astype(float)
+    pnl[np.bincount(trade, weights=unpriced, minlength=size) > 0] = np.nan
+    return {
+        "legs": np.bincount(trade, minlength=size),
+        "open": np.bincount(trade, weights=np.isnan(columns["exit"]), minlength=size).astype(np.int64),
+        "premium": np.bincount(trade, weights=np.nan_to_num(quantity * columns["entry"]),
+                               minlength=size).astype(float),
+        "pnl": pnl,
+    }
+
+
+class PnlCheck:
+    # The whole journal's P&L worked out from the legs table: every leg's
+    # (entry - exit) signed by side and times its lots, summed per trade
+    # and times the instrument's lot size. Same formula as pnl.trade_pnl;
+    # trades it cannot price (open legs, unknown lot sizes, text that is
+    # not a number) get NaN. The entered P&L is read from `arrays` (a
+    # TradeArrays over the same store) when one is already built.
+    def __init__(self, legs, lot_sizes, arrays=None):
+        store = legs.store
+        self.ids = list(store.rows)
+        ids = np.asarray(self.ids, dtype=np.int64)
+        size = int(ids.max()) + 1 if len(ids) else 0
+        lot_size = np.full(size, np.nan)
+        for name, rids in store.instrument_index.items():
+            if name in lot_sizes:
+                lot_size[np.fromiter(rids, dtype=np.int64, count=len(rids))] = lot_sizes[name]
+        self.computed = (position_totals(legs, size)["pnl"] * lot_size)[ids]
+        if arrays is not None:
+            entered = np.full(size, np.nan)
+            entered[arrays.rid] = arrays.pnl
+            self.entered = entered[ids]
+        else:
+            self.entered = number_array(text_columns(store, ["P&L"], self.ids)["P&L"])
+        self.unknown_lot_sizes = sorted(name for name in store.instrument_index if name not in lot_sizes)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def disagreeing(self):
+        # Positions of rows whose entered P&L is off by more than
+        # PNL_TOLERANCE.
+        with np.errstate(invalid="ignore"):
+            return np.flatnonzero(np.abs(self.computed - self.entered) > PNL_TOLERANCE)
+
+    def missing(self):
+        # Rows with no P&L entered that can be priced.
+        return np.flatnonzero(np.isnan(self.entered) & ~np.isnan(self.computed))
+
+    def recompute(self, store, missing_only=False):
+        # Writes the computed P&L over every row that disagrees (or, with
+        # missing_only, only into rows that have none) in one batched store
+        # update. Returns the number of rows changed.
+        positions = self.missing()
+        if not missing_only:
+            positions = np.union1d(positions, self.disagreeing())
+        index = store.headers.index("P&L")
+        rows = store.rows
+        pairs = []
+        for position, value in zip(positions.tolist(), self.computed[positions].round(2).tolist()):
+            row = rows[self.ids[position]].copy()
+            row[index] = format_number(value)
+            pairs.append((trade_key(row), row))
+        if pairs:
+            store.update_many(pairs)
+        return len(pairs)
+
+
+def recompute_pnl(legs, lot_sizes, missing_only=False, arrays=None):
+    return PnlCheck(legs, lot_sizes, arrays).recompute(legs.store, missing_only)
+
+
+class Analytics:
+    # Keeps TradeArrays for the store, patched as trades change and rebuilt
+    # only after a load or another bulk change.
+    def __init__(self, store):
+        self.store = store
+        self._arrays = None
+        store.subscribe(self._on_change)
+
+    def _on_change(self, event, rid, old_row, new_row):
+        if self._arrays is None:
+            return
+        if event in (ADDED, UPDATED, DELETED):
+            self._arrays.patch(event, rid, new_row)
+        else:
+            self._arrays = None
+
+    def arrays(self):
+        if self._arrays is None:
+            self._arrays = TradeArrays(self.store)
+        return self._arrays
+
+    def close(self):
+        self.store.listeners.remove(self._on_change)
+
+    def stats(self, grouping=None):
+        return group_stats(self.arrays(), grouping)
+
+    def equity_curve(self):
+        return equity_curve(self.arrays())
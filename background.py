@@ -0,0 +1,113 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+POLL_MS = 40
+POLL_BUDGET = 0.03
+
+
+class BackgroundIO:
+    # Runs file work on a single worker thread so Tk callbacks never block.
+    # Because there is only one worker, writes run strictly in submission
+    # order and two quick saves can never interleave. Everything the worker
+    # wants done on the Tk side (callbacks, progress, store updates) goes
+    # through `call_soon`, which the Tk thread drains with after() polling.
+    def __init__(self, widget, on_busy=None, on_progress=None):
+        self.widget = widget
+        self.on_busy = on_busy
+        self.on_progress = on_progress
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trade-io")
+        self.callbacks = queue.Queue()
+        self.pending = 0
+        self.cancel_event = threading.Event()
+        self.cancellable = False
+        self.widget.after(POLL_MS, self._poll)
+
+    def submit(self, fn, *args, on_done=None, on_error=None, cancellable=False):
+        # For cancellable tasks `fn` is called with two extra keyword
+        # arguments: progress(fraction, text) and cancelled() -> bool.
+        self.pending += 1
+        if cancellable:
+            self.cancel_event.clear()
+            self.cancellable = True
+        self._report_busy()
+
+        def run():
+            try:
+                if cancellable:
+                    result = fn(*args, progress=self.progress, cancelled=self.cancel_event.is_set)
+                else:
+                    result = fn(*args)
+            except Exception as exc:
+                self.call_soon(self._finish, on_error, exc, cancellable)
+            else:
+                self.call_soon(self._finish, on_done, result, cancellable)
+
+        self.executor.submit(run)
+
+    def check(self, fn, on_done, on_error=None):
+        # A short task run on a timer, such as looking for changes to a
+        # file: it runs in order with the writes but is not counted in
+        # `pending`, so it does not show the window as busy.
+        def run():
+            try:
+                result = fn()
+            except Exception as exc:
+                if on_error is not None:
+                    self.call_soon(on_error, exc)
+            else:
+                self.call_soon(on_done, result)
+
+        self.executor.submit(run)
+
+    def write(self, fn, *args):
+        # Fire-and-forget write used by TradeStore.writer; failures are
+        # reported through the widget's on_write_error, if it has one.
+        self.submit(fn, *args, on_error=getattr(self.widget, "on_write_error", None))
+
+    def call_soon(self, fn, *args):
+        self.callbacks.put((fn, args))
+
+    def progress(self, fraction, text=""):
+        if self.on_progress is not None:
+            self.call_soon(self.on_progress, fraction, text)
+
+    def cancel(self):
+        self.cancel_event.set()
+
+    def _finish(self, callback, value, cancellable):
+        self.pending -= 1
+        if cancellable:
+            self.cancellable = False
+        self._report_busy()
+        if callback is not None:
+            callback(value)
+
+    def _report_busy(self):
+        if self.on_busy is not None:
+            self.on_busy(self.pending > 0, self.cancellable)
+
+    def _poll(self):
+        # Drain callbacks for at most POLL_BUDGET seconds per tick so a burst
+        # of work from the worker cannot freeze the window either.
+        deadline = time.perf_counter() + POLL_BUDGET
+        try:
+            while time.perf_counter() < deadline:
+                try:
+                    fn, args = self.callbacks.get_nowait()
+                except queue.Empty:
+                    break
+                fn(*args)
+        finally:
+            # Come straight back if work is still queued, after letting Tk
+            # process its own events. A failing callback must not stop the
+            # polling loop.
+            self.widget.after(1 if not self.callbacks.empty() else POLL_MS, self._poll)
+
+    def shutdown(self):
+        # Wait for queued writes, then run whatever they handed back.
+        self.executor.shutdown(wait=True)
+        while not self.callbacks.empty():
+            fn, args = self.callbacks.get_nowait()
+            fn(*args)
@@ -0,0 +1,371 @@
+import gc
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import statistics
+import tracemalloc
+
+from dates import format_date
+from journal import TradeJournal
+from metrics import METRICS, SUMMARY_COLUMNS, format_summary
+from journal_generator import LOT_SIZES, parse_size, write_journal
+from trade_store import TradeStore, TradeTotals
+from trade_view import TradeView
+from trade_api import journal_totals
+
+OPS = 1000
+TOLERANCE = 0.25
+# Slowdowns smaller than this are timer noise, whatever the ratio.
+NOISE_FLOOR = 0.005
+
+
+def load_store(path):
+    store = TradeStore(path)
+    store.load()
+    return store
+
+
+def sample_keys(store, count, seed=0):
+    keys = list(store.key_index)
+    return random.Random(seed).sample(keys, min(count, len(keys)))
+
+
+class Context:
+    # One generated journal plus the loaded store that read-only benchmarks
+    # share. Benchmarks that edit work on a fresh copy of the file each run.
+    def __init__(self, path, workdir):
+        self.path = path
+        self.workdir = workdir
+        self._store = None
+
+    @property
+    def store(self):
+        if self._store is None:
+            self._store = load_store(self.path)
+        return self._store
+
+    def working_copy(self):
+        target = os.path.join(self.workdir, "work" + os.path.splitext(self.path)[1])
+        for name in (target + "-wal", target + "-shm"):
+            if os.path.exists(name):
+                os.remove(name)
+        TradeJournal(target).discard()
+        shutil.copyfile(self.path, target)
+        return target
+
+    def close(self):
+        if self._store is not None:
+            self._store.close()
+
+
+def fresh_view(store, fn):
+    view = TradeView(store)
+    try:
+        return fn(view)
+    finally:
+        store.listeners.remove(view._on_change)
+
+
+# Each benchmark is setup(context) -> run, mirroring one GUI path. Only run()
+# is measured. The flag marks benchmarks that change the journal, which get
+# a new setup for every measurement.
+
+def bench_load(ctx):
+    # Startup: what the GUI's loader does before the table fills.
+    def run():
+        load_store(ctx.path).close()
+    return run
+
+
+def bench_stream_totals(ctx):
+    # `stats` from the CLI.
+    return lambda: journal_totals(ctx.path)
+
+
+def bench_lookup(ctx):
+    # search_trade / find_trade_for_update: key lookups.
+    store = ctx.store
+    keys = sample_keys(store, OPS * 10)
+
+    def run():
+        for key in keys:
+            store.get(key)
+    return run
+
+
+def bench_table_rows(ctx):
+    # load_trades_into_table with a sort and a filter set, cold caches.
+    filters = {"instrument": "NIFTY", "pl_sign": "loss"}
+    return lambda: fresh_view(ctx.store, lambda view: view.rows("P&L", True, filters))
+
+
+def bench_resort(ctx):
+    # Clicking another column header once the view is warm.
+    view = TradeView(ctx.store)
+    view.rows("Trade_Date")
+
+    def run():
+        view.rows("Trade_Date", True)
+        view.rows("Trade_Date")
+    return run
+
+
+SEARCHES = [
+    {"strategy": "iron", "prefix": True, "instrument": "NIFTY", "pl_min": "10000"},
+    {"instrument": "bank", "date_from": "2020-01-01", "date_to": "2020-12-31", "option_type": "PE"},
+    {"strike_min": "20000", "strike_max": "25000", "expiry_from": "2024-01-01", "pl_sign": "loss"},
+    {"strategy": "spread", "pl_max": "-50000"},
+]
+
+
+def bench_search(ctx):
+    # The Search tab with its indexes already built.
+    view = TradeView(ctx.store)
+    for filters in SEARCHES:
+        view.rows("P&L", True, filters)
+
+    def run():
+        for _ in range(25):
+            for filters in SEARCHES:
+                view.rows("P&L", True, filters)
+    return run
+
+
+def bench_totals(ctx):
+    # update_totals as a full recompute; the store keeps running totals, so
+    # this is the worst case after a reload.
+    store = ctx.store
+
+    def run():
+        totals = TradeTotals()
+        for row in store:
+            totals.add(row)
+    return run
+
+
+def bench_analytics(ctx):
+    from analytics import Analytics
+
+    def run():
+        analytics = Analytics(ctx.store)
+        try:
+            return analytics.stats("Strategy_Name")
+        finally:
+            analytics.close()
+    return run
+
+
+def bench_pnl_check(ctx):
+    # Check P&L: the whole journal priced from its legs, cold caches.
+    from analytics import LegTable, PnlCheck
+
+    def run():
+        legs = LegTable(ctx.store)
+        try:
+            return PnlCheck(legs, LOT_SIZES).disagreeing()
+        finally:
+            ctx.store.listeners.remove(legs._on_change)
+    return run
+
+
+def bench_risk(ctx):
+    # Mark-to-market of OPS * 5 reopened trades from a new price snapshot:
+    # the file is read and every distinct contract priced, cold memo.
+    import numpy as np
+    from analytics import LegTable
+    from journal_generator import INSTRUMENTS
+    from risk import PRICE_HEADERS, PriceSnapshot, Risk, bs_price, MIN_YEARS, DAYS_PER_YEAR, RISK_FREE_RATE
+    store = load_store(ctx.working_copy())
+    headers = store.headers
+    exits = [headers.index("Exit_Price"), headers.index("Hedged_Exit_Price")]
+    pairs = []
+    for key in sample_keys(store, OPS * 5):
+        row = list(store.get(key))
+        for index in exits:
+            if row[index] != "-":
+                row[index] = "-"
+        pairs.append((key, row))
+    store.update_many(pairs)
+    store.close()
+    legs = LegTable(store)
+    columns = legs.columns()
+    as_of = int(max(store.dates["Trade_Date"].values()))
+    spots = {name: spot for name, _, spot, _ in INSTRUMENTS}
+    rng = random.Random(0)
+    contracts = {}
+    open_legs = np.isnan(columns["exit"])
+    for rid, strike, expiry, call in zip(*(columns[name][open_legs].tolist()
+                                           for name in ("trade", "strike", "expiry", "call"))):
+        name = store.rows[rid][2]
+        years = max((expiry - as_of) / DAYS_PER_YEAR, MIN_YEARS)
+        contracts[(name, int(expiry), strike, call)] = float(
+            bs_price(spots[name], strike, years, RISK_FREE_RATE, rng.uniform(0.1, 0.4), call))
+    path = os.path.join(ctx.workdir, "prices.csv")
+    with open(path, "w") as file:
+        file.write(",".join(PRICE_HEADERS) + "\n")
+        file.writelines(f"{name},,,,{spot}\n" for name, spot in spots.items())
+        file.writelines(f"{name},{format_date(expiry)},{strike},{'CE' if call else 'PE'},{price:.2f}\n"
+                        for (name, expiry, strike, call), price in contracts.items())
+    return lambda: Risk(legs, PriceSnapshot(path), LOT_SIZES).by_position(as_of)
+
+
+def bench_update(ctx):
+    # save_updated_trade, each with its own durable journal write.
+    store = load_store(ctx.working_copy())
+    keys = sample_keys(store, OPS)
+
+    def run():
+        for key in keys:
+            row = list(store.get(key))
+            row[-1] = "0"
+            store.update(key, row)
+        store.close()
+    return run
+
+
+def bench_delete(ctx):
+    # delete_selected_trade.
+    store = load_store(ctx.working_copy())
+    keys = sample_keys(store, OPS)
+
+    def run():
+        for key in keys:
+            store.delete(key)
+        store.close()
+    return run
+
+
+BENCHMARKS = {
+    "load": (bench_load, False),
+    "stream_totals": (bench_stream_totals, False),
+    "lookup_x10k": (bench_lookup, False),
+    "table_rows": (bench_table_rows, False),
+    "resort": (bench_resort, False),
+    "search_x100": (bench_search, False),
+    "totals": (bench_totals, False),
+    "analytics": (bench_analytics, False),
+    "pnl_check": (bench_pnl_check, False),
+    "risk_x5k": (bench_risk, False),
+    "update_x1k": (bench_update, True),
+    "delete_x1k": (bench_delete, True),
+}
+
+
+def measure(ctx, setup, edits, repeat, memory):
+    times = []
+    run = None
+    for _ in range(repeat):
+        if run is None or edits:
+            run = setup(ctx)
+        gc.collect()
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    peak = None
+    if memory:
+        if edits:
+            run = setup(ctx)
+        gc.collect()
+        tracemalloc.start()
+        run()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {"median": statistics.median(times), "min": min(times), "peak": peak}
+
+
+def journal_path(data_dir, size, backend, seed):
+    path = os.path.join(data_dir, f"journal_{size}_{seed}.{'db' if backend == 'sqlite' else 'csv'}")
+    if not os.path.exists(path):
+        print(f"Generating {size} trades into {path}...", file=sys.stderr)
+        write_journal(path + ".tmp" if backend == "csv" else path, size, seed)
+        if backend == "csv":
+            os.replace(path + ".tmp", path)
+    return path
+
+
+def compare(results, baseline, tolerance):
+    # Returns the (size, name, old, new) entries more than `tolerance`
+    # slower than the baseline run.
+    slower = []
+    for size, benches in results.items():
+        for name, result in benches.items():
+            old = baseline.get(size, {}).get(name)
+            if old and result["median"] - old["median"] > max(old["median"] * tolerance, NOISE_FLOOR):
+                slower.append((size, name, old["median"], result["median"]))
+    return slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Time the journal's load, lookup, edit and totals paths.")
+    parser.add_argument("--sizes", default="1k,100k", help="comma separated journal sizes, e.g. 1k,100k,1M")
+    parser.add_argument("--backend", choices=["csv", "sqlite"], default="csv")
+    parser.add_argument("--only", help="comma separated benchmark names: " + ", ".join(BENCHMARKS))
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark (median is reported)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak-memory run")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=os.path.join(tempfile.gettempdir(), "option_tracker_bench"),
+                        help="where generated journals are cached")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file of an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE,
+                        help="allowed slowdown against the baseline (0.25 = 25%%)")
+    parser.add_argument("--metrics", action="store_true",
+                        help="record timings of the instrumented paths while benchmarking and print them")
+    parser.add_argument("--trace", help="also write the recorded timings to this file as a Chrome trace")
+    args = parser.parse_args(argv)
+    if args.metrics or args.trace:
+        METRICS.enable()
+
+    names = args.only.split(",") if args.only else list(BENCHMARKS)
+    try:
+        import numpy
+    except ImportError:
+        names = [name for name in names if name not in ("analytics", "pnl_check", "risk_x5k")]
+    os.makedirs(args.data_dir, exist_ok=True)
+    results = {}
+    print(f"{'size':>8}  {'benchmark':<14} {'median ms':>10} {'min ms':>10} {'peak MB':>9}")
+    for label in args.sizes.split(","):
+        size = parse_size(label)
+        ctx = Context(journal_path(args.data_dir, size, args.backend, args.seed),
+                      tempfile.mkdtemp(dir=args.data_dir))
+        results[label] = {}
+        try:
+            for name in names:
+                setup, edits = BENCHMARKS[name]
+                result = measure(ctx, setup, edits, args.repeat, not args.no_memory)
+                results[label][name] = result
+                peak = "-" if result["peak"] is None else f"{result['peak'] / 1e6:.1f}"
+                print(f"{label:>8}  {name:<14} {result['median'] * 1000:>10.1f} {result['min'] * 1000:>10.1f} {peak:>9}")
+        finally:
+            ctx.close()
+            shutil.rmtree(ctx.workdir, ignore_errors=True)
+    if METRICS.enabled:
+        print()
+        print(f"{'operation':<24}" + "".join(f"{name:>12}" for name in SUMMARY_COLUMNS))
+        for name, values in METRICS.summary():
+            print(f"{name:<24}" + "".join(f"{format_summary(k, v):>12}" for k, v in values.items()))
+    if args.trace:
+        METRICS.export_trace(args.trace)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"backend": args.backend, "results": results}, file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline["backend"] != args.backend:
+            parser.error(f"baseline was run on the {baseline['backend']} backend, not {args.backend}")
+        slower = compare(results, baseline["results"], args.tolerance)
+        for size, name, old, new in slower:
+            print(f"REGRESSION {size} {name}: {old * 1000:.1f} ms -> {new * 1000:.1f} ms")
+        if slower:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,49 @@
+from datetime import date
+from functools import lru_cache
+
+JOURNAL_FORMAT = "%d-%m-%Y"
+SPELLINGS = (JOURNAL_FORMAT, "%Y-%m-%d", "%d/%m/%Y", "%Y/%m/%d")
+
+
+# A journal repeats the same few thousand dates on every row, so parsed
+# values are cached.
+@lru_cache(maxsize=65536)
+def parse_date(text):
+    # Accepts DD-MM-YYYY (what the journal stores) and YYYY-MM-DD (what the
+    # form labels ask for), with - or / separators; returns a proleptic
+    # ordinal or None.
+    parts = text.strip().replace("/", "-").split("-")
+    if len(parts) != 3:
+        return None
+    if len(parts[0]) == 4:
+        parts.reverse()
+    try:
+        return date(int(parts[2]), int(parts[1]), int(parts[0])).toordinal()
+    except ValueError:
+        return None
+
+
+@lru_cache(maxsize=65536)
+def format_date(ordinal):
+    return date.fromordinal(ordinal).strftime(JOURNAL_FORMAT)
+
+
+def canonical_date(text):
+    # The journal's DD-MM-YYYY spelling of a date in either format; text
+    # that is not a date is returned unchanged.
+    ordinal = parse_date(text)
+    return text if ordinal is None else format_date(ordinal)
+
+
+def date_spellings(text):
+    # `text` and the other ways parse_date accepts of writing the same date,
+    # for finding a key whose date may be in any of them.
+    ordinal = parse_date(text)
+    if ordinal is None:
+        return [text]
+    day = date.fromordinal(ordinal)
+    return list(dict.fromkeys([text] + [day.strftime(f) for f in SPELLINGS]))
+
+
+def today():
+    return date.today().toordinal()
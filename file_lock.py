@@ -0,0 +1,94 @@
+import os
+import time
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+
+def _lock(file, blocking):
+    if fcntl is not None:
+        try:
+            fcntl.flock(file.fileno(), fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+        except BlockingIOError:
+            return False
+        return True
+    file.seek(0)
+    while True:
+        try:
+            msvcrt.locking(file.fileno(), msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+            time.sleep(0.05)
+
+
+def _unlock(file):
+    if fcntl is not None:
+        fcntl.flock(file.fileno(), fcntl.LOCK_UN)
+    else:
+        file.seek(0)
+        msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class FileLock:
+    # Advisory exclusive lock shared by every process writing one journal,
+    # taken on a separate lock file so the data files can still be replaced
+    # while it is held. Within a process it is also a plain threading.Lock:
+    # not reentrant, and it may be released by a different thread than the
+    # one that took it (a compaction takes it in the writer and releases it
+    # when its background thread is done).
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+
+    def acquire(self, blocking=True):
+        if not self._lock.acquire(blocking):
+            return False
+        try:
+            if self._file is None:
+                self._file = open(self.path, "a+b")
+            if _lock(self._file, blocking):
+                return True
+        except BaseException:
+            self._lock.release()
+            raise
+        self._lock.release()
+        return False
+
+    def release(self):
+        try:
+            _unlock(self._file)
+        finally:
+            self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def stat_id(stat):
+    # A replaced file gets a new inode, an appended one a new size.
+    return (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+
+
+def file_id(path):
+    # stat_id of the file now at `path`, or None.
+    try:
+        return stat_id(os.stat(path))
+    except OSError:
+        return None
@@ -0,0 +1,255 @@
+import io
+import os
+import csv
+
+from file_lock import FileLock, file_id
+from metrics import METRICS
+
+COMPACT_THRESHOLD = 4 * 1024 * 1024
+
+# Legs beyond the two kept in a trade's own columns (main and hedge), one
+# line each, linked to their trade by its key.
+LEG_FIELDS = ["Strike_Price", "Type", "Buy/Sell", "Expiry_Date", "Lots", "Entry_Price", "Exit_Price"]
+LEG_HEADERS = ["Strategy_Name", "Trade_Date", "Instrument"] + LEG_FIELDS
+
+INSERT = "I"
+UPDATE = "U"
+DELETE = "D"
+CLEAR = "C"
+LEGS = "L"
+
+
+def legs_path(file_name):
+    return os.path.splitext(file_name)[0] + ".legs.csv"
+
+
+def write_file(path, headers, rows):
+    tmp_name = path + ".tmp"
+    with METRICS.timed("csv_write") as span:
+        with open(tmp_name, "w", newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(headers)
+            writer.writerows(rows)
+            file.flush()
+            os.fsync(file.fileno())
+            span.bytes = file.tell()
+        os.replace(tmp_name, path)
+        # Rows streamed from a generator are not counted.
+        span.rows = len(rows) if isinstance(rows, list) else 0
+
+
+def line_end(file, size):
+    # Offset just past the last complete line of a binary file `size`
+    # bytes long.
+    if size:
+        file.seek(size - 1)
+        if file.read(1) == b"\n":
+            return size
+    position = size
+    while position > 0:
+        start = max(0, position - 4096)
+        file.seek(start)
+        chunk = file.read(position - start)
+        newline = chunk.rfind(b"\n")
+        if newline >= 0:
+            return start + newline + 1
+        position = start
+    return 0
+
+
+def parse_records(data):
+    return [record for record in csv.reader(io.TextIOWrapper(io.BytesIO(data), newline='')) if record]
+
+
+class TradeJournal:
+    # Append-only change log kept next to the CSV snapshot. Each line is one
+    # record: "I,<row>", "U,<old key>,<row>", "D,<key>", "C" or
+    # "L,<key>,<leg>,<leg>..." (a trade's extra legs, all of them). Replaying a
+    # record twice gives the same result as replaying it once, so a crash at
+    # any point during compaction can be recovered by replaying every log
+    # that is still on disk over whatever snapshot is there.
+    # Several processes may share the files. Every write is made holding
+    # `lock`, and each journal remembers what its store has applied: the
+    # snapshot it loaded or wrote (`snapshot_id`) and how far it has read
+    # into the current log (`log_id`, `offset`). changes() returns what
+    # other writers appended since; they count as read once applied() is
+    # called, which the store does when it has replayed them.
+    def __init__(self, file_name, threshold=COMPACT_THRESHOLD):
+        self.file_name = file_name
+        self.path = file_name + ".journal"
+        self.rotated_path = file_name + ".journal.compacting"
+        self.legs_path = legs_path(file_name)
+        self.threshold = threshold
+        self.size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        self.lock = FileLock(file_name + ".lock")
+        self.snapshot_id = None
+        self.log_id = None
+        self.offset = 0
+        self.unapplied = None
+
+    def _append(self, *records):
+        # All records go out in one write and one fsync. If nothing from
+        # another writer came in before them, they count as read. A last
+        # line without its newline was torn by a crash (with the lock held
+        # nobody else is writing), so it is cut off first rather than
+        # having the new records run on from it.
+        with self.lock, METRICS.timed("journal_append") as span:
+            with open(self.path, "a+b") as raw:
+                stat = os.fstat(raw.fileno())
+                start = line_end(raw, stat.st_size)
+                if start < stat.st_size:
+                    raw.truncate(start)
+                file = io.TextIOWrapper(raw, newline='')
+                writer = csv.writer(file)
+                writer.writerows(records)
+                file.flush()
+                os.fsync(raw.fileno())
+                self.size = raw.tell()
+                file.detach()
+            span.rows = len(records)
+            span.bytes = self.size - start
+            if start == self.offset and self.log_id in (None, (stat.st_dev, stat.st_ino)):
+                self.log_id = (stat.st_dev, stat.st_ino)
+                self.offset = self.size
+
+    def insert(self, row):
+        self._append([INSERT] + list(row))
+
+    def insert_many(self, rows):
+        self._append(*([INSERT] + list(row) for row in rows))
+
+    def update(self, key, row):
+        self._append([UPDATE] + list(key) + list(row))
+
+    def update_many(self, pairs):
+        self._append(*([UPDATE] + list(key) + list(row) for key, row in pairs))
+
+    def delete(self, key):
+        self._append([DELETE] + list(key))
+
+    def clear(self):
+        self._append([CLEAR])
+
+    def set_legs(self, key, legs):
+        self._append([LEGS] + list(key) + [field for leg in legs for field in leg])
+
+    def records(self):
+        # Every record on disk, for a load: the rotated log, then the
+        # current one, each up to its last complete line.
+        if os.path.exists(self.rotated_path):
+            with open(self.rotated_path, "rb") as file, METRICS.timed("journal_read") as span:
+                data = file.read()
+                end = data.rfind(b"\n") + 1
+                records = parse_records(data[:end])
+                span.rows = len(records)
+                span.bytes = end
+            yield from records
+        self.log_id = None
+        self.offset = 0
+        self.unapplied = None
+        records, read_to = self._tail()
+        if read_to is not None:
+            self.log_id, self.offset = read_to
+        yield from records
+
+    def _tail(self):
+        # Complete records in the log past `offset`, and the (log_id,
+        # offset) they end at; a line still being written is left for next
+        # time.
+        try:
+            file = open(self.path, "rb")
+        except FileNotFoundError:
+            return [], None
+        with file, METRICS.timed("journal_read") as span:
+            stat = os.fstat(file.fileno())
+            file.seek(self.offset)
+            data = file.read()
+            end = data.rfind(b"\n") + 1
+            self.size = stat.st_size
+            records = parse_records(data[:end])
+            span.rows = len(records)
+            span.bytes = end
+        return records, ((stat.st_dev, stat.st_ino), self.offset + end)
+
+    def changes(self):
+        # Records other writers appended since the load, the last write or
+        # the last call; None when the files were rewritten (a new snapshot,
+        # a rotated or removed log) and only a full reload will do. While
+        # another writer holds the lock, e.g. for a compaction, nothing is
+        # read and [] is returned.
+        # Until applied() is called the records are not counted as read:
+        # the log does not look caught up, so no snapshot is taken without
+        # them, and this store's own writes meanwhile are read back after
+        # them, putting its copy back in file order.
+        if not self.lock.acquire(blocking=False):
+            return []
+        try:
+            if file_id(self.file_name) != self.snapshot_id:
+                return None
+            log = file_id(self.path)
+            if log is None:
+                return [] if self.log_id is None else None
+            if self.log_id not in (None, log[:2]) or log[2] < self.offset:
+                return None
+            if log[2] == self.offset:
+                return []
+            records, self.unapplied = self._tail()
+            return records
+        finally:
+            self.lock.release()
+
+    def applied(self):
+        # The records changes() last returned have been replayed.
+        if self.unapplied is not None:
+            self.log_id, self.offset = self.unapplied
+            self.unapplied = None
+
+    def caught_up(self):
+        # Whether everything on disk has been applied here, so a snapshot
+        # of the store can replace the files. Call holding the lock. (A
+        # rotated log still on disk was read by the load; one rotated since
+        # would have taken the log being followed with it.)
+        if file_id(self.file_name) != self.snapshot_id:
+            return False
+        log = file_id(self.path)
+        if log is None:
+            return self.log_id is None
+        return log[2] == self.offset and self.log_id in (None, log[:2])
+
+    def needs_compaction(self):
+        return self.size >= self.threshold
+
+    def rotate(self):
+        # New records go to a fresh log while the rotated one is folded into
+        # the snapshot. A log left over from an interrupted compaction is
+        # kept as is; its records are already part of the rows being written.
+        if os.path.exists(self.path) and not os.path.exists(self.rotated_path):
+            os.replace(self.path, self.rotated_path)
+            self.log_id = None
+            self.offset = 0
+            self.unapplied = None
+        self.size = 0
+
+    def write_snapshot(self, headers, rows, legs=()):
+        # The legs file is only created once some trade has extra legs. Both
+        # files are replaced before the rotated log goes, so a crash leaves
+        # that log to be replayed over whichever versions are on disk.
+        legs = list(legs)
+        if legs or os.path.exists(self.legs_path):
+            write_file(self.legs_path, LEG_HEADERS, legs)
+        write_file(self.file_name, headers, rows)
+        self.snapshot_id = file_id(self.file_name)
+        if os.path.exists(self.rotated_path):
+            os.remove(self.rotated_path)
+
+    def discard(self):
+        for path in (self.rotated_path, self.path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.size = 0
+        self.log_id = None
+        self.offset = 0
+        self.unapplied = None
+
+    def close(self):
+        self.lock.close()
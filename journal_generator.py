@@ -0,0 +1,118 @@
+import random
+import argparse
+from datetime import date, timedelta
+
+from journal import TradeJournal
+from storage import HEADERS, SQLITE_EXTENSIONS, SqliteBackend
+
+SIZES = {"1k": 1000, "100k": 100000, "1M": 1000000}
+
+STRATEGIES = [
+    "SHORT STRANGLE", "SHORT STRADDLE", "IRON CONDOR", "IRON FLY", "BULL PUT SPREAD",
+    "BEAR CALL SPREAD", "NAKED PUT", "NAKED CALL", "RATIO SPREAD", "CALENDAR"]
+# (name, lot size, typical spot, strike step)
+INSTRUMENTS = [
+    ("NIFTY", 75, 24000, 50), ("BANKNIFTY", 30, 52000, 100), ("FINNIFTY", 65, 23500, 50),
+    ("MIDCPNIFTY", 120, 12500, 25), ("SENSEX", 20, 80000, 100), ("RELIANCE", 500, 1400, 10),
+    ("HDFCBANK", 550, 1900, 10), ("INFY", 400, 1600, 20), ("TCS", 175, 3500, 50),
+    ("ICICIBANK", 700, 1400, 10), ("SBIN", 750, 800, 5), ("TATAMOTORS", 800, 700, 5),
+    ("M&M", 350, 3000, 50), ("BAJFINANCE", 125, 9000, 100), ("LT", 150, 3600, 50),
+    ("AXISBANK", 625, 1150, 10)]
+LOT_SIZES = {name: lot_size for name, lot_size, _, _ in INSTRUMENTS}
+START = date(2015, 1, 1)
+DAYS = 4000
+EXPIRY_DAYS = 35
+DATE_TEXT = [(START + timedelta(days=d)).strftime("%d-%m-%Y") for d in range(DAYS + EXPIRY_DAYS)]
+
+
+def parse_size(text):
+    if text in SIZES:
+        return SIZES[text]
+    scale = {"k": 1000, "m": 1000000}.get(text[-1:].lower(), 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+def number(value):
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def trade_rows(count, seed=0):
+    # Yields `count` journal rows with unique (Strategy_Name, Trade_Date,
+    # Instrument) keys. Large journals get numbered strategy variants
+    # ("IRON CONDOR 3") so the key space stays a few times the row count.
+    rng = random.Random(seed)
+    variants = -(-4 * count // (len(STRATEGIES) * len(INSTRUMENTS) * DAYS))
+    seen = set()
+    while len(seen) < count:
+        strategy = rng.choice(STRATEGIES)
+        if variants > 1:
+            strategy = f"{strategy} {rng.randrange(variants)}"
+        traded = rng.randrange(DAYS)
+        name, lot_size, spot, step = rng.choice(INSTRUMENTS)
+        key = (strategy, traded, name)
+        if key in seen:
+            continue
+        seen.add(key)
+        yield trade_row(rng, strategy, traded, name, lot_size, spot, step)
+
+
+def trade_row(rng, strategy, traded, name, lot_size, spot, step):
+    option_type = "PE" if "PUT" in strategy else "CE" if "CALL" in strategy else rng.choice(("CE", "PE"))
+    side = "SELL" if rng.random() < 0.85 else "BUY"
+    expiry = traded + rng.randrange(1, EXPIRY_DAYS)
+    held = rng.randrange(0, expiry - traded + 1)
+    offset = rng.randrange(1, 12) * step
+    strike = spot * rng.uniform(0.8, 1.2) // step * step + (offset if option_type == "CE" else -offset)
+    lots = rng.randrange(1, 21)
+    entry = round(rng.uniform(5, spot * 0.02), 2)
+    # Most sold options decay; some blow up.
+    exit_price = round(max(0.05, entry * (rng.uniform(0, 0.9) if rng.random() < 0.7 else rng.uniform(1.1, 3))), 2)
+    sign = 1 if side == "SELL" else -1
+    pnl = sign * (entry - exit_price) * lots * lot_size
+    if rng.random() < 0.6:
+        hedge_side = "BUY" if side == "SELL" else "SELL"
+        hedge_strike = strike + (1 if option_type == "CE" else -1) * rng.randrange(2, 10) * step
+        hedge_entry = round(entry * rng.uniform(0.1, 0.5), 2)
+        hedge_exit = round(max(0.05, hedge_entry * rng.uniform(0, 2.5)), 2)
+        pnl += -sign * (hedge_entry - hedge_exit) * lots * lot_size
+        hedge = [number(hedge_strike), hedge_side, number(hedge_entry), number(hedge_exit)]
+        margin = lots * lot_size * spot * 0.03
+    else:
+        hedge = ["-", "-", "-", "-"]
+        margin = lots * lot_size * spot * 0.12
+    return [
+        strategy, DATE_TEXT[traded], name, number(strike), side,
+        DATE_TEXT[expiry], option_type, str(lots), number(entry), number(exit_price)
+    ] + hedge + [str(round(margin)), str(held), number(pnl)]
+
+
+def write_journal(path, count, seed=0):
+    # Writes a fresh journal snapshot (CSV, or SQLite by extension) in the
+    # initialize_file schema.
+    rows = trade_rows(count, seed)
+    if path.lower().endswith(SQLITE_EXTENSIONS):
+        backend = SqliteBackend(path)
+        backend.replace_all(HEADERS, rows)
+        backend.close()
+        return
+    # A change log or legs file left next to an old file would be replayed
+    # over this one; write_snapshot empties an existing legs file.
+    journal = TradeJournal(path)
+    with journal.lock:
+        journal.discard()
+        journal.write_snapshot(HEADERS, rows)
+    journal.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write a synthetic option selling journal.")
+    parser.add_argument("size", help="number of trades: 1k, 100k, 1M or any count")
+    parser.add_argument("output", help="CSV file or SQLite database to (over)write")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    write_journal(args.output, parse_size(args.size), args.seed)
+    print(f"Wrote {parse_size(args.size)} trades to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
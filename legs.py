@@ -0,0 +1,73 @@
+from dates import parse_date, canonical_date
+from journal import LEG_FIELDS
+from trade_view import parse_number, EMPTY_FIELDS
+
+SIDES = ("BUY", "SELL")
+OPTION_TYPES = ("CE", "PE")
+
+
+def main_leg(row, headers):
+    field = dict(zip(headers, row))
+    return [field["Strike_Price"], field["Type"], field["Buy/Sell"], field["Expiry_Date"],
+            field["Lots"], field["Entry_Price"], field["Exit_Price"]]
+
+
+def hedge_leg(row, headers):
+    # The hedge columns as a leg, or None for an unhedged trade. The hedge
+    # shares the trade's option type, expiry and lots.
+    field = dict(zip(headers, row))
+    if field["Hedged_Buy/Sell"].strip() in EMPTY_FIELDS:
+        return None
+    return [field["Hedged_Strike_Price"], field["Type"], field["Hedged_Buy/Sell"], field["Expiry_Date"],
+            field["Lots"], field["Hedged_Entry_Price"], field["Hedged_Exit_Price"]]
+
+
+def trade_legs(store, rid):
+    # Every leg of a trade: main, hedge (if any), then the extra legs.
+    row = store.rows[rid]
+    legs = [main_leg(row, store.headers)]
+    hedge = hedge_leg(row, store.headers)
+    if hedge is not None:
+        legs.append(hedge)
+    return legs + store.legs.get(rid, [])
+
+
+def checked_leg(values, expiry=""):
+    # `values` maps LEG_FIELDS to text; a blank expiry takes the trade's.
+    # Returns the leg in LEG_FIELDS order or raises ValueError.
+    leg = {field: (values.get(field) or "").strip() for field in LEG_FIELDS}
+    leg["Buy/Sell"] = leg["Buy/Sell"].upper()
+    leg["Type"] = leg["Type"].upper()
+    leg["Expiry_Date"] = leg["Expiry_Date"] or expiry
+    if leg["Buy/Sell"] not in SIDES:
+        raise ValueError(f"Leg side must be BUY or SELL, not '{leg['Buy/Sell']}'.")
+    if leg["Type"] not in OPTION_TYPES:
+        raise ValueError(f"Leg type must be CE or PE, not '{leg['Type']}'.")
+    for field in ("Strike_Price", "Lots", "Entry_Price"):
+        if parse_number(leg[field]) is None:
+            raise ValueError(f"Leg {field.replace('_', ' ')} '{leg[field]}' is not a number.")
+    if leg["Exit_Price"] in EMPTY_FIELDS:
+        leg["Exit_Price"] = "-"
+    elif parse_number(leg["Exit_Price"]) is None:
+        raise ValueError(f"Leg Exit Price '{leg['Exit_Price']}' is not a number (or '-' while open).")
+    if parse_date(leg["Expiry_Date"]) is None:
+        raise ValueError(f"Leg Expiry Date '{leg['Expiry_Date']}' is not a valid date.")
+    leg["Expiry_Date"] = canonical_date(leg["Expiry_Date"])
+    return [leg[field] for field in LEG_FIELDS]
+
+
+# Written form of one leg, for the CLI and the GUI's legs box:
+# "SIDE STRIKE TYPE LOTS ENTRY [EXIT [EXPIRY]]", e.g. "SELL 24500 CE 1 120 35".
+LEG_SPEC = ("Buy/Sell", "Strike_Price", "Type", "Lots", "Entry_Price", "Exit_Price", "Expiry_Date")
+
+
+def parse_leg(text, expiry=""):
+    parts = text.split()
+    if not 5 <= len(parts) <= len(LEG_SPEC):
+        raise ValueError(f"'{text}' is not a leg: expected SIDE STRIKE TYPE LOTS ENTRY [EXIT [EXPIRY]].")
+    return checked_leg(dict(zip(LEG_SPEC, parts)), expiry)
+
+
+def format_leg(leg):
+    field = dict(zip(LEG_FIELDS, leg))
+    return " ".join(field[name] for name in LEG_SPEC)
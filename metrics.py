@@ -0,0 +1,189 @@
+import os
+import json
+import math
+import time
+import threading
+from collections import deque
+
+# Latency histogram buckets: BUCKETS_PER_DOUBLING per power of two from one
+# microsecond, so a percentile read from them is within about 19% of the
+# true value. The last bucket takes everything past about an hour.
+BUCKETS_PER_DOUBLING = 4
+BUCKETS = 32 * BUCKETS_PER_DOUBLING
+# Timed operations kept for the trace, newest last.
+TRACE_EVENTS = 20000
+PERCENTILES = (50, 90, 99)
+SUMMARY_COLUMNS = ["Count", "Total_ms", "p50_ms", "p90_ms", "p99_ms", "Max_ms", "Rows", "Bytes"]
+
+
+def bucket(seconds):
+    micros = seconds * 1e6
+    if micros <= 1:
+        return 0
+    return min(int(math.log2(micros) * BUCKETS_PER_DOUBLING), BUCKETS - 1)
+
+
+def bucket_limit(index):
+    # Upper bound of a bucket, in seconds.
+    return 2 ** ((index + 1) / BUCKETS_PER_DOUBLING) / 1e6
+
+
+def format_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.0f} µs"
+    if seconds < 1:
+        return f"{seconds * 1e3:.1f} ms"
+    return f"{seconds:.2f} s"
+
+
+def format_bytes(size):
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+def format_summary(name, value):
+    if name in ("Count", "Rows", "Bytes"):
+        return str(value)
+    return f"{value:.2f}"
+
+
+class OperationStats:
+    # Everything recorded for one operation name.
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.buckets = [0] * BUCKETS
+
+    def add(self, seconds, rows, size):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.rows += rows
+        self.bytes += size
+        self.buckets[bucket(seconds)] += 1
+
+    def percentile(self, percent):
+        # Upper bound of the bucket holding the percentile, capped at the
+        # slowest call seen.
+        rank = math.ceil(self.count * percent / 100)
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return min(bucket_limit(index), self.max)
+        return self.max
+
+
+class Span:
+    # One timed operation; set `rows` and `bytes` on it before it ends.
+    __slots__ = ("metrics", "name", "rows", "bytes", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+        self.rows = 0
+        self.bytes = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.record(self.name, self.start, time.perf_counter() - self.start, self.rows, self.bytes)
+
+
+class NullSpan:
+    # What timed() hands out while metrics are off: entering, leaving and
+    # setting counts on it do nothing worth measuring.
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+NULL_SPAN = NullSpan()
+
+
+class Metrics:
+    # Latency histograms, rows processed and bytes read or written per
+    # operation, plus the last TRACE_EVENTS operations for a trace file.
+    # Off until enabled; while off, timed() only checks a flag. Spans may
+    # end on any thread.
+    def __init__(self, trace_events=TRACE_EVENTS):
+        self.enabled = False
+        self._lock = threading.Lock()
+        self._trace = deque(maxlen=trace_events)
+        self._origin = time.perf_counter()
+        self.operations = {}
+        self.last = None
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        with self._lock:
+            self.operations = {}
+            self._trace.clear()
+            self.last = None
+
+    def timed(self, name):
+        # with METRICS.timed("name") as span: ...; span.rows = ...
+        return Span(self, name) if self.enabled else NULL_SPAN
+
+    def record(self, name, start, seconds, rows=0, size=0):
+        with self._lock:
+            stats = self.operations.get(name)
+            if stats is None:
+                stats = self.operations[name] = OperationStats()
+            stats.add(seconds, rows, size)
+            self.last = (name, seconds, rows, size)
+            self._trace.append((name, start, seconds, threading.get_ident(), rows, size))
+
+    def format_last(self):
+        if self.last is None:
+            return ""
+        name, seconds, rows, size = self.last
+        text = f"{name}: {format_seconds(seconds)}"
+        if rows:
+            text += f", {rows} rows"
+        if size:
+            text += f", {format_bytes(size)}"
+        return text
+
+    def summary(self):
+        # One row of SUMMARY_COLUMNS per operation, by name; times in ms.
+        with self._lock:
+            operations = sorted(self.operations.items())
+            result = []
+            for name, stats in operations:
+                values = {"Count": stats.count, "Total_ms": stats.total * 1e3}
+                for percent in PERCENTILES:
+                    values[f"p{percent}_ms"] = stats.percentile(percent) * 1e3
+                values.update({"Max_ms": stats.max * 1e3, "Rows": stats.rows, "Bytes": stats.bytes})
+                result.append((name, values))
+        return result
+
+    def export_trace(self, path):
+        # Chrome trace event format (chrome://tracing, ui.perfetto.dev): one
+        # complete event per operation, with the summary alongside.
+        with self._lock:
+            trace = list(self._trace)
+        pid = os.getpid()
+        events = [{"name": name, "ph": "X", "ts": round((start - self._origin) * 1e6, 1),
+                   "dur": round(seconds * 1e6, 1), "pid": pid, "tid": tid,
+                   "args": {"rows": rows, "bytes": size}}
+                  for name, start, seconds, tid, rows, size in trace]
+        with open(path, "w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms",
+                       "otherData": {"summary": dict(self.summary())}}, file)
+        return len(events)
+
+
+METRICS = Metrics()
@@ -0,0 +1,113 @@
+import os
+import csv
+
+from journal import LEG_FIELDS
+from legs import main_leg, hedge_leg
+from storage import HEADERS
+from trade_view import parse_number
+
+LOT_SIZE_FILE = "lot_sizes.csv"
+LOT_SIZE_HEADERS = ["Instrument", "Lot_Size"]
+
+# P&L per unit is (entry - exit) for a sold leg and the reverse for a bought
+# one.
+SIDE_SIGNS = {"sell": 1.0, "buy": -1.0}
+# Entered P&L within this of the computed one agrees; P&L typed by hand is
+# often rounded to the rupee.
+PNL_TOLERANCE = 1.0
+
+
+def lot_sizes_path(journal):
+    return os.path.join(os.path.dirname(os.path.abspath(journal)), LOT_SIZE_FILE)
+
+
+def format_number(value, places=2):
+    return f"{value:.{places}f}".rstrip("0").rstrip(".")
+
+
+class LotSizes:
+    # Per-instrument lot sizes in a small CSV next to the journal. The table
+    # is read once and only read again when the file changes, so callers can
+    # ask for it on every trade.
+    def __init__(self, path):
+        self.path = path
+        self._table = {}
+        self._mtime = None
+
+    def table(self):
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self._table = self._read() if mtime is not None else {}
+            self._mtime = mtime
+        return self._table
+
+    def _read(self):
+        table = {}
+        with open(self.path, "r", newline='') as file:
+            for record in csv.reader(file):
+                if len(record) < 2 or record == LOT_SIZE_HEADERS:
+                    continue
+                size = parse_number(record[1])
+                if size and size > 0:
+                    table[record[0].strip()] = size
+        return table
+
+    def get(self, instrument):
+        return self.table().get(instrument)
+
+    def update(self, sizes):
+        # Merges `sizes` (instrument -> lot size) into the file.
+        table = dict(self.table())
+        table.update(sizes)
+        tmp_name = self.path + ".tmp"
+        with open(tmp_name, "w", newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(LOT_SIZE_HEADERS)
+            writer.writerows((name, format_number(size)) for name, size in sorted(table.items()))
+        os.replace(tmp_name, self.path)
+        return self.table()
+
+
+def leg_pnl(leg):
+    # P&L per lot size of one leg (LEG_FIELDS text), or None.
+    field = dict(zip(LEG_FIELDS, leg))
+    sign = SIDE_SIGNS.get(field["Buy/Sell"].strip().casefold())
+    lots = parse_number(field["Lots"])
+    entry = parse_number(field["Entry_Price"])
+    exit_price = parse_number(field["Exit_Price"])
+    if None in (sign, lots, entry, exit_price):
+        return None
+    return sign * (entry - exit_price) * lots
+
+
+def trade_pnl(row, lot_size, headers=HEADERS, extra_legs=()):
+    # P&L of one trade from all its legs, or None when it cannot be worked
+    # out (an open leg, an unknown lot size or a field that is not a
+    # number). analytics.PnlCheck is the same formula over the whole
+    # journal.
+    if not lot_size:
+        return None
+    legs = [main_leg(row, headers)]
+    hedge = hedge_leg(row, headers)
+    if hedge is not None:
+        legs.append(hedge)
+    total = 0.0
+    for leg in legs + list(extra_legs):
+        pnl = leg_pnl(leg)
+        if pnl is None:
+            return None
+        total += pnl
+    return total * lot_size
+
+
+def pnl_disagreement(row, lot_size, headers=HEADERS, extra_legs=()):
+    # The computed P&L when it differs from the one entered in `row` by
+    # more than PNL_TOLERANCE; otherwise None.
+    computed = trade_pnl(row, lot_size, headers, extra_legs)
+    entered = parse_number(dict(zip(headers, row)).get("P&L", ""))
+    if computed is None or entered is None or abs(computed - entered) <= PNL_TOLERANCE:
+        return None
+    return computed
@@ -0,0 +1,241 @@
+import os
+import csv
+import math
+
+import numpy as np
+
+from analytics import OPTION_CALLS
+from dates import parse_date, today
+from trade_view import parse_number
+
+PRICE_FILE = "prices.csv"
+# One line per quoted option, plus one per instrument with the strike, type
+# and expiry left blank for the underlying's price.
+PRICE_HEADERS = ["Instrument", "Expiry_Date", "Strike_Price", "Type", "Price"]
+RISK_FREE_RATE = 0.07
+DAYS_PER_YEAR = 365.0
+# Options are priced with at least this long to run, so the formulas stay
+# finite on expiry day.
+MIN_YEARS = 0.5 / DAYS_PER_YEAR
+IV_BOUNDS = (1e-4, 5.0)
+IV_ITERATIONS = 60
+# Per unit of the underlying: theta per calendar day, vega per volatility
+# point.
+CONTRACT_COLUMNS = ["IV", "Price", "Delta", "Gamma", "Theta", "Vega"]
+RISK_COLUMNS = ["Open_Legs", "Unpriced", "Unrealized_P&L", "Delta", "Gamma", "Theta", "Vega"]
+SQRT_2PI = math.sqrt(2 * math.pi)
+
+
+def prices_path(journal):
+    return os.path.join(os.path.dirname(os.path.abspath(journal)), PRICE_FILE)
+
+
+def format_risk(name, value):
+    if name in ("Open_Legs", "Unpriced"):
+        return str(value)
+    if value != value:
+        return "-"
+    return f"{value:.4f}" if name in ("Gamma", "IV") else f"{value:.2f}"
+
+
+class PriceSnapshot:
+    # Underlying and option prices from a local CSV (PRICE_HEADERS), read
+    # again only when the file changes. `version` changes with every read,
+    # so results worked out from one snapshot can be cached against it.
+    def __init__(self, path):
+        self.path = path
+        self.version = 0
+        self._mtime = None
+        self._spots = {}
+        self._options = {}
+
+    def tables(self):
+        # (instrument -> underlying price,
+        #  (instrument, expiry ordinal, strike, call) -> option price)
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            mtime = None
+        if mtime != self._mtime:
+            self._spots, self._options = self._read() if mtime is not None else ({}, {})
+            self._mtime = mtime
+            self.version += 1
+        return self._spots, self._options
+
+    def _read(self):
+        spots = {}
+        options = {}
+        with open(self.path, "r", newline='') as file:
+            for record in csv.reader(file):
+                if len(record) < len(PRICE_HEADERS) or record[:len(PRICE_HEADERS)] == PRICE_HEADERS:
+                    continue
+                instrument, expiry, strike, option_type, price = (field.strip() for field in record[:5])
+                price = parse_number(price)
+                if price is None or price < 0:
+                    continue
+                if not (strike or option_type):
+                    spots[instrument] = price
+                    continue
+                expiry = parse_date(expiry)
+                strike = parse_number(strike)
+                call = OPTION_CALLS.get(option_type.casefold())
+                if None not in (expiry, strike, call):
+                    options[(instrument, expiry, strike, call)] = price
+        return spots, options
+
+
+def norm_cdf(x):
+    # Abramowitz & Stegun 7.1.26 for erf (error below 1.5e-7); NumPy has
+    # no erf of its own.
+    z = np.abs(x) / math.sqrt(2)
+    t = 1 / (1 + 0.3275911 * z)
+    poly = t * (0.254829592 + t * (-0.284496736 + t * (1.421413741 + t * (-1.453152027 + t * 1.061405429))))
+    return 0.5 * (1 + np.sign(x) * (1 - poly * np.exp(-z * z)))
+
+
+def norm_pdf(x):
+    return np.exp(-0.5 * x * x) / SQRT_2PI
+
+
+def d1_d2(spot, strike, years, rate, vol):
+    root = vol * np.sqrt(years)
+    d1 = (np.log(spot / strike) + (rate + 0.5 * vol * vol) * years) / root
+    return d1, d1 - root
+
+
+def bs_price(spot, strike, years, rate, vol, call):
+    # European Black-Scholes, elementwise; `call` is 1.0 for CE, 0.0 for PE.
+    d1, d2 = d1_d2(spot, strike, years, rate, vol)
+    discounted = strike * np.exp(-rate * years)
+    call_price = spot * norm_cdf(d1) - discounted * norm_cdf(d2)
+    return np.where(call > 0, call_price, call_price - spot + discounted)
+
+
+def implied_vol(price, spot, strike, years, rate, call):
+    # Newton's method on every contract at once, kept inside a bisection
+    # bracket so a step that overshoots falls back to halving it. Prices
+    # outside the no-arbitrage bounds get NaN.
+    discounted = strike * np.exp(-rate * years)
+    low_bound = np.where(call > 0, np.maximum(spot - discounted, 0.0), np.maximum(discounted - spot, 0.0))
+    high_bound = np.where(call > 0, spot, discounted)
+    valid = (price > low_bound) & (price < high_bound)
+    low = np.full(len(price), IV_BOUNDS[0])
+    high = np.full(len(price), IV_BOUNDS[1])
+    vol = np.full(len(price), 0.3)
+    active = valid.copy()
+    with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+        for _ in range(IV_ITERATIONS):
+            if not active.any():
+                break
+            error = bs_price(spot, strike, years, rate, vol, call) - price
+            active &= np.abs(error) > 1e-6 * np.maximum(price, 1.0)
+            high = np.where(active & (error > 0), vol, high)
+            low = np.where(active & (error < 0), vol, low)
+            d1 = d1_d2(spot, strike, years, rate, vol)[0]
+            step = vol - error / (spot * norm_pdf(d1) * np.sqrt(years))
+            step = np.where((step > low) & (step < high), step, 0.5 * (low + high))
+            vol = np.where(active, step, vol)
+    return np.where(valid, vol, np.nan)
+
+
+def contract_risk(price, spot, strike, years, rate, call):
+    # CONTRACT_COLUMNS for arrays of contracts, one row each.
+    vol = implied_vol(price, spot, strike, years, rate, call)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        d1, d2 = d1_d2(spot, strike, years, rate, vol)
+        density = norm_pdf(d1)
+        root = np.sqrt(years)
+        carry = rate * strike * np.exp(-rate * years)
+        delta = np.where(call > 0, norm_cdf(d1), norm_cdf(d1) - 1)
+        gamma = density / (spot * vol * root)
+        decay = -spot * density * vol / (2 * root)
+        theta = np.where(call > 0, decay - carry * norm_cdf(d2), decay + carry * norm_cdf(-d2)) / DAYS_PER_YEAR
+        vega = spot * density * root / 100
+    return np.column_stack([vol, price, delta, gamma, theta, vega])
+
+
+class Risk:
+    # Mark-to-market and Greeks of every open leg (an exit of "-" or blank)
+    # in the legs table, priced from a PriceSnapshot. Legs are reduced to
+    # their distinct contracts, (instrument, strike, expiry, type); each
+    # contract's CONTRACT_COLUMNS are worked out once per snapshot, as of
+    # date and rate, and kept until one of those changes, so a refresh only
+    # prices contracts that are new to the book. `lot_sizes` is a LotSizes
+    # or a dict.
+    def __init__(self, legs, snapshot, lot_sizes, rate=RISK_FREE_RATE):
+        self.legs = legs
+        self.snapshot = snapshot
+        self.lot_sizes = lot_sizes
+        self.rate = rate
+        self._memo = {}
+        self._memo_version = None
+
+    def contracts(self, keys, as_of):
+        # CONTRACT_COLUMNS for each (instrument, strike, expiry, call) key.
+        spots, options = self.snapshot.tables()
+        version = (self.snapshot.version, as_of, self.rate)
+        if version != self._memo_version:
+            self._memo = {}
+            self._memo_version = version
+        memo = self._memo
+        new = [key for key in dict.fromkeys(keys) if key not in memo]
+        if new:
+            price = np.array([options.get((name, expiry, strike, call), np.nan)
+                              for name, strike, expiry, call in new], dtype=float)
+            spot = np.array([spots.get(key[0], np.nan) for key in new], dtype=float)
+            strike, expiry, call = (np.array(column, dtype=float) for column in list(zip(*new))[1:])
+            years = np.maximum((expiry - as_of) / DAYS_PER_YEAR, MIN_YEARS)
+            memo.update(zip(new, contract_risk(price, spot, strike, years, self.rate, call)))
+        return np.array([memo[key] for key in keys], dtype=float).reshape(len(keys), len(CONTRACT_COLUMNS))
+
+    def open_legs(self, as_of=None):
+        # Per open leg: its row id and column index in the legs table, the
+        # contract's CONTRACT_COLUMNS and the position's unrealized P&L and
+        # Greeks (signed: long positive, short negative; times lots and lot
+        # size). Legs that cannot be priced have NaN.
+        as_of = today() if as_of is None else as_of
+        store = self.legs.store
+        columns = self.legs.columns()
+        positions = np.flatnonzero(np.isnan(columns["exit"]))
+        trade = columns["trade"][positions]
+        size = int(trade.max()) + 1 if len(trade) else 0
+        names = list(store.instrument_index)
+        codes = np.full(size, -1, dtype=np.int64)
+        lot_size = np.full(size, np.nan)
+        for code, name in enumerate(names):
+            rids = np.fromiter(store.instrument_index[name], dtype=np.int64)
+            rids = rids[rids < size]
+            codes[rids] = code
+            lot_size[rids] = self.lot_sizes.get(name) or np.nan
+        strike, expiry, call = (columns[name][positions] for name in ("strike", "expiry", "call"))
+        known = ~(np.isnan(strike) | np.isnan(expiry) | np.isnan(call))
+        risk = np.full((len(positions), len(CONTRACT_COLUMNS)), np.nan)
+        keys = list(zip((names[code] for code in codes[trade[known]].tolist()), strike[known].tolist(),
+                        expiry[known].astype(np.int64).tolist(), call[known].tolist()))
+        risk[known] = self.contracts(keys, as_of)
+        sign = columns["sign"][positions]
+        units = columns["lots"][positions] * lot_size[trade]
+        result = {"trade": trade, "position": positions}
+        result.update(zip(CONTRACT_COLUMNS, risk.T))
+        result["Unrealized_P&L"] = sign * (columns["entry"][positions] - result["Price"]) * units
+        for name in ("Delta", "Gamma", "Theta", "Vega"):
+            result[name] = -sign * units * result[name]
+        return result
+
+    def by_position(self, as_of=None):
+        # One row of RISK_COLUMNS per (strategy, instrument) with open legs,
+        # summed with bincount over group codes. Unpriced legs (no price in
+        # the snapshot or no lot size) are counted and left out of the sums,
+        # as are the Greeks of legs with no implied volatility.
+        legs = self.open_legs(as_of)
+        rows = self.legs.store.rows
+        groups = {}
+        codes = np.fromiter((groups.setdefault((rows[rid][0], rows[rid][2]), len(groups))
+                             for rid in legs["trade"].tolist()), dtype=np.int64, count=len(legs["trade"]))
+        ngroups = len(groups)
+        values = {"Open_Legs": np.bincount(codes, minlength=ngroups),
+                  "Unpriced": np.bincount(codes[np.isnan(legs["Unrealized_P&L"])], minlength=ngroups)}
+        for name in RISK_COLUMNS[2:]:
+            values[name] = np.bincount(codes, weights=np.nan_to_num(legs[name]), minlength=ngroups).astype(float)
+        return [(label, {name: values[name][i].item() for name in RISK_COLUMNS})
+                for label, i in sorted(groups.items())]
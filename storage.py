@@ -0,0 +1,467 @@
+import os
+import csv
+import json
+import sqlite3
+import threading
+from datetime import date
+from itertools import groupby
+
+from file_lock import stat_id
+from journal import TradeJournal, LEG_FIELDS, LEG_HEADERS
+from metrics import METRICS
+
+FILE_NAME = "option_selling_tracker.csv"
+
+HEADERS = [
+    "Strategy_Name", "Trade_Date", "Instrument", "Strike_Price", "Buy/Sell",
+    "Expiry_Date", "Type", "Lots", "Entry_Price", "Exit_Price",
+    "Hedged_Strike_Price", "Hedged_Buy/Sell", "Hedged_Entry_Price", "Hedged_Exit_Price",
+    "Margin_Used", "Holding_Period", "P&L"]
+
+SQLITE_EXTENSIONS = (".db", ".sqlite", ".sqlite3")
+# PRAGMA user_version of a SQLite journal once its migrations have run.
+SCHEMA_VERSION = 1
+PROGRESS_EVERY = 10000
+# Update batches of this many rows would fill the CSV change log well past
+# journal.COMPACT_THRESHOLD on their own.
+REWRITE_BATCH = 20000
+
+
+def initialize_file(file_name=FILE_NAME):
+    if not os.path.exists(file_name):
+        with open(file_name, "w", newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(HEADERS)
+
+
+def open_backend(path=FILE_NAME):
+    if path.lower().endswith(SQLITE_EXTENSIONS):
+        return SqliteBackend(path)
+    return CsvBackend(path)
+
+
+class CsvBackend:
+    # Today's layout: a CSV snapshot plus an append-only TradeJournal that is
+    # compacted back into the snapshot on a background thread.
+    def __init__(self, file_name=FILE_NAME, journal=None):
+        self.file_name = file_name
+        self.journal = journal or TradeJournal(file_name)
+        self._compactor = None
+
+    def load(self, progress=None):
+        # Returns (headers, snapshot rows, journal records to replay). Rows
+        # are streamed from the file as they are consumed; progress, if
+        # given, is called with the fraction of the snapshot read so far.
+        with self.journal.lock:
+            initialize_file(self.file_name)
+        file = open(self.file_name, "r", newline='')
+        # What changes() compares against: if the file is replaced while
+        # this one is read, the next look for changes asks for a reload.
+        self.journal.snapshot_id = stat_id(os.fstat(file.fileno()))
+        reader = csv.reader(file)
+        headers = next(reader, None) or list(HEADERS)
+        return headers, self._stream(file, reader, len(headers), progress), self.journal.records()
+
+    def _stream(self, file, reader, width, progress):
+        size = os.path.getsize(self.file_name) or 1
+        # Timed from the first row taken to the last (or to a cancelled
+        # load closing the stream), so the time includes whatever the
+        # consumer does with each chunk.
+        count = 0
+        with file, METRICS.timed("csv_read") as span:
+            try:
+                for count, row in enumerate(reader, 1):
+                    if len(row) == width:
+                        yield row
+                    if progress is not None and count % PROGRESS_EVERY == 0:
+                        progress(min(file.buffer.tell() / size, 1.0))
+            finally:
+                span.rows = count
+                span.bytes = file.buffer.tell()
+
+    def load_legs(self):
+        # The extra legs snapshot as (key + leg) rows; journal records for
+        # legs come with the others from load().
+        if not os.path.exists(self.journal.legs_path):
+            return
+        with open(self.journal.legs_path, "r", newline='') as file, METRICS.timed("csv_read_legs") as span:
+            for row in csv.reader(file):
+                if len(row) == len(LEG_HEADERS) and row != LEG_HEADERS:
+                    span.rows += 1
+                    yield row
+            span.bytes = file.buffer.tell()
+
+    def finish_load(self, headers, rows, legs=()):
+        with self.journal.lock:
+            if os.path.exists(self.journal.rotated_path) and self.journal.caught_up():
+                # A previous compaction was interrupted; finish it now.
+                self.journal.write_snapshot(headers, rows, legs)
+                self.journal.discard()
+
+    def insert(self, row):
+        self.journal.insert(row)
+
+    def insert_many(self, rows):
+        self.journal.insert_many(rows)
+
+    def update(self, key, row):
+        self.journal.update(key, row)
+
+    def update_many(self, pairs, snapshot=None):
+        # A batch big enough to push the log into compaction is written as
+        # a fresh snapshot instead of being logged and then compacted.
+        if not (snapshot is not None and len(pairs) >= REWRITE_BATCH and self.rewrite(snapshot)):
+            self.journal.update_many(pairs)
+
+    def rewrite(self, snapshot):
+        # Compaction done in the foreground: the log is rotated before the
+        # new snapshot replaces the file, so a crash in between replays the
+        # old log over the old snapshot. Nothing is written, and False is
+        # returned, while another writer's changes are still to be applied
+        # here; the snapshot would not have them.
+        with self.journal.lock:
+            if not self.journal.caught_up():
+                return False
+            self.journal.rotate()
+            self.journal.write_snapshot(*snapshot())
+        return True
+
+    def delete(self, key):
+        self.journal.delete(key)
+
+    def clear(self):
+        self.journal.clear()
+
+    def set_legs(self, key, legs):
+        self.journal.set_legs(key, legs)
+
+    def replace_all(self, headers, rows, legs=()):
+        with self.journal.lock:
+            self.journal.write_snapshot(headers, rows, legs)
+            self.journal.discard()
+
+    def changes(self):
+        return self.journal.changes()
+
+    def changes_applied(self):
+        self.journal.applied()
+
+    def needs_compaction(self):
+        return self.journal.needs_compaction()
+
+    def compact(self, snapshot):
+        # `snapshot` returns (headers, rows, legs) and is called with the
+        # store's lock held, so no edit can slip between it and the log
+        # rotation. The file lock is held from the rotation until the
+        # background thread has the new snapshot in place. If another
+        # writer holds it, or has changes not applied here yet, compaction
+        # is left to a later write.
+        if self._compactor is not None and self._compactor.is_alive():
+            return self._compactor
+        lock = self.journal.lock
+        if not lock.acquire(blocking=False):
+            return None
+        try:
+            if not self.journal.caught_up():
+                lock.release()
+                return None
+            self.journal.rotate()
+            args = snapshot()
+        except BaseException:
+            lock.release()
+            raise
+        self._compactor = threading.Thread(target=self._write_compacted, args=args, daemon=True)
+        self._compactor.start()
+        return self._compactor
+
+    def _write_compacted(self, *args):
+        try:
+            self.journal.write_snapshot(*args)
+        finally:
+            self.journal.lock.release()
+
+    def close(self):
+        if self._compactor is not None:
+            self._compactor.join()
+        self.journal.close()
+
+
+def sql_name(header):
+    return header.lower().replace("/", "_").replace("&", "n")
+
+
+def iso_date(text):
+    # DD-MM-YYYY is stored as YYYY-MM-DD so dates sort and range-query as
+    # text; anything else is kept as written.
+    parts = text.split("-")
+    if len(parts) == 3 and len(parts[0]) == 2 and len(parts[2]) == 4:
+        try:
+            return date(int(parts[2]), int(parts[1]), int(parts[0])).isoformat()
+        except ValueError:
+            pass
+    return text
+
+
+def journal_date(value):
+    parts = value.split("-")
+    if len(parts) == 3 and len(parts[0]) == 4:
+        return f"{parts[2]}-{parts[1]}-{parts[0]}"
+    return value
+
+
+def to_real(text):
+    try:
+        value = float(text)
+    except ValueError:
+        return None
+    # SQLite stores NaN as NULL, so keep it as text instead.
+    return value if value == value else None
+
+
+def from_real(value):
+    if value is None:
+        return "-"
+    if isinstance(value, str):
+        return value
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+SQL_TYPES = {
+    "Strategy_Name": "TEXT NOT NULL", "Trade_Date": "TEXT NOT NULL", "Instrument": "TEXT NOT NULL",
+    "Strike_Price": "REAL", "Buy/Sell": "TEXT", "Expiry_Date": "TEXT", "Type": "TEXT",
+    "Lots": "REAL", "Entry_Price": "REAL", "Exit_Price": "REAL",
+    "Hedged_Strike_Price": "REAL", "Hedged_Buy/Sell": "TEXT",
+    "Hedged_Entry_Price": "REAL", "Hedged_Exit_Price": "REAL",
+    "Margin_Used": "REAL", "Holding_Period": "REAL", "P&L": "REAL"}
+DATE_HEADERS = {"Trade_Date", "Expiry_Date"}
+# A trade's key in SQL. trade_date holds both DD-MM-YYYY and legacy
+# YYYY-MM-DD spellings of a date as ISO text, and the store keeps those
+# apart, so the key adds the spelling kept in raw_fields ('' when none is).
+TRADE_DATE_TEXT = "coalesce(json_extract(raw_fields, '$.Trade_Date'), '')"
+KEY_COLUMNS = f"strategy_name, trade_date, instrument, {TRADE_DATE_TEXT}"
+KEY_MATCH = f"strategy_name = ? AND trade_date = ? AND instrument = ? AND {TRADE_DATE_TEXT} = ?"
+
+
+def to_sql(header, text):
+    if header in DATE_HEADERS:
+        return iso_date(text)
+    if SQL_TYPES[header] == "REAL":
+        return to_real(text)
+    return text
+
+
+def from_sql(header, value):
+    if header in DATE_HEADERS:
+        return journal_date(value)
+    if SQL_TYPES[header] == "REAL":
+        return from_real(value)
+    return value
+
+
+class SqliteBackend:
+    # Trades in a SQLite database with typed columns. Numbers are stored as
+    # REAL and dates as ISO text; any field whose typed value would not
+    # round-trip to the exact text that was entered ("-", "9.20", a
+    # YYYY-MM-DD date) keeps its original text in `raw_fields`, so CSV
+    # import and export are loss-free.
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self._data_version = None
+        self.columns = [sql_name(h) for h in HEADERS]
+        columns = ", ".join(f"{sql_name(h)} {SQL_TYPES[h]}" for h in HEADERS)
+        with self.conn:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS trades (id INTEGER PRIMARY KEY, {columns}, raw_fields TEXT)")
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                # Version 1 replaced the key index of older databases, which
+                # took both spellings of a date for the same key.
+                self.conn.execute("DROP INDEX IF EXISTS trades_key")
+                self.conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self.conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS trades_trade_key ON trades ({KEY_COLUMNS})")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS trades_trade_date ON trades (trade_date)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS trades_instrument ON trades (instrument)")
+            # Extra legs keep their text as entered, like raw_fields.
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS legs (id INTEGER PRIMARY KEY, trade_id INTEGER NOT NULL, "
+                              f"leg INTEGER NOT NULL, {', '.join(sql_name(f) + ' TEXT' for f in LEG_FIELDS)})")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS legs_trade ON legs (trade_id, leg)")
+        self._insert_sql = (f"INSERT INTO trades ({', '.join(self.columns)}, raw_fields) "
+                            f"VALUES ({', '.join('?' * (len(self.columns) + 1))})")
+        self._update_sql = (f"UPDATE trades SET {', '.join(c + ' = ?' for c in self.columns)}, raw_fields = ? "
+                            f"WHERE {KEY_MATCH}")
+        self._select_sql = f"SELECT {', '.join(self.columns)}, raw_fields FROM trades"
+        self._trade_id_sql = f"SELECT id FROM trades WHERE {KEY_MATCH}"
+        self._insert_leg_sql = (f"INSERT INTO legs (trade_id, leg, {', '.join(sql_name(f) for f in LEG_FIELDS)}) "
+                                f"SELECT id, {', '.join('?' * (len(LEG_FIELDS) + 1))} FROM trades "
+                                f"WHERE {KEY_MATCH}")
+
+    def _encode(self, row):
+        values = []
+        raw = {}
+        for header, text in zip(HEADERS, row):
+            value = to_sql(header, text)
+            if from_sql(header, value) != text:
+                raw[header] = text
+            values.append(value)
+        values.append(json.dumps(raw) if raw else None)
+        return values
+
+    def _decode(self, record):
+        raw = json.loads(record[-1]) if record[-1] else {}
+        return [raw.get(header, from_sql(header, value)) for header, value in zip(HEADERS, record)]
+
+    def _key(self, key):
+        # Parameters for KEY_MATCH.
+        trade_date = to_sql("Trade_Date", key[1])
+        return (key[0], trade_date, key[2], key[1] if from_sql("Trade_Date", trade_date) != key[1] else "")
+
+    def load(self, progress=None):
+        self._data_version = self._version()
+        return list(HEADERS), self._stream(progress), ()
+
+    def _version(self):
+        # Changes whenever another connection commits, never for this one.
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _stream(self, progress):
+        total = self.conn.execute("SELECT COUNT(*) FROM trades").fetchone()[0] or 1
+        for count, record in enumerate(self.conn.execute(self._select_sql + " ORDER BY id"), 1):
+            yield self._decode(record)
+            if progress is not None and count % PROGRESS_EVERY == 0:
+                progress(count / total)
+
+    def load_legs(self):
+        # Keys are rebuilt from the trade's own text, so they match the
+        # store's keys exactly.
+        sql = (f"SELECT trades.strategy_name, trades.trade_date, trades.instrument, trades.raw_fields, "
+               f"{', '.join('legs.' + sql_name(f) for f in LEG_FIELDS)} "
+               "FROM legs JOIN trades ON trades.id = legs.trade_id ORDER BY legs.trade_id, legs.leg")
+        for record in self.conn.execute(sql):
+            raw = json.loads(record[3]) if record[3] else {}
+            key = [raw.get(header, from_sql(header, value))
+                   for header, value in zip(("Strategy_Name", "Trade_Date", "Instrument"), record[:3])]
+            yield key + list(record[4:])
+
+    def _insert_legs(self, key, legs):
+        self.conn.executemany(self._insert_leg_sql,
+                              ([i] + list(leg) + list(self._key(key)) for i, leg in enumerate(legs)))
+
+    def finish_load(self, headers, rows, legs=()):
+        pass
+
+    def insert(self, row):
+        try:
+            with self.conn:
+                self.conn.execute(self._insert_sql, self._encode(row))
+        except sqlite3.IntegrityError:
+            raise KeyError(tuple(row[:3]))
+
+    def insert_many(self, rows):
+        # One transaction for the whole batch; a duplicate rolls it all back.
+        try:
+            with self.conn:
+                self.conn.executemany(self._insert_sql, (self._encode(row) for row in rows))
+        except sqlite3.IntegrityError as exc:
+            raise KeyError(str(exc))
+
+    def update(self, key, row):
+        try:
+            with self.conn:
+                self.conn.execute(self._update_sql, self._encode(row) + list(self._key(key)))
+        except sqlite3.IntegrityError:
+            raise KeyError(tuple(row[:3]))
+
+    def update_many(self, pairs, snapshot=None):
+        try:
+            with self.conn:
+                self.conn.executemany(self._update_sql,
+                                      (self._encode(row) + list(self._key(key)) for key, row in pairs))
+        except sqlite3.IntegrityError as exc:
+            raise KeyError(str(exc))
+
+    def delete(self, key):
+        with self.conn:
+            self.conn.execute(f"DELETE FROM legs WHERE trade_id IN ({self._trade_id_sql})", self._key(key))
+            self.conn.execute(f"DELETE FROM trades WHERE {KEY_MATCH}", self._key(key))
+
+    def clear(self):
+        with self.conn:
+            self.conn.execute("DELETE FROM legs")
+            self.conn.execute("DELETE FROM trades")
+
+    def set_legs(self, key, legs):
+        with self.conn:
+            self.conn.execute(f"DELETE FROM legs WHERE trade_id IN ({self._trade_id_sql})", self._key(key))
+            self._insert_legs(key, legs)
+
+    def replace_all(self, headers, rows, legs=()):
+        # `legs` are (key + leg) rows, as load_legs returns them.
+        with self.conn:
+            self.conn.execute("DELETE FROM legs")
+            self.conn.execute("DELETE FROM trades")
+            self.conn.executemany(self._insert_sql, (self._encode(row) for row in rows))
+            for key, group in groupby(legs, key=lambda leg: tuple(leg[:3])):
+                self._insert_legs(key, [leg[3:] for leg in group])
+
+    # Reads that go straight to the database through its indexes, for
+    # one-shot queries that do not load the store.
+    def find(self, key):
+        record = self.conn.execute(self._select_sql + f" WHERE {KEY_MATCH}", self._key(key)).fetchone()
+        return self._decode(record) if record else None
+
+    def instruments(self):
+        return [name for name, in self.conn.execute("SELECT DISTINCT instrument FROM trades")]
+
+    def trades_between(self, first=None, last=None, instruments=None, limit=None):
+        # Trades dated between the ordinals first and last (inclusive;
+        # either may be None) and, if given, on one of `instruments`, in
+        # row order.
+        conditions, params = [], []
+        if first is not None:
+            conditions.append("trade_date >= ?")
+            params.append(date.fromordinal(first).isoformat())
+        if last is not None:
+            conditions.append("trade_date <= ?")
+            params.append(date.fromordinal(last).isoformat())
+        if instruments is not None:
+            conditions.append(f"instrument IN ({', '.join('?' * len(instruments))})")
+            params.extend(instruments)
+        sql = self._select_sql
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return [self._decode(record) for record in self.conn.execute(sql, params)]
+
+    def changes(self):
+        # SQLite does its own locking, but keeps no log of what other
+        # connections changed: any commit of theirs means a full reload.
+        return [] if self._version() == self._data_version else None
+
+    def changes_applied(self):
+        pass
+
+    def needs_compaction(self):
+        return False
+
+    def compact(self, snapshot):
+        return None
+
+    def close(self):
+        self.conn.close()
+
+
+def copy_journal(source, target):
+    # Loss-free copy between backends, e.g. CSV -> SQLite import or
+    # SQLite -> CSV export. The source journal log is replayed first.
+    from trade_store import TradeStore
+    store = TradeStore(backend=open_backend(source))
+    store.load()
+    backend = open_backend(target)
+    backend.replace_all(store.headers, list(store), store.leg_rows())
+    backend.close()
+    store.backend.close()
+    return len(store)
@@ -0,0 +1,133 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+
+from analytics import Analytics, LegTable, PnlCheck, group_drawdown
+from storage import HEADERS
+from trade_store import TradeStore
+from tests.test_journal import trade, LEG
+
+# An iron condor: a bear call spread in the trade's own columns and a bull
+# put spread as two extra legs. (120 - 20) - (40 - 10) + (90 - 10) - (30 - 5)
+# = 125 per unit.
+PUT_LEGS = [["21800", "PE", "SELL", "25-01-2024", "1", "90", "10"],
+            ["21600", "PE", "BUY", "25-01-2024", "1", "30", "5"]]
+
+
+def condor(name):
+    row = trade(name, "6250")
+    row[HEADERS.index("Hedged_Strike_Price"):HEADERS.index("Hedged_Exit_Price") + 1] = ["22200", "BUY", "40", "10"]
+    return row
+
+
+class LegTableTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.store = TradeStore(os.path.join(self.dir, "trades.csv"))
+        self.store.load()
+        self.addCleanup(self.store.close)
+
+    def test_selected_trades_get_only_their_own_legs(self):
+        first = self.store.add(condor("a"), PUT_LEGS)
+        second = self.store.add(trade("b"), [LEG])
+        third = self.store.add(trade("c"))
+        legs = LegTable(self.store)
+        self.assertEqual(legs._build([first])["trade"].tolist(), [first] * 4)
+        self.assertEqual(sorted(legs._build([second, third])["trade"].tolist()), [second, second, third])
+
+    def test_patched_table_matches_a_fresh_one(self):
+        self.store.add(condor("a"), PUT_LEGS)
+        legs = LegTable(self.store)
+        legs.columns()
+        self.store.add(trade("b"))
+        patched = legs.columns()
+        fresh = LegTable(self.store).columns()
+        for name in ("trade", "strike", "entry"):
+            np.testing.assert_array_equal(np.sort(patched[name]), np.sort(fresh[name]))
+
+    def test_condor_pnl_is_unchanged_by_another_trade(self):
+        self.store.add(condor("a"), PUT_LEGS)
+        legs = LegTable(self.store)
+        legs.columns()
+        self.store.add(trade("b", "5000"))
+        check = PnlCheck(legs, {"NIFTY": 50})
+        self.assertEqual(check.computed.tolist(), [6250.0, 5000.0])
+        self.assertEqual(check.disagreeing().tolist(), [])
+
+    def test_mismatches_are_reported(self):
+        self.store.add(trade("a", "5000"))
+        self.store.add(trade("b", "4000"))
+        self.store.add(trade("c", "-"))
+        self.store.add(dated("d", "100", "02-01-2024", "FINNIFTY"))
+        analytics = Analytics(self.store)
+        for check in (PnlCheck(LegTable(self.store), {"NIFTY": 50}),
+                      PnlCheck(LegTable(self.store), {"NIFTY": 50}, analytics.arrays())):
+            self.assertEqual([check.ids[i] for i in check.disagreeing().tolist()], [1])
+            self.assertEqual([check.ids[i] for i in check.missing().tolist()], [2])
+            self.assertEqual(check.unknown_lot_sizes, ["FINNIFTY"])
+
+
+def dated(name, pnl, date, instrument="NIFTY"):
+    row = trade(name, pnl, date)
+    row[HEADERS.index("Instrument")] = instrument
+    return row
+
+
+class AnalyticsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.store = TradeStore(os.path.join(self.dir, "trades.csv"))
+        self.store.load()
+        self.addCleanup(self.store.close)
+        # Equity of strategy "a" by date: 100, -200, 100, 400; its worst
+        # drop is from 100 to -200.
+        for name, pnl, date in (("a", "100", "02-01-2024"), ("b", "50", "03-01-2024"),
+                                ("a", "-300", "04-01-2024"), ("a", "300", "05-02-2024"),
+                                ("b", "-", "06-02-2024"), ("a", "300", "07-02-2024")):
+            self.store.add(dated(name, pnl, date, "NIFTY" if name == "a" else "BANKNIFTY"))
+        self.analytics = Analytics(self.store)
+        self.addCleanup(self.analytics.close)
+
+    def stats(self, grouping=None):
+        return {label: values for label, values in self.analytics.stats(grouping)}
+
+    def test_group_stats(self):
+        stats = self.stats("Strategy_Name")
+        self.assertEqual(list(stats), ["a", "b"])
+        a, b = stats["a"], stats["b"]
+        self.assertEqual((a["Trades"], a["P&L"], a["Win_Rate"], a["Max_Drawdown"]), (4, 400.0, 75.0, 300.0))
+        self.assertEqual((a["Avg_Win"], a["Avg_Loss"], a["Expectancy"]), (700 / 3, -300.0, 100.0))
+        # A trade without a P&L counts as a trade but not in the figures.
+        self.assertEqual((b["Trades"], b["P&L"], b["Win_Rate"]), (2, 50.0, 100.0))
+        self.assertEqual(list(self.stats("Month")), ["2024-01", "2024-02"])
+        self.assertEqual(self.stats("Month")["2024-01"]["P&L"], -150.0)
+        self.assertEqual(self.stats()["All trades"]["Max_Drawdown"], 300.0)
+
+    def test_drawdown_resets_per_group(self):
+        codes = np.array([0, 0, 0, 1, 1])
+        dates = np.array([3.0, 1.0, 2.0, 1.0, 2.0])
+        pnl = np.array([50.0, 100.0, -80.0, -30.0, 10.0])
+        rids = np.arange(5)
+        self.assertEqual(group_drawdown(codes, dates, rids, pnl, 2).tolist(), [80.0, 30.0])
+
+    def test_patched_arrays_match_a_fresh_build(self):
+        self.analytics.stats()
+        self.store.add(dated("c", "25", "08-02-2024"))
+        self.store.update(("a", "02-01-2024", "NIFTY"), dated("a", "-100", "09-03-2024"))
+        self.store.delete(("b", "03-01-2024", "BANKNIFTY"))
+        self.store.delete(("b", "06-02-2024", "BANKNIFTY"))
+        fresh = Analytics(self.store)
+        self.addCleanup(fresh.close)
+        for grouping in (None, "Strategy_Name", "Instrument", "Month"):
+            self.assertEqual(self.analytics.stats(grouping), fresh.stats(grouping), grouping)
+        self.assertNotIn("b", self.stats("Strategy_Name"))
+        np.testing.assert_array_equal(self.analytics.equity_curve(), fresh.equity_curve())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import threading
+import unittest
+
+from background import BackgroundIO
+
+
+class Widget:
+    # Stands in for the Tk widget: after() only records the poll, which the
+    # tests run by hand.
+    def __init__(self):
+        self.polls = []
+
+    def after(self, ms, fn):
+        self.polls.append(fn)
+
+
+class BackgroundIOTest(unittest.TestCase):
+    def setUp(self):
+        self.io = BackgroundIO(Widget())
+        self.addCleanup(self.io.shutdown)
+        self.log = []
+
+    def test_writes_run_in_submission_order(self):
+        gate = threading.Event()
+        self.io.submit(gate.wait)
+        for i in range(20):
+            self.io.write(self.log.append, i)
+        gate.set()
+        self.io.shutdown()
+        self.assertEqual(self.log, list(range(20)))
+
+    def test_callbacks_run_in_order_on_the_polling_thread(self):
+        threads = []
+        done = lambda value: (threads.append(threading.current_thread()), self.log.append(value))
+        self.io.submit(lambda: "first", on_done=done)
+        self.io.check(lambda: "checked", done)
+        self.io.submit(lambda: 1 / 0, on_error=lambda exc: self.log.append(type(exc)))
+        self.io.submit(lambda: "last", on_done=done)
+        self.io.executor.submit(lambda: None).result()
+        self.io._poll()
+        self.assertEqual(self.log, ["first", "checked", ZeroDivisionError, "last"])
+        self.assertEqual(set(threads), {threading.current_thread()})
+        self.assertEqual(self.io.pending, 0)
+
+    def test_cancelled_task_sees_the_flag(self):
+        started = threading.Event()
+        gate = threading.Event()
+
+        def task(progress, cancelled):
+            started.set()
+            gate.wait()
+            return cancelled()
+
+        self.io.submit(task, on_done=self.log.append, cancellable=True)
+        started.wait()
+        self.io.cancel()
+        gate.set()
+        self.io.shutdown()
+        self.assertEqual(self.log, [True])
+        self.assertFalse(self.io.cancellable)
+
+
+if __name__ == "__main__":
+    unittest.main()
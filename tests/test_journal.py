@@ -0,0 +1,105 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from storage import HEADERS
+from trade_store import TradeStore
+
+
+def trade(name, pnl="100", date="02-01-2024"):
+    values = dict.fromkeys(HEADERS, "-")
+    values.update({"Strategy_Name": name, "Trade_Date": date, "Instrument": "NIFTY", "Strike_Price": "22000",
+                   "Buy/Sell": "SELL", "Expiry_Date": "25-01-2024", "Type": "CE", "Lots": "1",
+                   "Entry_Price": "120", "Exit_Price": "20", "Margin_Used": "100000", "Holding_Period": "3",
+                   "P&L": pnl})
+    return [values[header] for header in HEADERS]
+
+
+LEG = ["22200", "CE", "BUY", "25-01-2024", "1", "40", "10"]
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, "trades.csv")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def open_store(self):
+        store = TradeStore(self.path)
+        store.load()
+        self.addCleanup(store.close)
+        return store
+
+    def state(self):
+        store = self.open_store()
+        return sorted(map(tuple, store)), sorted(map(tuple, store.leg_rows()))
+
+    def write_edits(self):
+        store = self.open_store()
+        for name in ("a", "b", "c"):
+            store.add(trade(name))
+        store.update(("a", "02-01-2024", "NIFTY"), trade("a2", "250"))
+        store.update(("b", "02-01-2024", "NIFTY"), trade("b", "-75"))
+        store.delete(("c", "02-01-2024", "NIFTY"))
+        store.set_legs(("b", "02-01-2024", "NIFTY"), [LEG])
+        store.close()
+
+    def test_records_replayed_twice_give_the_same_trades(self):
+        self.write_edits()
+        expected = self.state()
+        self.assertEqual(expected[0], sorted([tuple(trade("a2", "250")), tuple(trade("b", "-75"))]))
+        journal = self.path + ".journal"
+        with open(journal, "rb") as file:
+            lines = file.read().splitlines(keepends=True)
+        with open(journal, "wb") as file:
+            file.writelines(line for line in lines for _ in range(2))
+        self.assertEqual(self.state(), expected)
+
+    def test_interrupted_compaction_is_finished_on_load(self):
+        # The log was rotated, but the snapshot was not written: the stale
+        # snapshot is still there beside the rotated log.
+        self.write_edits()
+        expected = self.state()
+        os.replace(self.path + ".journal", self.path + ".journal.compacting")
+        store = self.open_store()
+        store.add(trade("d"))
+        store.close()
+        expected = (sorted(expected[0] + [tuple(trade("d"))]), expected[1])
+        self.assertEqual(self.state(), expected)
+        self.assertFalse(os.path.exists(self.path + ".journal.compacting"))
+
+    def test_rotated_log_replayed_over_new_snapshot(self):
+        # The snapshot was written, but the rotated log was not removed yet.
+        self.write_edits()
+        expected = self.state()
+        log = os.path.join(self.dir, "log")
+        shutil.copyfile(self.path + ".journal", log)
+        store = self.open_store()
+        store.compact(wait=True)
+        store.close()
+        self.assertFalse(os.path.exists(self.path + ".journal"))
+        os.replace(log, self.path + ".journal.compacting")
+        self.assertEqual(self.state(), expected)
+        self.assertFalse(os.path.exists(self.path + ".journal.compacting"))
+
+    def test_torn_last_line_is_ignored_and_cut_off(self):
+        self.write_edits()
+        expected = self.state()
+        with open(self.path + ".journal", "ab") as file:
+            file.write(",".join(["I"] + trade("torn")).encode()[:-1])
+        self.assertEqual(self.state(), expected)
+        store = self.open_store()
+        store.add(trade("e"))
+        store.close()
+        rows, legs = self.state()
+        self.assertEqual(rows, sorted(expected[0] + [tuple(trade("e"))]))
+        self.assertEqual(legs, expected[1])
+        with open(self.path + ".journal", "rb") as file:
+            self.assertNotIn(b"torn", file.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
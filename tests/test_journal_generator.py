@@ -0,0 +1,50 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from journal_generator import LOT_SIZES, parse_size, trade_rows, write_journal
+from pnl import trade_pnl
+from storage import HEADERS
+from trade_store import TradeStore, trade_key
+from tests.test_journal import trade
+
+
+class GeneratorTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def test_sizes(self):
+        self.assertEqual([parse_size(text) for text in ("1k", "100k", "1M", "2.5k", "3m", "42")],
+                         [1000, 100000, 1000000, 2500, 3000000, 42])
+
+    def test_rows_are_repeatable_with_unique_keys(self):
+        rows = list(trade_rows(500, seed=3))
+        self.assertEqual(rows, list(trade_rows(500, seed=3)))
+        self.assertNotEqual(rows, list(trade_rows(500, seed=4)))
+        self.assertEqual(len({trade_key(row) for row in rows}), 500)
+        self.assertEqual({len(row) for row in rows}, {len(HEADERS)})
+
+    def test_pnl_agrees_with_the_legs(self):
+        for row in trade_rows(200):
+            computed = trade_pnl(row, LOT_SIZES[row[HEADERS.index("Instrument")]])
+            self.assertAlmostEqual(float(row[-1]), computed, places=1)
+
+    def test_written_journal_replaces_the_old_one(self):
+        for name in ("trades.csv", "trades.db"):
+            with self.subTest(journal=name):
+                path = os.path.join(self.dir, name)
+                store = TradeStore(path)
+                store.load()
+                store.add(trade("left over"))
+                store.close()
+                write_journal(path, 300, seed=1)
+                store = TradeStore(path)
+                store.load()
+                self.addCleanup(store.close)
+                self.assertEqual(sorted(store), sorted(trade_rows(300, seed=1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
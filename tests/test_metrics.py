@@ -0,0 +1,73 @@
+import json
+import math
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from metrics import BUCKETS, NULL_SPAN, PERCENTILES, SUMMARY_COLUMNS, Metrics, OperationStats, bucket, bucket_limit
+
+
+class HistogramTest(unittest.TestCase):
+    def test_buckets_bound_their_samples(self):
+        self.assertEqual(bucket(0.0), 0)
+        self.assertEqual(bucket(1e6), BUCKETS - 1)
+        for seconds in (2e-6, 3.3e-5, 0.001, 0.25, 7.0):
+            self.assertLessEqual(seconds, bucket_limit(bucket(seconds)))
+            self.assertGreaterEqual(seconds, bucket_limit(bucket(seconds) - 1))
+
+    def test_percentiles_are_within_a_bucket_of_the_true_value(self):
+        rand = random.Random(1)
+        samples = [10 ** rand.uniform(-5, 0) for _ in range(5000)]
+        stats = OperationStats()
+        for seconds in samples:
+            stats.add(seconds, 0, 0)
+        samples.sort()
+        for percent in PERCENTILES + (100,):
+            true = samples[math.ceil(len(samples) * percent / 100) - 1]
+            found = stats.percentile(percent)
+            self.assertGreaterEqual(found, true)
+            self.assertLessEqual(found, true * 2 ** 0.25)
+        self.assertEqual(stats.percentile(100), max(samples))
+
+    def test_one_sample_is_every_percentile(self):
+        stats = OperationStats()
+        stats.add(0.0123, 5, 10)
+        self.assertEqual([stats.percentile(percent) for percent in PERCENTILES], [0.0123] * len(PERCENTILES))
+
+
+class MetricsTest(unittest.TestCase):
+    def test_nothing_is_recorded_while_off(self):
+        metrics = Metrics()
+        with metrics.timed("load") as span:
+            span.rows = 3
+        self.assertIs(span, NULL_SPAN)
+        self.assertEqual(metrics.summary(), [])
+
+    def test_summary_and_trace(self):
+        metrics = Metrics(trace_events=3)
+        metrics.enable()
+        for rows in range(5):
+            with metrics.timed("load") as span:
+                span.rows = rows
+                span.bytes = 100
+        with metrics.timed("save"):
+            pass
+        summary = dict(metrics.summary())
+        self.assertEqual(list(summary), ["load", "save"])
+        self.assertEqual(list(summary["load"]), SUMMARY_COLUMNS)
+        self.assertEqual((summary["load"]["Count"], summary["load"]["Rows"], summary["load"]["Bytes"]), (5, 10, 500))
+        self.assertTrue(metrics.format_last().startswith("save: "))
+        dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dir, True)
+        path = os.path.join(dir, "trace.json")
+        self.assertEqual(metrics.export_trace(path), 3)
+        with open(path) as file:
+            trace = json.load(file)
+        self.assertEqual([event["name"] for event in trace["traceEvents"]], ["load", "load", "save"])
+        self.assertEqual(trace["otherData"]["summary"]["load"]["Count"], 5)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import math
+import unittest
+
+import numpy as np
+
+from risk import bs_price, contract_risk, implied_vol, norm_cdf
+
+
+def grid():
+    # Calls and puts over moneyness, volatility and time to expiry.
+    strike, vol, years, call = np.meshgrid([80.0, 95.0, 100.0, 105.0, 120.0], [0.1, 0.25, 0.5, 0.8],
+                                           [7 / 365, 30 / 365, 1.0], [1.0, 0.0])
+    return strike.ravel(), vol.ravel(), years.ravel(), call.ravel()
+
+
+class BlackScholesTest(unittest.TestCase):
+    def test_norm_cdf_matches_erf(self):
+        x = np.linspace(-6, 6, 241)
+        expected = [0.5 * (1 + math.erf(value / math.sqrt(2))) for value in x]
+        np.testing.assert_allclose(norm_cdf(x), expected, atol=2e-7)
+
+    def test_textbook_prices_and_parity(self):
+        prices = bs_price(100.0, np.array([100.0, 100.0]), 1.0, 0.05, 0.2, np.array([1.0, 0.0]))
+        np.testing.assert_allclose(prices, [10.4506, 5.5735], atol=1e-3)
+        strike, vol, years, call = grid()
+        calls = bs_price(100.0, strike, years, 0.07, vol, np.ones_like(call))
+        puts = bs_price(100.0, strike, years, 0.07, vol, np.zeros_like(call))
+        np.testing.assert_allclose(calls - puts, 100.0 - strike * np.exp(-0.07 * years), atol=1e-6)
+
+    def test_implied_vol_recovers_the_volatility(self):
+        strike, vol, years, call = grid()
+        prices = bs_price(100.0, strike, years, 0.07, vol, call)
+        # Options with next to no time value carry no usable volatility.
+        discounted = strike * np.exp(-0.07 * years)
+        intrinsic = np.maximum(np.where(call > 0, 100.0 - discounted, discounted - 100.0), 0.0)
+        priced = prices - intrinsic > 0.01
+        found = implied_vol(prices[priced], 100.0, strike[priced], years[priced], 0.07, call[priced])
+        np.testing.assert_allclose(found, vol[priced], atol=1e-3)
+        np.testing.assert_allclose(bs_price(100.0, strike[priced], years[priced], 0.07, found, call[priced]),
+                                   prices[priced], rtol=1e-5, atol=1e-5)
+
+    def test_prices_outside_the_bounds_have_no_volatility(self):
+        # Below intrinsic value, and above the spot for a call.
+        found = implied_vol(np.array([15.0, 101.0, 5.0]), 100.0, np.array([80.0, 100.0, 100.0]),
+                            np.array([0.5, 0.5, 0.5]), 0.0, np.array([1.0, 1.0, 1.0]))
+        self.assertTrue(np.isnan(found[:2]).all())
+        self.assertFalse(np.isnan(found[2]))
+
+    def test_greeks_match_finite_differences(self):
+        strike, years, call = np.array([95.0, 105.0]), np.array([0.25, 0.25]), np.array([1.0, 0.0])
+        price = bs_price(100.0, strike, years, 0.07, 0.3, call)
+        vol, _, delta, gamma, theta, vega = contract_risk(price, 100.0, strike, years, 0.07, call).T
+        np.testing.assert_allclose(vol, 0.3, atol=1e-5)
+        h = 0.01
+        up, down = (bs_price(100.0 + d, strike, years, 0.07, 0.3, call) for d in (h, -h))
+        np.testing.assert_allclose(delta, (up - down) / (2 * h), atol=1e-4)
+        np.testing.assert_allclose(gamma, (up - 2 * price + down) / (h * h), rtol=1e-2)
+        np.testing.assert_allclose(vega, bs_price(100.0, strike, years, 0.07, 0.31, call) - price, rtol=2e-2)
+        day = bs_price(100.0, strike, years - 1 / 365, 0.07, 0.3, call) - price
+        np.testing.assert_allclose(theta, day, rtol=2e-2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from storage import HEADERS, copy_journal
+from trade_api import TradeBook, sql_search
+from trade_store import TradeStore
+from tests.test_journal import trade
+
+
+class SqliteKeyTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.csv = os.path.join(self.dir, "trades.csv")
+        self.db = os.path.join(self.dir, "trades.db")
+
+    def tearDown(self):
+        shutil.rmtree(self.dir, ignore_errors=True)
+
+    def open_store(self, path):
+        store = TradeStore(path)
+        store.load()
+        self.addCleanup(store.close)
+        return store
+
+    def test_both_spellings_of_a_trade_date_are_separate_trades(self):
+        # A legacy YYYY-MM-DD row and a DD-MM-YYYY row with the same date
+        # have different keys in the store, and must in SQLite too.
+        store = self.open_store(self.csv)
+        store.add(trade("a", "100", "2024-01-02"))
+        store.add(trade("a", "200", "02-01-2024"))
+        store.close()
+        self.assertEqual(copy_journal(self.csv, self.db), 2)
+        store = self.open_store(self.db)
+        self.assertEqual(store.get(("a", "2024-01-02", "NIFTY"))[-1], "100")
+        self.assertEqual(store.get(("a", "02-01-2024", "NIFTY"))[-1], "200")
+        store.update(("a", "2024-01-02", "NIFTY"), trade("a", "150", "2024-01-02"))
+        store.delete(("a", "02-01-2024", "NIFTY"))
+        store.close()
+        store = self.open_store(self.db)
+        self.assertEqual(list(store), [trade("a", "150", "2024-01-02")])
+        with self.assertRaises(KeyError):
+            store.backend.insert(trade("a", "1", "2024-01-02"))
+
+
+def on(name, date, instrument):
+    row = trade(name, "100", date)
+    row[HEADERS.index("Instrument")] = instrument
+    return row
+
+
+class SqliteQueryTest(unittest.TestCase):
+    # One-shot reads through the SQL indexes agree with the loaded store.
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.db = os.path.join(self.dir, "trades.db")
+        store = TradeStore(self.db)
+        store.load()
+        store.add(on("a", "02-01-2024", "NIFTY"))
+        store.add(on("b", "2024-01-05", "BANKNIFTY"))
+        store.add(on("c", "09-01-2024", "FINNIFTY"))
+        store.add(on("d", "16-01-2024", "NIFTY"))
+        store.close()
+
+    def search(self, **filters):
+        book = TradeBook(self.db)
+        self.addCleanup(book.close)
+        return book.search(**filters)
+
+    def test_filters_match_the_store(self):
+        for filters in ({"date_from": "03-01-2024"}, {"date_to": "2024-01-09"},
+                        {"date_from": "05-01-2024", "date_to": "16-01-2024", "instrument": "nifty"},
+                        {"instrument": "bank"}, {"instrument": "nifty", "prefix": True},
+                        {"instrument": "SENSEX"}, {}):
+            headers, rows = sql_search(self.db, **filters)
+            self.assertEqual(rows, self.search(**filters), filters)
+        self.assertEqual(len(sql_search(self.db, limit=2, date_from="03-01-2024")[1]), 2)
+
+    def test_find_takes_either_spelling_of_the_date(self):
+        for key in (("b", "05-01-2024", "BANKNIFTY"), ("b", "2024-01-05", "BANKNIFTY")):
+            self.assertEqual(sql_search(self.db, key)[1], [on("b", "2024-01-05", "BANKNIFTY")])
+        self.assertEqual(sql_search(self.db, ("b", "06-01-2024", "BANKNIFTY"))[1], [])
+
+    def test_other_filters_and_csv_journals_need_the_store(self):
+        self.assertIsNone(sql_search(self.db, strategy="a"))
+        self.assertIsNone(sql_search(os.path.join(self.dir, "trades.csv")))
+
+    def test_date_and_instrument_queries_use_their_indexes(self):
+        store = TradeStore(self.db)
+        self.addCleanup(store.close)
+        conn = store.backend.conn
+        for sql, index in (("trade_date >= '2024-01-03'", "trades_trade_date"),
+                           ("instrument IN ('NIFTY')", "trades_instrument")):
+            plan = " ".join(str(row) for row in conn.execute(f"EXPLAIN QUERY PLAN SELECT * FROM trades WHERE {sql}"))
+            self.assertIn(index, plan)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import csv
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+
+from storage import HEADERS
+from tracker_cli import DUPLICATE, NOT_FOUND, main, option_name
+from tests.test_journal import trade
+
+
+def add_args(row):
+    args = ["add"]
+    for header, value in zip(HEADERS, row):
+        if value != "-":
+            args += [option_name(header), value]
+    return args
+
+
+class CliTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+
+    def run_cli(self, *args, journal="trades.csv"):
+        # (exit code, stdout, stderr)
+        out, err = io.StringIO(), io.StringIO()
+        with redirect_stdout(out), redirect_stderr(err):
+            code = main(list(args) + ["--journal", os.path.join(self.dir, journal)])
+        return code, out.getvalue(), err.getvalue()
+
+    def query(self, *args, journal="trades.csv"):
+        code, out, err = self.run_cli("query", *args, journal=journal)
+        self.assertEqual(code, 0, err)
+        return list(csv.reader(io.StringIO(out)))[1:]
+
+    def test_add_query_update_delete(self):
+        for journal in ("trades.csv", "trades.db"):
+            with self.subTest(journal=journal):
+                self.assertEqual(self.run_cli(*add_args(trade("a", "100")), journal=journal)[0], 0)
+                self.assertEqual(self.run_cli(*add_args(trade("b", "-50")), journal=journal)[0], 0)
+                self.assertEqual([row[0] for row in self.query(journal=journal)], ["a", "b"])
+                self.assertEqual([row[0] for row in self.query("--sort", "P&L", journal=journal)], ["b", "a"])
+                self.assertEqual([row[0] for row in self.query("--profit", journal=journal)], ["a"])
+                code, _, _ = self.run_cli("update", "a", "2024-01-02", "NIFTY", "--pnl", "150", journal=journal)
+                self.assertEqual(code, 0)
+                self.assertEqual(self.query("--key", "a", "02-01-2024", "NIFTY", journal=journal)[0][-1], "150")
+                self.assertEqual(self.run_cli("delete", "b", "02-01-2024", "NIFTY", journal=journal)[0], 0)
+                self.assertEqual([row[0] for row in self.query(journal=journal)], ["a"])
+
+    def test_duplicates_and_missing_trades_are_errors(self):
+        self.run_cli(*add_args(trade("a")))
+        self.run_cli(*add_args(trade("b")))
+        self.assertEqual(self.run_cli(*add_args(trade("a"))), (1, "", f"error: {DUPLICATE}\n"))
+        code, _, err = self.run_cli("update", "b", "02-01-2024", "NIFTY", "--strategy-name", "a")
+        self.assertEqual((code, err), (1, f"error: {DUPLICATE}\n"))
+        code, _, err = self.run_cli("delete", "c", "02-01-2024", "NIFTY")
+        self.assertEqual((code, err), (1, f"error: {NOT_FOUND}\n"))
+
+    def test_add_without_pnl_or_lot_size_says_why(self):
+        row = trade("a")
+        row[HEADERS.index("P&L")] = "-"
+        code, _, err = self.run_cli(*add_args(row))
+        self.assertEqual(code, 1)
+        self.assertIn("no lot size", err)
+        self.assertEqual(self.query(), [])
+
+    def test_stats_totals(self):
+        self.run_cli(*add_args(trade("a", "100")))
+        self.run_cli(*add_args(trade("b", "-40")))
+        code, out, _ = self.run_cli("stats")
+        self.assertEqual(code, 0)
+        self.assertIn("Total Trades: 2", out)
+
+
+if __name__ == "__main__":
+    unittest.main()
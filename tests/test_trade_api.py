@@ -0,0 +1,89 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from storage import HEADERS
+from trade_api import TradeBook, build_trade, sql_search
+from trade_store import TradeStore, DuplicateTradeError
+from tests.test_journal import trade
+
+
+class DuplicateKeyTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.path = os.path.join(self.dir, "trades.csv")
+        # A row saved before dates were stored as DD-MM-YYYY.
+        store = TradeStore(self.path)
+        store.load()
+        store.add(trade("a", "100", "2024-01-02"))
+        store.add(trade("b", "100", "03-01-2024"))
+        store.close()
+        self.book = TradeBook(self.path)
+        self.addCleanup(self.book.store.close)
+
+    def test_add_finds_a_trade_stored_with_the_other_date_format(self):
+        with self.assertRaises(DuplicateTradeError):
+            self.book.add(dict(zip(HEADERS, trade("a", "100", "02-01-2024"))))
+        self.assertEqual(len(self.book), 2)
+
+    def test_update_cannot_move_a_trade_onto_a_legacy_key(self):
+        with self.assertRaises(DuplicateTradeError):
+            self.book.update(("b", "03-01-2024", "NIFTY"), {"Trade_Date": "02-01-2024", "Strategy_Name": "a"})
+        self.assertIsNotNone(self.book.find(("a", "02-01-2024", "NIFTY")))
+        self.assertEqual(len(self.book), 2)
+
+    def test_leaving_out_pnl_is_not_a_duplicate(self):
+        values = dict(zip(HEADERS, trade("c")))
+        del values["P&L"]
+        # No lot size is set for NIFTY, so the P&L cannot be filled in.
+        with self.assertRaisesRegex(ValueError, "no lot size"):
+            self.book.add(values)
+        self.assertEqual(len(self.book), 2)
+
+
+class BuildTradeTest(unittest.TestCase):
+    def test_missing_pnl_is_computed(self):
+        values = dict(zip(HEADERS, trade("c")))
+        del values["P&L"]
+        row = build_trade(values, lot_sizes={"NIFTY": 50})
+        self.assertNotEqual(row[-1], "")
+        self.assertEqual(row[:-1], build_trade(dict(zip(HEADERS, trade("c"))))[:-1])
+
+
+class SqlSearchTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.path = os.path.join(self.dir, "trades.db")
+        store = TradeStore(self.path)
+        store.load()
+        for i, instrument in enumerate(["NIFTY", "BANKNIFTY", "FINNIFTY", "nifty it"] * 3):
+            row = trade(f"s{i}", "100", f"{i + 1:02d}-01-2024")
+            row[HEADERS.index("Instrument")] = instrument
+            store.add(row)
+        store.close()
+        self.book = TradeBook(self.path)
+        self.addCleanup(self.book.close)
+
+    def test_matches_the_loaded_search(self):
+        for filters in ({"instrument": "nifty"}, {"instrument": "NIFTY", "prefix": True},
+                        {"instrument": "bank", "date_from": "2024-01-03"},
+                        {"date_from": "04-01-2024", "date_to": "09-01-2024"}, {}):
+            with self.subTest(filters=filters):
+                headers, rows = sql_search(self.path, limit=5, **filters)
+                self.assertEqual(rows, self.book.search(limit=5, **filters))
+
+    def test_key_lookup_in_either_date_format(self):
+        headers, rows = sql_search(self.path, ("s2", "2024-01-03", "FINNIFTY"))
+        self.assertEqual([row[0] for row in rows], ["s2"])
+        self.assertEqual(sql_search(self.path, ("s2", "04-01-2024", "FINNIFTY"))[1], [])
+
+    def test_other_filters_need_the_trade_book(self):
+        self.assertIsNone(sql_search(self.path, strategy="s1"))
+        self.assertIsNone(sql_search(os.path.join(self.dir, "trades.csv"), instrument="nifty"))
+
+
+if __name__ == "__main__":
+    unittest.main()
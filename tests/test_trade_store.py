@@ -0,0 +1,139 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from storage import HEADERS
+from trade_store import TradeStore, TradeTotals, RESET
+from trade_view import TradeView
+from tests.test_journal import trade
+
+EXPIRY = HEADERS.index("Expiry_Date")
+
+
+def expiring(name, expiry):
+    row = trade(name)
+    row[EXPIRY] = expiry
+    return row
+
+
+class FollowTest(unittest.TestCase):
+    # Two stores on the same file, as two processes would have.
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.path = os.path.join(self.dir, "trades.csv")
+        self.writer = self.open_store()
+        self.writer.add(expiring("a", "25-01-2024"))
+        self.writer.add(expiring("b", "01-02-2024"))
+        self.writer.add(expiring("c", "08-02-2024"))
+        self.reader = self.open_store()
+        self.view = TradeView(self.reader)
+        self.view.rows("Expiry_Date")
+        self.view.rows("Strategy_Name")
+        self.view.matching(strategy="a")
+        self.events = []
+        self.reader.subscribe(lambda event, *args: self.events.append(event))
+
+    def open_store(self):
+        store = TradeStore(self.path)
+        store.load()
+        self.addCleanup(store.close)
+        return store
+
+    def assert_view_current(self):
+        fresh = TradeView(self.reader)
+        for column in ("Expiry_Date", "Strategy_Name"):
+            self.assertEqual(list(self.view.rows(column)), list(fresh.rows(column)))
+
+    def test_trade_added_and_deleted_in_one_batch(self):
+        self.writer.add(expiring("d", "15-02-2024"))
+        self.writer.delete(("d", "02-01-2024", "NIFTY"))
+        self.assertEqual(self.reader.follow(), 2)
+        self.assertEqual(self.events, [RESET])
+        self.assertNotIn(("d", "02-01-2024", "NIFTY"), self.reader)
+        self.assert_view_current()
+
+    def test_trade_updated_twice_in_one_batch(self):
+        self.writer.update(("a", "02-01-2024", "NIFTY"), expiring("a", "05-02-2024"))
+        self.writer.update(("a", "02-01-2024", "NIFTY"), expiring("a", "22-02-2024"))
+        self.assertEqual(self.reader.follow(), 2)
+        self.assert_view_current()
+        self.assertEqual(self.reader.get(("a", "02-01-2024", "NIFTY"))[EXPIRY], "22-02-2024")
+
+    def test_separate_trades_are_announced_one_by_one(self):
+        self.writer.add(expiring("d", "15-02-2024"))
+        self.writer.update(("a", "02-01-2024", "NIFTY"), expiring("a", "05-02-2024"))
+        self.assertEqual(self.reader.follow(), 2)
+        self.assertEqual(sorted(self.events), ["added", "updated"])
+        self.assert_view_current()
+
+    def test_local_edit_between_reading_and_applying_changes(self):
+        # The GUI reads changes on its worker and applies them later on the
+        # Tk thread; an edit made in between, even one that compacts, must
+        # not lose the other writer's trade.
+        self.writer.add(expiring("from_b", "15-02-2024"))
+        records = self.reader.changes()
+        self.reader.backend.journal.threshold = 0
+        self.reader.add(expiring("from_a", "22-02-2024"))
+        self.assertEqual(self.reader.apply_changes(records), 1)
+        expected = ["a", "b", "c", "from_a", "from_b"]
+        self.assertEqual(sorted(row[0] for row in self.reader), expected)
+        self.assertEqual(sorted(row[0] for row in self.open_store()), expected)
+        # Once its own record has been read back, the store compacts.
+        self.reader.follow()
+        self.reader.compact(wait=True)
+        self.assertFalse(os.path.exists(self.path + ".journal"))
+        self.assertEqual(sorted(row[0] for row in self.open_store()), expected)
+
+    def test_edit_after_reading_wins_over_the_record_read(self):
+        # Both stores update the same trade; on disk the reader's update
+        # comes last, and so it must in the reader's copy once followed.
+        self.writer.update(("a", "02-01-2024", "NIFTY"), expiring("a", "15-02-2024"))
+        records = self.reader.changes()
+        self.reader.update(("a", "02-01-2024", "NIFTY"), expiring("a", "22-02-2024"))
+        self.reader.apply_changes(records)
+        self.reader.follow()
+        self.assertEqual(self.reader.get(("a", "02-01-2024", "NIFTY"))[EXPIRY], "22-02-2024")
+        self.assertEqual(self.open_store().get(("a", "02-01-2024", "NIFTY"))[EXPIRY], "22-02-2024")
+        self.assert_view_current()
+
+
+def totals(store):
+    return (store.totals.total_trades, round(store.totals.total_pl, 2), store.totals.winning_trades,
+            store.totals.losing_trades)
+
+
+class TotalsTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.path = os.path.join(self.dir, "trades.csv")
+        self.store = TradeStore(self.path)
+        self.store.load()
+        self.addCleanup(self.store.close)
+
+    def test_running_totals_follow_every_change(self):
+        for name, pnl in (("a", "100"), ("b", "-40.5"), ("c", "-"), ("d", "0")):
+            self.store.add(trade(name, pnl))
+        self.assertEqual(totals(self.store), (4, 59.5, 1, 1))
+        self.store.update(("b", "02-01-2024", "NIFTY"), trade("b", "40.5"))
+        self.store.update(("c", "02-01-2024", "NIFTY"), trade("c", "-10"))
+        self.assertEqual(totals(self.store), (4, 130.5, 2, 1))
+        self.store.delete(("a", "02-01-2024", "NIFTY"))
+        self.assertEqual(totals(self.store), (3, 30.5, 1, 1))
+        # The same as counting the journal afresh.
+        fresh = TradeTotals()
+        for row in self.store:
+            fresh.add(row)
+        self.assertEqual(totals(self.store), (fresh.total_trades, round(fresh.total_pl, 2),
+                                              fresh.winning_trades, fresh.losing_trades))
+        self.store.close()
+        reopened = TradeStore(self.path)
+        reopened.load()
+        self.addCleanup(reopened.close)
+        self.assertEqual(totals(reopened), (3, 30.5, 1, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
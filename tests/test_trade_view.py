@@ -0,0 +1,159 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from dates import parse_date
+from storage import HEADERS
+from trade_store import TradeStore
+from trade_view import SortOrder, TextIndex, TradeView, parse_number
+from tests.test_journal import trade
+
+EXPIRY = HEADERS.index("Expiry_Date")
+EXIT = HEADERS.index("Exit_Price")
+
+
+def position(name, expiry, exit_price="20"):
+    row = trade(name)
+    row[EXPIRY] = expiry
+    row[EXIT] = exit_price
+    return row
+
+
+PNL = HEADERS.index("P&L")
+STRIKE = HEADERS.index("Strike_Price")
+
+
+class SortOrderTest(unittest.TestCase):
+    def test_patched_order_matches_a_fresh_sort(self):
+        # Few distinct values, so ties must stay in row id order.
+        rand = random.Random(5)
+        typed = {rid: rand.choice([None, 1.0, 2.0, 3.0]) for rid in range(50)}
+        order = SortOrder(dict(typed))
+        for _ in range(200):
+            rid = rand.randrange(60)
+            if rid in typed:
+                order.remove(rid, typed.pop(rid))
+            else:
+                typed[rid] = rand.choice([None, 1.0, 2.0, 3.0])
+                order.add(rid, typed[rid])
+        fresh = SortOrder(typed)
+        self.assertEqual((order.ids, order.keys, order.missing), (fresh.ids, fresh.keys, fresh.missing))
+        self.assertEqual(order.ordered(), sorted(typed, key=lambda rid: (typed[rid] is None, typed[rid] or 0, rid)))
+
+    def test_descending_keeps_missing_values_last(self):
+        order = SortOrder({0: 2.0, 1: None, 2: 1.0, 3: 3.0})
+        self.assertEqual(order.ordered(descending=True), [3, 0, 2, 1])
+
+    def test_span_bounds(self):
+        order = SortOrder({rid: float(rid // 2) for rid in range(10)})
+        self.assertEqual(order.span(1.0, 3.0), (2, 8))
+        self.assertEqual(order.span(1.0, 3.0, low_open=True, high_open=True), (4, 6))
+        self.assertEqual(order.span(high=0.0), (0, 2))
+        self.assertEqual(order.span(5.0, 1.0), (10, 10))
+
+
+class MatchingTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.store = TradeStore(os.path.join(self.dir, "trades.csv"))
+        self.store.load()
+        self.addCleanup(self.store.close)
+        rand = random.Random(7)
+        rows = []
+        for i in range(80):
+            row = trade(rand.choice(["Iron Condor", "iron fly", "Strangle"]) + f" {i}",
+                        rand.choice(["-", "0", "150", "-75.5", "1,200", "300"]))
+            row[STRIKE] = str(rand.choice([21800, 22000, 22200]))
+            rows.append(row)
+        self.store.add_many(rows)
+        self.view = TradeView(self.store)
+
+    def brute(self, test):
+        return {rid for rid, row in self.store.rows.items() if test(row)}
+
+    def test_filters_match_a_scan_of_the_rows(self):
+        pnl = lambda row: parse_number(row[PNL])
+        cases = [
+            ({"strategy": "iron"}, lambda row: "iron" in row[0].casefold()),
+            ({"strategy": "IRON F", "prefix": True}, lambda row: row[0].casefold().startswith("iron f")),
+            ({"pl_sign": "profit"}, lambda row: (pnl(row) or 0) > 0),
+            ({"pl_sign": "loss"}, lambda row: (pnl(row) or 0) < 0),
+            ({"pl_min": "0", "pl_max": "300"}, lambda row: pnl(row) is not None and 0 <= pnl(row) <= 300),
+            ({"strategy": "strangle", "strike_min": "22000", "pl_sign": "profit"},
+             lambda row: "strangle" in row[0].casefold() and float(row[STRIKE]) >= 22000 and (pnl(row) or 0) > 0),
+        ]
+        for filters, test in cases:
+            with self.subTest(filters=filters):
+                self.assertEqual(self.view.matching(**filters), self.brute(test))
+
+    def test_sorted_rows_of_few_and_many_matches(self):
+        # One filter leaves more than an eighth of the rows (walks the full
+        # order), the other fewer (sorts the matches directly). Descending,
+        # ties come in reverse row id order either way.
+        for filters in ({"pl_sign": "profit"}, {"strategy": "strangle", "pl_min": "1000"}):
+            with self.subTest(filters=filters):
+                matched = self.view.matching(**filters)
+                value = lambda rid: parse_number(self.store.rows[rid][PNL])
+                self.assertEqual(self.view.rows("P&L", True, filters),
+                                 sorted(matched, key=lambda rid: (value(rid), rid), reverse=True))
+                self.assertEqual(self.view.rows(None, False, filters), sorted(matched))
+
+
+class TextIndexTest(unittest.TestCase):
+    def test_prefix_and_substring_matches_ignore_case(self):
+        index = TextIndex(["Iron Condor", "IRON FLY", "Short Straddle", "short strangle", "Ratio"])
+        self.assertEqual(index.prefixed("iron"), ["Iron Condor", "IRON FLY"])
+        self.assertEqual(index.prefixed("SHORT STRA"), ["Short Straddle", "short strangle"])
+        self.assertEqual(index.prefixed("strangle"), [])
+        self.assertEqual(index.containing("rAt"), ["Ratio"])
+        self.assertEqual(index.containing("d"), ["Iron Condor", "Short Straddle"])
+        self.assertEqual(index.prefixed(""), [entry[1] for entry in index.entries])
+
+    def test_index_follows_names_appearing_and_going(self):
+        dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, dir, True)
+        store = TradeStore(os.path.join(dir, "trades.csv"))
+        store.load()
+        self.addCleanup(store.close)
+        store.add(trade("Iron Condor"))
+        view = TradeView(store)
+        self.assertEqual(view.matching(strategy="iron"), {0})
+        rid = store.add(trade("Iron Fly"))
+        self.assertEqual(view.matching(strategy="IRON F", prefix=True), {rid})
+        store.delete(("Iron Condor", "02-01-2024", "NIFTY"))
+        self.assertEqual(view.text_index("Strategy_Name").keys, ["iron fly"])
+        self.assertEqual(view.matching(strategy="condor"), set())
+
+
+class ExpiriesTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.store = TradeStore(os.path.join(self.dir, "trades.csv"))
+        self.store.load()
+        self.addCleanup(self.store.close)
+        self.store.add(position("a", "25-01-2024"))
+        self.store.add(position("b", "25-01-2024", "-"))
+        self.store.add(position("c", "01-02-2024", ""))
+        self.store.add(position("d", "someday"))
+        self.view = TradeView(self.store)
+
+    def test_groups_count_trades_and_open_positions(self):
+        self.assertEqual(self.view.expiries(), [(parse_date("25-01-2024"), 2, 1),
+                                                (parse_date("01-02-2024"), 1, 1), (None, 1, 0)])
+
+    def test_patched_groups_match_a_fresh_count(self):
+        self.view.expiries()
+        self.store.add(position("e", "08-02-2024", "-"))
+        self.store.update(("b", "02-01-2024", "NIFTY"), position("b", "01-02-2024"))
+        self.store.delete(("d", "02-01-2024", "NIFTY"))
+        self.store.delete(("a", "02-01-2024", "NIFTY"))
+        self.assertEqual(self.view.expiries(), TradeView(self.store).expiries())
+        self.assertEqual(self.view.expiries(), [(parse_date("01-02-2024"), 2, 1), (parse_date("08-02-2024"), 1, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
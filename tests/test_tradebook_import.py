@@ -0,0 +1,65 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+
+from trade_store import TradeStore, trade_key
+from tradebook_import import import_tradebook, main
+
+# A bull put spread opened and closed twice on the same day.
+FILLS = [
+    ("NIFTY24JAN21500PE", "SELL", 50, 100),
+    ("NIFTY24JAN21300PE", "BUY", 50, 40),
+    ("NIFTY24JAN21500PE", "BUY", 50, 60),
+    ("NIFTY24JAN21300PE", "SELL", 50, 20),
+] * 2
+
+
+class ImportTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir, True)
+        self.path = os.path.join(self.dir, "tradebook.csv")
+        with open(self.path, "w") as file:
+            file.write("symbol,trade_date,trade_type,quantity,price\n")
+            for symbol, side, quantity, price in FILLS:
+                file.write(f"{symbol},2024-01-02,{side},{quantity},{price}\n")
+
+    def run_import(self, existing):
+        rows = []
+        result = import_tradebook(self.path, rows.extend, existing, lot_sizes={"NIFTY": 50})
+        return result, rows
+
+    def test_repeated_round_trips_are_numbered_not_dropped(self):
+        result, rows = self.run_import(set())
+        self.assertEqual((result.imported, result.duplicates, result.renamed), (2, 0, 1))
+        self.assertEqual([row[0] for row in rows], ["BULL PUT SPREAD", "BULL PUT SPREAD #2"])
+
+    def test_importing_again_finds_every_trade_a_duplicate(self):
+        _, rows = self.run_import(set())
+        result, again = self.run_import({trade_key(row) for row in rows})
+        self.assertEqual((result.imported, result.duplicates, again), (0, 2, []))
+
+    def test_command_line_import(self):
+        journal = os.path.join(self.dir, "trades.csv")
+        out = io.StringIO()
+        with redirect_stdout(out):
+            main([self.path, "--journal", journal, "--lot-size", "NIFTY=50"])
+        self.assertIn("2 trades imported", out.getvalue())
+        store = TradeStore(journal)
+        store.load()
+        self.addCleanup(store.close)
+        self.assertEqual(len(store), 2)
+
+    def test_bad_lot_size_is_a_usage_error(self):
+        err = io.StringIO()
+        with redirect_stderr(err), self.assertRaises(SystemExit) as exit:
+            main([self.path, "--journal", os.path.join(self.dir, "trades.csv"), "--lot-size", "NIFTY=abc"])
+        self.assertEqual(exit.exception.code, 2)
+        self.assertIn("--lot-size", err.getvalue())
+
+
+if __name__ == "__main__":
+    unittest.main()
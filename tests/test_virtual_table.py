@@ -0,0 +1,64 @@
+import tkinter as tk
+import unittest
+
+from virtual_table import VirtualTable
+
+
+class VirtualTableTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        try:
+            cls.root = tk.Tk()
+        except tk.TclError:
+            raise unittest.SkipTest("no display")
+        cls.root.withdraw()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.root.destroy()
+
+    def setUp(self):
+        self.rows = {rid: [f"trade {rid}"] for rid in range(1000)}
+        self.table = VirtualTable(self.root, self.rows.__getitem__, page_size=10, columns=["name"])
+        self.addCleanup(self.table.destroy)
+        self.table.set_source(list(self.rows))
+
+    def shown(self):
+        return [self.table._item_rids[iid] for iid in self.table._items]
+
+    def test_only_a_window_of_rows_is_materialized(self):
+        self.assertEqual(len(self.table.tree.get_children()), 10)
+        self.assertEqual(self.shown(), list(range(10)))
+        self.assertEqual(self.table.tree.item(self.table._items[0], "values")[0], "trade 0")
+
+    def test_scrolling_moves_the_window(self):
+        self.table.scroll_to(500)
+        self.assertEqual(self.shown(), list(range(500, 510)))
+        self.assertEqual(self.table.tree.item(self.table._items[0], "values")[0], "trade 500")
+        self.table.scroll_to(5000)
+        self.assertEqual(self.table.first, 1000 - self.table.visible_rows())
+        self.assertEqual(len(self.table.tree.get_children()), len(self.shown()))
+
+    def test_remove_and_append(self):
+        self.table.remove(3)
+        self.assertEqual(self.shown(), [0, 1, 2] + list(range(4, 11)))
+        self.table.remove(3)
+        self.assertEqual(len(self.table.source), 999)
+        self.rows[1000] = ["trade 1000"]
+        self.table.append(1000)
+        self.assertEqual(self.table.source[-1], 1000)
+        self.assertEqual(len(self.table.tree.get_children()), 10)
+
+    def test_selection_survives_scrolling(self):
+        self.table.tree.selection_set(self.table._items[5])
+        self.root.update()
+        self.assertEqual(self.table.selection(), [5])
+        self.table.scroll_to(100)
+        self.assertEqual(self.table.tree.selection(), ())
+        self.table.scroll_to(0)
+        self.assertEqual(self.table.tree.selection(), (self.table._items[5],))
+        self.assertEqual(self.table.selection(), [5])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,315 @@
+import sys
+import csv
+import argparse
+
+from storage import FILE_NAME, HEADERS, sql_name, copy_journal
+from dates import parse_date, format_date
+from journal import LEG_FIELDS
+from pnl import LotSizes, lot_sizes_path, pnl_disagreement, format_number
+from trade_store import DuplicateTradeError
+from trade_api import TradeBook, journal_totals, totals_summary, sql_search
+
+
+FILTERS = ["strategy", "instrument", "option_type", "date_from", "date_to", "pl_sign", "prefix",
+           "expiry_from", "expiry_to", "strike_min", "strike_max", "pl_min", "pl_max"]
+# Written form of an extra leg (see legs.parse_leg); a blank expiry takes
+# the trade's.
+LEG_SPEC_HELP = "'SIDE STRIKE TYPE LOTS ENTRY [EXIT [EXPIRY]]'"
+
+
+def option_name(header):
+    return "--" + sql_name(header).replace("_", "-")
+
+
+def add_field_options(parser):
+    for header in HEADERS:
+        parser.add_argument(option_name(header), dest=header, default="", metavar="TEXT")
+
+
+def add_filter_options(parser):
+    parser.add_argument("--strategy", default="", help="strategy name contains")
+    parser.add_argument("--instrument", default="", help="instrument contains")
+    parser.add_argument("--type", dest="option_type", default="", help="CE or PE")
+    parser.add_argument("--from", dest="date_from", default="", help="first trade date")
+    parser.add_argument("--to", dest="date_to", default="", help="last trade date")
+    parser.add_argument("--prefix", action="store_true", help="match strategy/instrument as a prefix")
+    parser.add_argument("--expiry-from", default="", help="first expiry date")
+    parser.add_argument("--expiry-to", default="", help="last expiry date")
+    parser.add_argument("--strike-min", default="")
+    parser.add_argument("--strike-max", default="")
+    parser.add_argument("--pl-min", default="", help="smallest P&L")
+    parser.add_argument("--pl-max", default="", help="largest P&L")
+    sign = parser.add_mutually_exclusive_group()
+    sign.add_argument("--profit", dest="pl_sign", action="store_const", const="profit")
+    sign.add_argument("--loss", dest="pl_sign", action="store_const", const="loss")
+
+
+def build_parser():
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--journal", default=FILE_NAME,
+                        help="CSV journal, or a SQLite database (.db, .sqlite, .sqlite3)")
+    parser = argparse.ArgumentParser(prog="option_selling_tracker.py",
+                                     description="Headless access to the option selling journal.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", parents=[common], help="add a trade")
+    add_field_options(add)
+    add.add_argument("--hedged", action="store_true", help="the trade has a hedge leg")
+    add.add_argument("--leg", action="append", default=[], metavar="SPEC", dest="legs",
+                     help=f"an extra leg, {LEG_SPEC_HELP} (repeatable)")
+
+    query = commands.add_parser("query", parents=[common], help="print matching trades as CSV")
+    add_filter_options(query)
+    query.add_argument("--key", nargs=3, metavar=("STRATEGY", "DATE", "INSTRUMENT"), help="one trade by key")
+    query.add_argument("--sort", choices=HEADERS, help="column to sort by")
+    query.add_argument("--desc", action="store_true", help="sort descending")
+    query.add_argument("--limit", type=int, help="print at most this many trades")
+
+    update = commands.add_parser("update", parents=[common], help="change fields of a trade")
+    update.add_argument("key", nargs=3, metavar=("STRATEGY", "DATE", "INSTRUMENT"))
+    add_field_options(update)
+
+    legs = commands.add_parser("legs", parents=[common], help="print or replace a trade's legs")
+    legs.add_argument("key", nargs=3, metavar=("STRATEGY", "DATE", "INSTRUMENT"))
+    change = legs.add_mutually_exclusive_group()
+    change.add_argument("--set", nargs="+", metavar="SPEC", dest="legs",
+                        help=f"replace the extra legs (beyond main and hedge), each {LEG_SPEC_HELP}")
+    change.add_argument("--clear", action="store_true", help="remove the extra legs")
+
+    delete = commands.add_parser("delete", parents=[common], help="delete a trade")
+    delete.add_argument("key", nargs=3, metavar=("STRATEGY", "DATE", "INSTRUMENT"))
+
+    stats = commands.add_parser("stats", parents=[common], help="print totals or grouped statistics")
+    stats.add_argument("--by", choices=["strategy", "instrument", "month"],
+                       help="group statistics (needs NumPy)")
+
+    pnl = commands.add_parser("pnl", parents=[common],
+                              help="check entered P&L against the legs and lot sizes (needs NumPy)")
+    pnl.add_argument("--lot-size", action="append", default=[], metavar="INSTRUMENT=N",
+                     help="set an instrument's lot size in the journal's lot size table")
+    rewrite = pnl.add_mutually_exclusive_group()
+    rewrite.add_argument("--recompute", action="store_true",
+                         help="replace every P&L that disagrees, and fill in missing ones")
+    rewrite.add_argument("--fill", action="store_true", help="only fill in trades with no P&L")
+
+    risk = commands.add_parser("risk", parents=[common],
+                               help="mark open legs to market and sum their Greeks (needs NumPy)")
+    risk.add_argument("--prices", help="price snapshot CSV (default: prices.csv next to the journal)")
+    risk.add_argument("--as-of", default="", help="date the prices are from (default: today)")
+    risk.add_argument("--rate", type=float, help="risk-free rate, e.g. 0.07")
+    risk.add_argument("--legs", action="store_true", help="print every open leg instead of the totals")
+
+    export = commands.add_parser("export", parents=[common], help="copy the journal to another file")
+    export.add_argument("target", help="CSV file or SQLite database to write")
+    return parser
+
+
+DUPLICATE = "Trade with same Strategy Name, Trade Date, and Instrument already exists."
+NOT_FOUND = "Specified trade does not exist."
+
+
+def field_values(args):
+    return {h: getattr(args, h) for h in HEADERS}
+
+
+def write_rows(headers, rows, out=None):
+    writer = csv.writer(out or sys.stdout, lineterminator="\n")
+    writer.writerow(headers)
+    writer.writerows(rows)
+
+
+def run_add(args):
+    book = TradeBook(args.journal)
+    try:
+        row = book.add(field_values(args), args.hedged, args.legs)
+        legs = book.store.legs.get(book.store.key_index[tuple(row[:3])], [])
+    except DuplicateTradeError:
+        raise ValueError(DUPLICATE)
+    finally:
+        book.close()
+    print(f"Trade '{row[0]}' added.")
+    computed = pnl_disagreement(row, book.lot_sizes.get(row[2]), extra_legs=legs)
+    if computed is not None:
+        print(f"warning: P&L {row[-1]} differs from {format_number(computed)} worked out from the legs.",
+              file=sys.stderr)
+
+
+def run_query(args):
+    filters = {name: getattr(args, name) for name in FILTERS}
+    if not args.sort:
+        found = sql_search(args.journal, args.key, args.limit, **filters)
+        if found is not None:
+            write_rows(*found)
+            return
+    book = TradeBook(args.journal)
+    try:
+        if args.key:
+            row = book.find(args.key)
+            rows = [row] if row else []
+        else:
+            rows = book.search(args.sort, args.desc, args.limit, **filters)
+        write_rows(book.store.headers, rows)
+    finally:
+        book.close()
+
+
+def run_update(args):
+    book = TradeBook(args.journal)
+    try:
+        if book.find(args.key) is None:
+            raise ValueError(NOT_FOUND)
+        book.update(args.key, field_values(args))
+    except DuplicateTradeError:
+        raise ValueError(DUPLICATE)
+    finally:
+        book.close()
+    print(f"Trade '{args.key[0]}' updated.")
+
+
+def run_legs(args):
+    book = TradeBook(args.journal)
+    try:
+        if args.legs or args.clear:
+            book.set_legs(args.key, args.legs or [])
+        legs = book.legs(args.key)
+    except KeyError:
+        raise ValueError(NOT_FOUND)
+    finally:
+        book.close()
+    # The trade's own main and hedge columns come first, then the extra legs.
+    write_rows(["Leg"] + LEG_FIELDS, ([number] + leg for number, leg in enumerate(legs, 1)))
+
+
+def run_delete(args):
+    book = TradeBook(args.journal)
+    try:
+        book.delete(args.key)
+    except KeyError:
+        raise ValueError(NOT_FOUND)
+    finally:
+        book.close()
+    print(f"Trade '{args.key[0]}' deleted.")
+
+
+def run_stats(args):
+    if not args.by:
+        for name, value in totals_summary(journal_totals(args.journal)).items():
+            print(f"{name}: {value:.2f}" if isinstance(value, float) else f"{name}: {value}")
+        return
+    from analytics import GROUPINGS, STAT_COLUMNS, format_stat
+    book = TradeBook(args.journal)
+    try:
+        stats = book.stats(GROUPINGS[args.by.capitalize()])
+    finally:
+        book.close()
+    write_rows(["Group"] + STAT_COLUMNS,
+               ([label] + [format_stat(k, v) for k, v in values.items()] for label, values in stats))
+
+
+def run_pnl(args):
+    lot_sizes = LotSizes(lot_sizes_path(args.journal))
+    if args.lot_size:
+        sizes = {}
+        for value in args.lot_size:
+            name, _, size = value.partition("=")
+            try:
+                sizes[name.strip()] = float(size)
+            except ValueError:
+                sizes[name.strip()] = 0
+            if not name.strip() or not sizes[name.strip()] > 0:
+                raise ValueError(f"bad lot size '{value}', expected INSTRUMENT=N")
+        lot_sizes.update(sizes)
+    book = TradeBook(args.journal)
+    try:
+        if args.recompute or args.fill:
+            count = book.recompute_pnl(missing_only=args.fill)
+            print(f"P&L of {count} trades recomputed.")
+            return
+        check = book.check_pnl()
+        positions = check.disagreeing()
+        rows = (book.store.rows[check.ids[i]] for i in positions.tolist())
+        write_rows(["Strategy_Name", "Trade_Date", "Instrument", "P&L", "Computed_P&L"],
+                   (row[:3] + [row[-1], format_number(value)]
+                    for row, value in zip(rows, check.computed[positions].tolist())))
+        print(f"{len(positions)} of {len(check)} trades disagree; {len(check.missing())} without a P&L "
+              f"can be filled in (--fill).", file=sys.stderr)
+        if check.unknown_lot_sizes:
+            print(f"No lot size for: {', '.join(check.unknown_lot_sizes)} ({lot_sizes.path})", file=sys.stderr)
+    finally:
+        book.close()
+
+
+# The legs table's numeric side and type back as text.
+LEG_SIDES = {1.0: "SELL", -1.0: "BUY"}
+LEG_TYPES = {1.0: "CE", 0.0: "PE"}
+
+
+def format_leg_number(value):
+    return format_number(value) if value == value else "-"
+
+
+def format_leg_date(value):
+    return format_date(int(value)) if value == value else "-"
+
+
+def run_risk(args):
+    from risk import CONTRACT_COLUMNS, RISK_COLUMNS, format_risk
+    as_of = None
+    if args.as_of:
+        as_of = parse_date(args.as_of)
+        if as_of is None:
+            raise ValueError(f"'{args.as_of}' is not a valid date (DD-MM-YYYY or YYYY-MM-DD).")
+    book = TradeBook(args.journal)
+    try:
+        risk = book.risk(args.prices)
+        if args.rate is not None:
+            risk.rate = args.rate
+        if args.legs:
+            legs = risk.open_legs(as_of)
+            columns = {name: column[legs["position"]].tolist() for name, column in risk.legs.columns().items()}
+            names = CONTRACT_COLUMNS + ["Unrealized_P&L"]
+            values = {name: legs[name].tolist() for name in names}
+            write_rows(["Strategy_Name", "Trade_Date", "Instrument", "Buy/Sell", "Strike_Price", "Type",
+                        "Expiry_Date", "Lots"] + names,
+                       (book.store.rows[rid][:3] +
+                        [LEG_SIDES.get(columns["sign"][i], "-"), format_leg_number(columns["strike"][i]),
+                         LEG_TYPES.get(columns["call"][i], "-"), format_leg_date(columns["expiry"][i]),
+                         format_leg_number(columns["lots"][i])] +
+                        [format_risk(name, values[name][i]) for name in names]
+                        for i, rid in enumerate(legs["trade"].tolist())))
+            unpriced = sum(value != value for value in values["Unrealized_P&L"])
+        else:
+            groups = risk.by_position(as_of)
+            write_rows(["Strategy_Name", "Instrument"] + RISK_COLUMNS,
+                       ([*label] + [format_risk(name, value) for name, value in values.items()]
+                        for label, values in groups))
+            unpriced = sum(values["Unpriced"] for label, values in groups)
+    finally:
+        book.close()
+    if unpriced:
+        print(f"{unpriced} open legs have no price in {risk.snapshot.path} or no lot size; "
+              "they are left out of the totals.", file=sys.stderr)
+
+
+def run_export(args):
+    count = copy_journal(args.journal, args.target)
+    print(f"Exported {count} trades from {args.journal} to {args.target}.")
+
+
+RUNNERS = {"add": run_add, "query": run_query, "update": run_update, "delete": run_delete,
+           "legs": run_legs, "stats": run_stats, "pnl": run_pnl, "risk": run_risk,
+           "export": run_export}
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        RUNNERS[args.command](args)
+    except ValueError as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
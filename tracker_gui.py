@@ -0,0 +1,1027 @@
+import tkinter as tk
+from tkinter import ttk, messagebox, filedialog
+
+from storage import FILE_NAME, HEADERS
+from trade_store import TradeStore, DuplicateTradeError, trade_key, paused_gc, ADDED, UPDATED, DELETED, LOADED
+from trade_api import build_trade, merge_update, resolve_key, stored_key, canonical_key
+from background import BackgroundIO
+from virtual_table import VirtualTable, PAGE_SIZE
+from trade_view import TradeView, parse_number
+from dates import parse_date, format_date, today
+from tradebook_import import import_tradebook
+from pnl import LotSizes, lot_sizes_path, pnl_disagreement, format_number
+from legs import parse_leg, format_leg
+from metrics import METRICS, SUMMARY_COLUMNS, format_summary
+
+# Rows per chunk the loading worker hands to the Tk thread. Smaller than
+# trade_store.LOAD_CHUNK (sized for a headless load) so that inserting one
+# chunk fits in a BackgroundIO poll and the window stays responsive.
+STREAM_CHUNK = 5000
+# How often to look for trades other instances saved to the same journal.
+FOLLOW_MS = 1000
+# Disagreeing trades listed by name in the P&L check; the rest are counted.
+PNL_SHOWN = 10
+
+
+def text_legs(text, expiry):
+    # Extra legs typed into a Text box, one per line; blank lines skipped.
+    expiry = expiry.strip()
+    return [parse_leg(line, expiry) for line in text.get("1.0", tk.END).splitlines() if line.strip()]
+
+class OptionSellingTracker(tk.Tk):
+    def __init__(self, file_name=FILE_NAME, page_size=PAGE_SIZE):
+        super().__init__()
+        self.page_size = page_size
+        self.title("Option Selling Tracker")
+        self.geometry("1150x680")
+        self.minsize(1000, 600)
+        style = ttk.Style(self)
+        style.theme_use("clam")
+        style.configure("TLabel", font=("Segoe UI", 11), background="#f5f7fa")
+        style.configure("TButton", font=("Segoe UI", 11), padding=6)
+        style.configure("Header.TLabel", font=("Segoe UI Semibold", 14))
+        style.configure("Treeview.Heading", font=("Segoe UI Semibold", 12), background="#506482", foreground="white")
+        style.configure("Treeview", font=("Segoe UI", 10), rowheight=26)
+        self.configure(bg="#f5f7fa")
+
+        # All file I/O runs on the BackgroundIO worker; the store's in-memory
+        # copy is only ever touched from the Tk thread.
+        self.io = BackgroundIO(self, on_busy=self.on_io_busy, on_progress=self.on_io_progress)
+        self.store = TradeStore(file_name)
+        self.store.writer = self.io.write
+        self.view = TradeView(self.store)
+        self.file_name = file_name
+        self.lot_sizes = LotSizes(lot_sizes_path(file_name))
+        self.leg_table = None
+        self.sort_column = None
+        self.sort_descending = False
+        self.filters = {}
+        # Views waiting for the idle refresh after store changes.
+        self.stale = set()
+        
+        # Top frame for title and Clear All button
+        top_frame = ttk.Frame(self, padding=(10, 12), style="TFrame")
+        top_frame.pack(fill=tk.X)
+        title_label = ttk.Label(top_frame, text="Option Selling Tracker", style="Header.TLabel")
+        title_label.pack(side=tk.LEFT)
+        clear_btn = ttk.Button(top_frame, text="Clear All Trades", command=self.clear_all_records)
+        clear_btn.pack(side=tk.RIGHT, padx=5)
+        import_btn = ttk.Button(top_frame, text="Import Tradebook", command=self.import_tradebook)
+        import_btn.pack(side=tk.RIGHT, padx=5)
+        pnl_btn = ttk.Button(top_frame, text="Check P&L", command=self.check_pnl)
+        pnl_btn.pack(side=tk.RIGHT, padx=5)
+        
+        # Notebook for tabs
+        self.notebook = ttk.Notebook(self)
+        self.notebook.pack(fill=tk.BOTH, expand=True, padx=10, pady=10)
+        
+        # Create tabs
+        self.create_add_tab()
+        self.create_display_tab()
+        self.create_update_tab()
+        self.create_search_tab()
+        self.create_expiry_tab()
+        self.create_analytics_tab()
+        self.create_risk_tab()
+        self.create_diagnostics_tab()
+        
+        # Bottom status frame
+        bottom_frame = ttk.Frame(self, padding=10)
+        bottom_frame.pack(fill=tk.X, side=tk.BOTTOM)
+        self.status_var = tk.StringVar()
+        self.status_var.set("Ready")
+        status_label = ttk.Label(bottom_frame, textvariable=self.status_var, anchor=tk.W)
+        status_label.pack(side=tk.LEFT)
+        # Timing of the last measured operation, while metrics are on.
+        self.timing_var = tk.StringVar()
+        ttk.Label(bottom_frame, textvariable=self.timing_var, anchor=tk.E).pack(side=tk.RIGHT, padx=5)
+        self.cancel_btn = ttk.Button(bottom_frame, text="Cancel", command=self.io.cancel)
+        self.io_progress = ttk.Progressbar(bottom_frame, length=160, maximum=100)
+        
+        self.store.subscribe(self.on_store_change)
+        self.following = False
+        self.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.start_loading()
+        self.after(FOLLOW_MS, self.follow_journal)
+
+    def start_loading(self):
+        self.status_var.set("Loading trades...")
+        self.io.submit(self.stream_trades, on_done=self.on_trades_loaded,
+                       on_error=self.on_load_error, cancellable=True)
+
+    def stream_trades(self, progress, cancelled):
+        # Runs on the worker: parse the journal and hand it to the Tk thread
+        # in chunks so the table fills while the file streams in. Pausing the
+        # collector here also covers the Tk thread inserting those chunks.
+        with paused_gc():
+            headers, rows, records = self.store.backend.load(progress)
+            self.io.call_soon(self.store.begin_load, headers)
+            chunk = []
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) == STREAM_CHUNK:
+                    self.io.call_soon(self.store.load_rows, chunk)
+                    chunk = []
+                    if cancelled():
+                        rows.close()
+                        return False
+            self.io.call_soon(self.store.load_rows, chunk)
+            self.io.call_soon(self.store.end_load, list(records))
+        return True
+
+    def on_trades_loaded(self, completed):
+        if completed:
+            self.status_var.set(f"Loaded {len(self.store)} trades.")
+        else:
+            self.status_var.set(f"Loading cancelled: showing {len(self.store)} trades, editing disabled.")
+        self.show_timing()
+
+    def on_load_error(self, exc):
+        messagebox.showerror("Load Failed", f"Could not load trades: {exc}")
+        self.status_var.set("Loading failed.")
+
+    def on_write_error(self, exc):
+        messagebox.showerror("Save Failed", f"The last change could not be saved: {exc}\nReloading trades from disk.")
+        self.start_loading()
+
+    def on_io_busy(self, busy, cancellable):
+        if cancellable:
+            self.cancel_btn.pack(side=tk.RIGHT, padx=5)
+        else:
+            self.cancel_btn.pack_forget()
+        if busy:
+            if not self.io_progress.winfo_ismapped():
+                self.io_progress.config(mode="indeterminate")
+                self.io_progress.pack(side=tk.RIGHT, padx=5)
+                self.io_progress.start(15)
+        else:
+            self.io_progress.stop()
+            self.io_progress.pack_forget()
+
+    def on_io_progress(self, fraction, text=""):
+        self.io_progress.stop()
+        self.io_progress.config(mode="determinate", value=fraction * 100)
+        self.status_var.set(text or f"Loading trades... {fraction:.0%}")
+
+    def follow_journal(self):
+        # The journal's tail is read on the worker and applied here. Skipped
+        # while this window's own writes are queued, so they reach the file
+        # before anything read back from it is applied over them, and while
+        # the last read is still out.
+        try:
+            if not self.io.pending and not self.following:
+                self.following = True
+                self.io.check(self.store.changes, self.on_journal_changes, self.on_follow_error)
+            # Writes finish on the worker; pick up their timings here.
+            self.show_timing()
+        finally:
+            self.after(FOLLOW_MS, self.follow_journal)
+
+    def on_journal_changes(self, records):
+        self.following = False
+        if records is None:
+            self.status_var.set("The journal was rewritten by another writer; reloading...")
+            self.start_loading()
+        elif records:
+            count = self.store.apply_changes(records)
+            if count:
+                self.status_var.set(f"Applied {count} changes saved by another writer.")
+
+    def on_follow_error(self, exc):
+        self.following = False
+        self.status_var.set(f"Could not read changes from the journal: {exc}")
+
+    def show_timing(self):
+        if METRICS.enabled:
+            self.timing_var.set(METRICS.format_last())
+
+    def require_loaded(self):
+        if not self.store.loaded:
+            messagebox.showwarning("Still Loading", "Trades are still loading (or loading was cancelled); try again once they are loaded.")
+            return False
+        return True
+
+    def on_close(self):
+        self.status_var.set("Saving...")
+        self.io.cancel()
+        self.io.shutdown()
+        self.store.close()
+        self.destroy()
+
+    def create_add_tab(self):
+        self.add_tab = ttk.Frame(self.notebook, padding=10)
+        self.notebook.add(self.add_tab, text="Add Trade")
+        labels = [
+            "Strategy Name", "Trade Date (YYYY-MM-DD)", "Instrument", "Strike Price", "Buy/Sell",
+            "Expiry Date (YYYY-MM-DD)", "Type (CE/PE)", "Lots", "Entry Price", "Exit Price",
+            "Have you hedged your position? (y/n)",
+            "Hedged Strike Price", "Hedged Buy/Sell", "Hedged Entry Price", "Hedged Exit Price",
+            "Margin Used", "Holding Period (Days)", "P&L (blank to compute)"
+        ]
+        self.entries = {}
+        for i, text in enumerate(labels):
+            lbl = ttk.Label(self.add_tab, text=text + ":")
+            lbl.grid(row=i, column=0, sticky=tk.W, pady=4, padx=5)
+            entry = ttk.Entry(self.add_tab, width=32)
+            entry.grid(row=i, column=1, sticky=tk.W, pady=4)
+            self.entries[text] = entry
+        
+        hedged_fields = ["Hedged Strike Price", "Hedged Buy/Sell", "Hedged Entry Price", "Hedged Exit Price"]
+        for field in hedged_fields:
+            self.entries[field].config(state="disabled")
+
+        def on_hedged_focusout(event):
+            val = self.entries["Have you hedged your position? (y/n)"].get().strip().lower()
+            state = "normal" if val == "y" else "disabled"
+            for field in hedged_fields:
+                self.entries[field].config(state=state)
+                if state == "disabled":
+                    self.entries[field].delete(0, tk.END)
+
+        self.entries["Have you hedged your position? (y/n)"].bind("<FocusOut>", on_hedged_focusout)
+
+        ttk.Label(self.add_tab, text="Extra Legs (one per line:\nSIDE STRIKE TYPE LOTS ENTRY [EXIT [EXPIRY]]):").grid(
+            row=0, column=2, sticky=tk.NW, padx=(20, 5), pady=4)
+        self.legs_text = tk.Text(self.add_tab, width=44, height=8)
+        self.legs_text.grid(row=1, column=2, rowspan=6, sticky=tk.NW, padx=(20, 5))
+
+        add_btn = ttk.Button(self.add_tab, text="Add Trade", command=self.add_trade)
+        add_btn.grid(row=len(labels), column=0, columnspan=2, pady=12, sticky=tk.EW)
+
+    def add_trade(self):
+        if not self.require_loaded():
+            return
+        vals = {k: v.get().strip() for k, v in self.entries.items()}
+        hedged = vals.pop("Have you hedged your position? (y/n)").lower() == "y"
+        lot_sizes = self.lot_sizes.table()
+        try:
+            legs = text_legs(self.legs_text, vals["Expiry Date (YYYY-MM-DD)"])
+            row = build_trade(dict(zip(HEADERS, vals.values())), hedged, lot_sizes, legs)
+        except ValueError as exc:
+            messagebox.showwarning("Missing Input", str(exc))
+            return
+        if stored_key(self.store, trade_key(row)) is not None:
+            messagebox.showerror("Duplicate Trade", "Trade with same Strategy Name, Trade Date, and Instrument already exists.")
+            return
+        computed = pnl_disagreement(row, lot_sizes.get(row[2]), extra_legs=legs)
+        if computed is not None and not messagebox.askyesno(
+                "P&L Differs", f"The P&L entered ({row[-1]}) differs from {format_number(computed)} "
+                               "worked out from the legs and lot size. Save it anyway?"):
+            return
+        self.store.add(row, legs)
+        messagebox.showinfo("Success", "Trade added successfully!")
+        self.status_var.set(f"Trade '{vals['Strategy Name']}' added.")
+        self.clear_form()
+        self.notebook.select(self.display_tab)
+
+    def clear_form(self):
+        for entry in self.entries.values():
+            entry.delete(0, tk.END)
+        self.legs_text.delete("1.0", tk.END)
+
+    def create_display_tab(self):
+        self.display_tab = ttk.Frame(self.notebook, padding=10)
+        self.notebook.add(self.display_tab, text="Display Trades")
+
+        filter_frame = ttk.Frame(self.display_tab)
+        filter_frame.pack(fill=tk.X, pady=(0, 6))
+        self.filter_entries = {}
+        for name, text, width in [("strategy", "Strategy", 16), ("instrument", "Instrument", 12),
+                                  ("date_from", "From", 11), ("date_to", "To", 11)]:
+            ttk.Label(filter_frame, text=text + ":").pack(side=tk.LEFT, padx=(6, 2))
+            entry = ttk.Entry(filter_frame, width=width)
+            entry.pack(side=tk.LEFT)
+            entry.bind("<Return>", lambda e: self.apply_filters())
+            self.filter_entries[name] = entry
+        ttk.Label(filter_frame, text="Type:").pack(side=tk.LEFT, padx=(6, 2))
+        self.filter_type = ttk.Combobox(filter_frame, values=["All", "CE", "PE"], width=5, state="readonly")
+        self.filter_type.set("All")
+        self.filter_type.pack(side=tk.LEFT)
+        ttk.Label(filter_frame, text="P&L:").pack(side=tk.LEFT, padx=(6, 2))
+        self.filter_pl = ttk.Combobox(filter_frame, values=["All", "Profit", "Loss"], width=7, state="readonly")
+        self.filter_pl.set("All")
+        self.filter_pl.pack(side=tk.LEFT)
+        ttk.Button(filter_frame, text="Clear", command=self.clear_filters).pack(side=tk.RIGHT, padx=4)
+        ttk.Button(filter_frame, text="Filter", command=self.apply_filters).pack(side=tk.RIGHT, padx=4)
+
+        self.trade_table = VirtualTable(self.display_tab, self.table_row,
+                                        page_size=self.page_size, columns=self.store.headers)
+        self.trade_table.pack(fill=tk.BOTH, expand=True)
+        for col in self.store.headers:
+            self.trade_table.tree.heading(col, text=col, command=lambda c=col: self.sort_by(c))
+            self.trade_table.tree.column(col, anchor=tk.CENTER, width=120)
+        self.totals_frame = ttk.Frame(self.display_tab)
+        self.totals_frame.pack(pady=(5, 10), padx=0, fill=tk.X)
+        self.total_trades_label = tk.Label(self.totals_frame, font=("Segoe UI Semibold", 12),
+                                           width=16, anchor="center", bg="#e3eaff", relief="solid")
+        self.total_pl_label = tk.Label(self.totals_frame, font=("Segoe UI Semibold", 12),
+                                       width=20, anchor="center", bg="#d6fde3", relief="solid")
+        self.winning_label = tk.Label(self.totals_frame, font=("Segoe UI Semibold", 12),
+                                      width=18, anchor="center", bg="#f7e3ff", relief="solid")
+        self.losing_label = tk.Label(self.totals_frame, font=("Segoe UI Semibold", 12),
+                                     width=18, anchor="center", bg="#ffe3e3", relief="solid")
+        self.total_trades_label.pack(side=tk.LEFT, padx=6, pady=2, fill=tk.X, expand=True)
+        self.total_pl_label.pack(side=tk.LEFT, padx=6, pady=2, fill=tk.X, expand=True)
+        self.winning_label.pack(side=tk.LEFT, padx=6, pady=2, fill=tk.X, expand=True)
+        self.losing_label.pack(side=tk.LEFT, padx=6, pady=2, fill=tk.X, expand=True)
+        delete_btn = ttk.Button(self.display_tab, text="Delete Selected Trade", command=self.delete_selected_trade)
+        delete_btn.pack(pady=8)
+
+    def delete_selected_trade(self):
+        if not self.require_loaded():
+            return
+        selected = self.trade_table.selection()
+        if not selected:
+            messagebox.showwarning("No Selection", "Please select a trade to delete.")
+            return
+        confirm = messagebox.askyesno("Confirm Delete", "Are you sure you want to delete the selected trade?")
+        if not confirm:
+            return
+        with METRICS.timed("delete_selected_trade") as span:
+            row = self.store.rows.get(selected[0])
+            if row is not None:
+                key = trade_key(row)
+                self.store.delete(key)
+                span.rows = 1
+        self.show_timing()
+        if row is None:
+            messagebox.showerror("Error", "Trade not found in file.")
+            return
+        messagebox.showinfo("Deleted", f"Trade '{key[0]}' deleted successfully.")
+        self.status_var.set(f"Trade '{key[0]}' deleted.")
+
+    def load_trades_into_table(self):
+        # The table only holds the visible window; point it at the store's
+        # row ids (sorted and filtered through the view) and let it pull rows
+        # as it scrolls.
+        with METRICS.timed("load_trades_into_table") as span:
+            self.trade_table.set_source(self.view.rows(self.sort_column, self.sort_descending, self.filters))
+            self.update_totals()
+            span.rows = len(self.trade_table.source)
+        self.show_timing()
+
+    def sort_by(self, column):
+        if self.sort_column == column:
+            self.sort_descending = not self.sort_descending
+        else:
+            self.sort_column = column
+            self.sort_descending = False
+        for col in self.store.headers:
+            arrow = ""
+            if col == column:
+                arrow = " \u25bc" if self.sort_descending else " \u25b2"
+            self.trade_table.tree.heading(col, text=col + arrow)
+        self.load_trades_into_table()
+
+    def apply_filters(self):
+        filters = {name: entry.get().strip() for name, entry in self.filter_entries.items()}
+        for name in ("date_from", "date_to"):
+            if filters[name] and parse_date(filters[name]) is None:
+                messagebox.showwarning("Invalid Date", f"'{filters[name]}' is not a valid date.")
+                return
+        if self.filter_type.get() != "All":
+            filters["option_type"] = self.filter_type.get()
+        if self.filter_pl.get() != "All":
+            filters["pl_sign"] = self.filter_pl.get().lower()
+        self.filters = {name: value for name, value in filters.items() if value}
+        self.load_trades_into_table()
+        self.status_var.set(f"{len(self.trade_table.source)} trades shown.")
+
+    def clear_filters(self):
+        for entry in self.filter_entries.values():
+            entry.delete(0, tk.END)
+        self.filter_type.set("All")
+        self.filter_pl.set("All")
+        self.filters = {}
+        self.load_trades_into_table()
+
+    def table_row(self, rid):
+        # A table can still list a deleted trade until the idle refresh
+        # rebuilds it; such a row shows blank.
+        return self.store.rows.get(rid, ())
+
+    def on_store_change(self, event, rid, old_row, new_row):
+        # Search and expiry results are row ids too; rebuild them so none go
+        # stale (once loading is done, not for every chunk). Rebuilds are
+        # O(N), so they wait for the idle refresh: a followed batch of up
+        # to FOLLOW_EVENTS changes costs one, not one per change.
+        if not self.store.loaded:
+            self.search_table.set_source([])
+            self.expiry_table.set_source([])
+        else:
+            self.schedule_refresh("search", "expiries")
+        if event == LOADED:
+            # rid is the range of row ids that were just loaded.
+            if not (self.sort_column or self.filters):
+                self.trade_table.extend(rid)
+            elif self.store.loaded:
+                # Rows from add_many; during a load the final RESET redraws.
+                self.schedule_refresh("trades")
+            self.update_totals()
+            return
+        if self.sort_column or self.filters:
+            # The view's caches were already patched for this change; only
+            # the projection needs rebuilding.
+            self.schedule_refresh("trades")
+            self.update_totals()
+            return
+        if event == ADDED:
+            self.trade_table.append(rid)
+        elif event == UPDATED:
+            self.trade_table.refresh_row(rid)
+        elif event == DELETED:
+            self.trade_table.remove(rid)
+        else:
+            self.load_trades_into_table()
+            return
+        self.update_totals()
+
+    def schedule_refresh(self, *views):
+        if not self.stale:
+            self.after_idle(self.refresh_stale)
+        self.stale.update(views)
+
+    def refresh_stale(self):
+        stale, self.stale = self.stale, set()
+        if "trades" in stale:
+            self.load_trades_into_table()
+        if "search" in stale:
+            self.refresh_search()
+        if "expiries" in stale:
+            if self.expiry_tab_visible():
+                self.refresh_expiries()
+            else:
+                self.expiry_table.set_source([])
+
+    def update_totals(self):
+        totals = self.store.totals
+        # Rounding keeps float drift from the running sum off the label.
+        total_pl = round(totals.total_pl, 2) + 0.0
+        self.total_trades_label.config(text=f"Total Trades: {totals.total_trades}")
+        if total_pl < 0:
+            self.total_pl_label.config(text=f"Total P&L: {total_pl:.2f}", fg="red")
+        else:
+            self.total_pl_label.config(text=f"Total P&L: {total_pl:.2f}", fg="green")
+        self.winning_label.config(text=f"Winning Trades: {totals.winning_trades}")
+        self.losing_label.config(text=f"Losing Trades: {totals.losing_trades}")
+
+    def create_update_tab(self):
+        self.update_tab = ttk.Frame(self.notebook, padding=10)
+        self.notebook.add(self.update_tab, text="Update Trade")
+
+        key_frame = ttk.LabelFrame(self.update_tab, text="Find Trade to Update", padding=(10, 10))
+        key_frame.pack(fill=tk.X, pady=10)
+
+        ttk.Label(key_frame, text="Strategy Name:").grid(row=0, column=0, padx=5, sticky=tk.W)
+        self.upd_strategy = ttk.Entry(key_frame, width=25)
+        self.upd_strategy.grid(row=0, column=1, padx=5, pady=4)
+
+        ttk.Label(key_frame, text="Trade Date (YYYY-MM-DD):").grid(row=1, column=0, padx=5, sticky=tk.W)
+        self.upd_date = ttk.Entry(key_frame, width=25)
+        self.upd_date.grid(row=1, column=1, padx=5, pady=4)
+
+        ttk.Label(key_frame, text="Instrument:").grid(row=2, column=0, padx=5, sticky=tk.W)
+        self.upd_instrument = ttk.Entry(key_frame, width=25)
+        self.upd_instrument.grid(row=2, column=1, padx=5, pady=4)
+
+        find_btn = ttk.Button(key_frame, text="Find Trade", command=self.find_trade_for_update)
+        find_btn.grid(row=3, column=0, columnspan=2, pady=10)
+
+        # Scrollable canvas and frame for update form fields
+        self.update_form_canvas = tk.Canvas(self.update_tab)
+        self.update_form_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar = ttk.Scrollbar(self.update_tab, orient=tk.VERTICAL, command=self.update_form_canvas.yview)
+        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.update_form_canvas.configure(yscrollcommand=scrollbar.set)
+        self.update_form_canvas.bind('<Configure>', lambda e: self.update_form_canvas.configure(scrollregion=self.update_form_canvas.bbox("all")))
+        self.update_form_frame = ttk.Frame(self.update_form_canvas)
+        self.update_form_canvas.create_window((0, 0), window=self.update_form_frame, anchor="nw")
+        self.update_form_frame.pack_forget()
+
+        # Fixed frame below the scrollable area for the Save button
+        self.save_btn_frame = ttk.Frame(self.update_tab, padding=(10, 5))
+        self.save_btn_frame.pack(fill=tk.X, side=tk.BOTTOM)
+
+        self.save_btn = ttk.Button(self.save_btn_frame, text="Save Changes", command=self.save_updated_trade)
+        self.save_btn.pack(anchor=tk.E)
+
+        self.update_entries = {}
+
+    def find_trade_for_update(self):
+        strategy = self.upd_strategy.get().strip()
+        date = self.upd_date.get().strip()
+        instrument = self.upd_instrument.get().strip()
+        if not (strategy and date and instrument):
+            messagebox.showwarning("Missing Keys", "Please enter Strategy Name, Trade Date, and Instrument to find trade.")
+            return
+        if not len(self.store):
+            messagebox.showinfo("No Data", "No trade records found.")
+            return
+
+        with METRICS.timed("find_trade_for_update") as span:
+            found = self.store.get(resolve_key(self.store, (strategy, date, instrument)))
+            if found:
+                self.fill_update_form(found)
+                span.rows = 1
+        self.show_timing()
+        if not found:
+            messagebox.showinfo("Not Found", "Specified trade does not exist.")
+            self.update_form_frame.pack_forget()
+
+    def fill_update_form(self, found):
+        headers = self.store.headers
+        for widget in self.update_form_frame.winfo_children():
+            widget.destroy()
+        self.update_entries.clear()
+        self.update_form_frame.pack(fill=tk.BOTH, expand=True)
+
+        lbl = ttk.Label(self.update_form_frame, text="Edit fields and click Save. Leave blank to keep current value.")
+        lbl.pack(pady=5)
+
+        # Create main frame for inputs, with horizontal layout
+        main_frame = ttk.Frame(self.update_form_frame)
+        main_frame.pack(fill=tk.BOTH, expand=True)
+    
+        # Left scrollable frame for first 17 fields
+        scroll_canvas = tk.Canvas(main_frame)
+        scroll_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+
+        scrollbar = ttk.Scrollbar(main_frame, orient=tk.VERTICAL, command=scroll_canvas.yview)
+        scrollbar.pack(side=tk.LEFT, fill=tk.Y)
+
+        scroll_canvas.configure(yscrollcommand=scrollbar.set)
+        scroll_canvas.bind('<Configure>', lambda e: scroll_canvas.configure(scrollregion=scroll_canvas.bbox("all")))
+
+        scrollable_frame = ttk.Frame(scroll_canvas)
+        scroll_canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
+
+        # Add first 17 fields in scrollable_frame
+        for idx, col in enumerate(headers[:17]):  # first 17 fields
+            ttk.Label(scrollable_frame, text=col + ":").grid(row=idx, column=0, sticky=tk.W, padx=5, pady=3)
+            entry = ttk.Entry(scrollable_frame, width=30)
+            value = found[idx] if idx < len(found) else ""
+            entry.insert(0, value)
+            entry.grid(row=idx, column=1, sticky=tk.W, padx=5, pady=3)
+            self.update_entries[col] = entry
+
+        # Extra legs beyond the main and hedge columns, one per line.
+        legs = self.store.legs.get(self.store.key_index[trade_key(found)], [])
+        ttk.Label(scrollable_frame, text="Extra Legs (one per line:\nSIDE STRIKE TYPE LOTS ENTRY [EXIT [EXPIRY]]):").grid(
+            row=0, column=2, sticky=tk.NW, padx=(20, 5), pady=3)
+        self.update_legs_text = tk.Text(scrollable_frame, width=44, height=8)
+        self.update_legs_text.insert("1.0", "\n".join(format_leg(leg) for leg in legs))
+        self.update_legs_text.grid(row=1, column=2, rowspan=6, sticky=tk.NW, padx=(20, 5))
+        self.update_legs = legs
+
+    def save_updated_trade(self):
+        if not self.require_loaded():
+            return
+        updated_vals = {key: entry.get().strip() for key, entry in self.update_entries.items()}
+        orig_key = (self.upd_strategy.get().strip(), self.upd_date.get().strip(), self.upd_instrument.get().strip())
+        if not all(orig_key):
+            messagebox.showerror("Error", "Original keys missing. Please re-search trade.")
+            return
+        headers = self.store.headers
+        orig_key = resolve_key(self.store, orig_key)
+        row = self.store.get(orig_key)
+        if row:
+            try:
+                updated_row = merge_update(row, headers, updated_vals)
+                legs = text_legs(self.update_legs_text, updated_row[headers.index("Expiry_Date")])
+            except ValueError as exc:
+                messagebox.showwarning("Invalid Input", str(exc))
+                return
+            if stored_key(self.store, trade_key(updated_row)) not in (None, orig_key):
+                messagebox.showerror("Duplicate Trade", "Trade with same Strategy Name, Trade Date, and Instrument already exists.")
+                return
+            try:
+                with METRICS.timed("save_updated_trade") as span:
+                    self.store.update(orig_key, updated_row)
+                    if legs != self.update_legs:
+                        self.store.set_legs(trade_key(updated_row), legs)
+                    span.rows = 1
+            except DuplicateTradeError:
+                messagebox.showerror("Duplicate Trade", "Trade with same Strategy Name, Trade Date, and Instrument already exists.")
+                return
+            except KeyError:
+                # Deleted by another writer since it was looked up.
+                messagebox.showerror("Error", "Trade to update was not found.")
+                return
+            self.show_timing()
+            messagebox.showinfo("Success", "Trade updated successfully.")
+            self.status_var.set(f"Trade '{orig_key[0]}' updated.")
+            self.update_form_frame.pack_forget()
+            self.upd_strategy.delete(0, tk.END)
+            self.upd_date.delete(0, tk.END)
+            self.upd_instrument.delete(0, tk.END)
+            self.notebook.select(self.display_tab)
+        else:
+            messagebox.showerror("Error", "Trade to update was not found.")
+
+    def create_search_tab(self):
+        self.search_tab = ttk.Frame(self.notebook, padding=10)
+        self.notebook.add(self.search_tab, text="Search Trade")
+        frame = ttk.LabelFrame(self.search_tab, text="Search Trades By", padding=10)
+        frame.pack(fill=tk.X, pady=(0, 6))
+        self.search_entries = {}
+        fields = [
+            [("strategy", "Strategy Name"), ("instrument", "Instrument")],
+            [("date_from", "Trade Date From"), ("date_to", "To")],
+            [("expiry_from", "Expiry From"), ("expiry_to", "To")],
+            [("strike_min", "Strike Min"), ("strike_max", "Max")],
+            [("pl_min", "P&L Min"), ("pl_max", "Max")],
+        ]
+        for row, pairs in enumerate(fields):
+            for col, (name, text) in enumerate(pairs):
+                ttk.Label(frame, text=text + ":").grid(row=row, column=col * 2, sticky=tk.W, padx=5, pady=3)
+                entry = ttk.Entry(frame, width=22)
+                entry.grid(row=row, column=col * 2 + 1, sticky=tk.W, padx=5)
+                entry.bind("<Return>", lambda e: self.search_trade())
+                self.search_entries[name] = entry
+        ttk.Label(frame, text="Match:").grid(row=0, column=4, sticky=tk.W, padx=5)
+        self.search_mode = ttk.Combobox(frame, values=["Contains", "Starts with"], width=11, state="readonly")
+        self.search_mode.set("Contains")
+        self.search_mode.grid(row=0, column=5, sticky=tk.W, padx=5)
+        ttk.Label(frame, text="Type:").grid(row=1, column=4, sticky=tk.W, padx=5)
+        self.search_type = ttk.Combobox(frame, values=["All", "CE", "PE"], width=11, state="readonly")
+        self.search_type.set("All")
+        self.search_type.grid(row=1, column=5, sticky=tk.W, padx=5)
+        ttk.Button(frame, text="Search", command=self.search_trade).grid(row=3, column=4, columnspan=2, sticky=tk.EW, padx=5)
+        ttk.Button(frame, text="Clear", command=self.clear_search).grid(row=4, column=4, columnspan=2, sticky=tk.EW, padx=5)
+
+        self.search_count = ttk.Label(self.search_tab, text="Double-click a result to edit it.")
+        self.search_count.pack(anchor=tk.W)
+        self.search_filters = None
+        self.search_sort = (None, False)
+        self.search_table = VirtualTable(self.search_tab, self.table_row,
+                                         page_size=self.page_size, columns=self.store.headers)
+        self.search_table.pack(fill=tk.BOTH, expand=True)
+        for col in self.store.headers:
+            self.search_table.tree.heading(col, text=col, command=lambda c=col: self.sort_search(c))
+            self.search_table.tree.column(col, anchor=tk.CENTER, width=120)
+        self.search_table.tree.bind("<Double-1>", lambda e: self.edit_search_result())
+
+    def search_trade(self):
+        filters = {name: entry.get().strip() for name, entry in self.search_entries.items()}
+        for name, parse, kind in [("date_from", parse_date, "date"), ("date_to", parse_date, "date"),
+                                  ("expiry_from", parse_date, "date"), ("expiry_to", parse_date, "date"),
+                                  ("strike_min", parse_number, "number"), ("strike_max", parse_number, "number"),
+                                  ("pl_min", parse_number, "number"), ("pl_max", parse_number, "number")]:
+            if filters[name] and parse(filters[name]) is None:
+                messagebox.showwarning("Invalid Input", f"'{filters[name]}' is not a valid {kind}.")
+                return
+        if self.search_type.get() != "All":
+            filters["option_type"] = self.search_type.get()
+        filters = {name: value for name, value in filters.items() if value}
+        if not filters:
+            messagebox.showwarning("Missing Input", "Please enter at least one search criterion.")
+            return
+        filters["prefix"] = self.search_mode.get() == "Starts with"
+        self.search_filters = filters
+        with METRICS.timed("search_trade") as span:
+            self.refresh_search()
+            count = span.rows = len(self.search_table.source)
+        self.show_timing()
+        self.status_var.set(f"{count} matching trades found." if count else "Trade not found.")
+
+    def refresh_search(self):
+        if self.search_filters is None:
+            return
+        column, descending = self.search_sort
+        self.search_table.set_source(self.view.rows(column, descending, self.search_filters))
+        self.search_count.config(text=f"{len(self.search_table.source)} matching trades. Double-click a result to edit it.")
+
+    def sort_search(self, column):
+        current, descending = self.search_sort
+        self.search_sort = (column, not descending if current == column else False)
+        for col in self.store.headers:
+            arrow = ""
+            if col == column:
+                arrow = " \u25bc" if self.search_sort[1] else " \u25b2"
+            self.search_table.tree.heading(col, text=col + arrow)
+        self.refresh_search()
+
+    def clear_search(self):
+        for entry in self.search_entries.values():
+            entry.delete(0, tk.END)
+        self.search_mode.set("Contains")
+        self.search_type.set("All")
+        self.search_filters = None
+        self.search_table.set_source([])
+        self.search_count.config(text="Double-click a result to edit it.")
+
+    def edit_search_result(self):
+        selected = self.search_table.selection()
+        if not selected or selected[0] not in self.store.rows:
+            return
+        key = trade_key(self.store.rows[selected[0]])
+        for entry, value in zip((self.upd_strategy, self.upd_date, self.upd_instrument), key):
+            entry.delete(0, tk.END)
+            entry.insert(0, value)
+        self.notebook.select(self.update_tab)
+        self.find_trade_for_update()
+
+    def create_expiry_tab(self):
+        self.expiry_tab = ttk.Frame(self.notebook, padding=10)
+        self.notebook.add(self.expiry_tab, text="Expiries")
+        controls = ttk.Frame(self.expiry_tab)
+        controls.pack(fill=tk.X, pady=(0, 6))
+        ttk.Label(controls, text="Positions by expiry date; select an expiry to list its trades (open first).").pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Refresh", command=self.refresh_expiries).pack(side=tk.RIGHT, padx=5)
+        columns = ["Expiry", "Days Left", "Trades", "Open", "Closed"]
+        self.expiry_groups = ttk.Treeview(self.expiry_tab, show="headings", columns=columns, height=8, selectmode="browse")
+        for col in columns:
+            self.expiry_groups.heading(col, text=col)
+            self.expiry_groups.column(col, anchor=tk.CENTER, width=120)
+        self.expiry_groups.pack(fill=tk.X)
+        self.expiry_groups.bind("<<TreeviewSelect>>", lambda e: self.show_expiry_trades())
+        self.expiry_table = VirtualTable(self.expiry_tab, self.table_row,
+                                         page_size=self.page_size, columns=self.store.headers)
+        self.expiry_table.pack(fill=tk.BOTH, expand=True, pady=(6, 0))
+        for col in self.store.headers:
+            self.expiry_table.tree.heading(col, text=col)
+            self.expiry_table.tree.column(col, anchor=tk.CENTER, width=120)
+        self.expiry_ordinals = {}
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_expiry_tab_changed, add="+")
+
+    def expiry_tab_visible(self):
+        return self.notebook.select() == str(self.expiry_tab)
+
+    def on_expiry_tab_changed(self, event):
+        if self.expiry_tab_visible():
+            self.refresh_expiries()
+
+    def refresh_expiries(self):
+        selected = self.expiry_groups.selection()
+        selected = self.expiry_ordinals.get(selected[0], False) if selected else False
+        self.expiry_groups.delete(*self.expiry_groups.get_children())
+        self.expiry_ordinals = {}
+        self.expiry_table.set_source([])
+        current = today()
+        for expiry, trades, open_count in self.view.expiries():
+            if expiry is None:
+                values = ["(no valid date)", "-", trades, open_count, trades - open_count]
+            else:
+                days = expiry - current
+                values = [format_date(expiry), days if days >= 0 else "expired", trades, open_count, trades - open_count]
+            item = self.expiry_groups.insert("", tk.END, values=values)
+            self.expiry_ordinals[item] = expiry
+            if expiry == selected:
+                self.expiry_groups.selection_set(item)
+                self.expiry_groups.see(item)
+
+    def show_expiry_trades(self):
+        selected = self.expiry_groups.selection()
+        if selected:
+            self.expiry_table.set_source(self.view.expiry_rows(self.expiry_ordinals[selected[0]]))
+
+    def create_analytics_tab(self):
+        self.analytics_tab = ttk.Frame(self.notebook, padding=10)
+        self.notebook.add(self.analytics_tab, text="Analytics")
+        try:
+            from analytics import Analytics, GROUPINGS, STAT_COLUMNS
+        except ImportError:
+            ttk.Label(self.analytics_tab, text="Analytics needs NumPy (pip install numpy).").pack(pady=20)
+            self.analytics = None
+            return
+        self.analytics = Analytics(self.store)
+        self.analytics_groupings = GROUPINGS
+
+        controls = ttk.Frame(self.analytics_tab)
+        controls.pack(fill=tk.X, pady=(0, 6))
+        ttk.Label(controls, text="Group by:").pack(side=tk.LEFT, padx=5)
+        self.analytics_group = ttk.Combobox(controls, values=list(GROUPINGS), width=12, state="readonly")
+        self.analytics_group.set("Strategy")
+        self.analytics_group.pack(side=tk.LEFT)
+        self.analytics_group.bind("<<ComboboxSelected>>", lambda e: self.refresh_analytics())
+        ttk.Button(controls, text="Refresh", command=self.refresh_analytics).pack(side=tk.LEFT, padx=8)
+        self.analytics_summary = ttk.Label(controls, text="")
+        self.analytics_summary.pack(side=tk.LEFT, padx=8)
+
+        columns = ["Group"] + STAT_COLUMNS
+        self.analytics_table = ttk.Treeview(self.analytics_tab, show="headings", columns=columns, height=10)
+        for col in columns:
+            self.analytics_table.heading(col, text=col.replace("_", " "))
+            self.analytics_table.column(col, anchor=tk.CENTER, width=150 if col == "Group" else 105)
+        self.analytics_table.pack(fill=tk.BOTH, expand=True)
+
+        ttk.Label(self.analytics_tab, text="Equity curve (cumulative P&L by trade date):").pack(anchor=tk.W, pady=(8, 2))
+        self.equity_canvas = tk.Canvas(self.analytics_tab, height=160, bg="white", highlightthickness=1)
+        self.equity_canvas.pack(fill=tk.X)
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_changed, add="+")
+
+    def on_tab_changed(self, event):
+        if self.analytics is not None and self.notebook.select() == str(self.analytics_tab):
+            self.refresh_analytics()
+
+    def refresh_analytics(self):
+        from analytics import format_stat
+        grouping = self.analytics_groupings[self.analytics_group.get()]
+        stats = self.analytics.stats(grouping)
+        self.analytics_table.delete(*self.analytics_table.get_children())
+        for label, values in stats:
+            self.analytics_table.insert("", tk.END, values=[label] + [format_stat(k, v) for k, v in values.items()])
+        overall = self.analytics.stats()[0][1]
+        self.analytics_summary.config(text="  ".join(
+            f"{k.replace('_', ' ')}: {format_stat(k, overall[k])}"
+            for k in ("Win_Rate", "Expectancy", "Max_Drawdown")))
+        self.draw_equity_curve(self.analytics.equity_curve())
+
+    def create_risk_tab(self):
+        self.risk_tab = ttk.Frame(self.notebook, padding=10)
+        self.notebook.add(self.risk_tab, text="Risk")
+        try:
+            from analytics import LegTable
+            from risk import Risk, PriceSnapshot, prices_path, RISK_COLUMNS
+        except ImportError:
+            ttk.Label(self.risk_tab, text="Risk needs NumPy (pip install numpy).").pack(pady=20)
+            self.risk = None
+            return
+        if self.leg_table is None:
+            self.leg_table = LegTable(self.store)
+        self.risk = Risk(self.leg_table, PriceSnapshot(prices_path(self.file_name)), self.lot_sizes)
+
+        controls = ttk.Frame(self.risk_tab)
+        controls.pack(fill=tk.X, pady=(0, 6))
+        ttk.Label(controls, text=f"Open legs marked to {self.risk.snapshot.path}").pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Refresh", command=self.refresh_risk).pack(side=tk.RIGHT, padx=5)
+        self.risk_summary = ttk.Label(controls, text="")
+        self.risk_summary.pack(side=tk.RIGHT, padx=8)
+
+        columns = ["Strategy", "Instrument"] + RISK_COLUMNS
+        self.risk_table = ttk.Treeview(self.risk_tab, show="headings", columns=columns, height=16)
+        for col in columns:
+            self.risk_table.heading(col, text=col.replace("_", " "))
+            self.risk_table.column(col, anchor=tk.CENTER, width=150 if col == "Strategy" else 100)
+        self.risk_table.pack(fill=tk.BOTH, expand=True)
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_risk_tab_changed, add="+")
+
+    def on_risk_tab_changed(self, event):
+        if self.risk is not None and self.notebook.select() == str(self.risk_tab):
+            self.refresh_risk()
+
+    def refresh_risk(self):
+        from risk import format_risk
+        groups = self.risk.by_position()
+        self.risk_table.delete(*self.risk_table.get_children())
+        for label, values in groups:
+            self.risk_table.insert("", tk.END, values=list(label) + [format_risk(k, v) for k, v in values.items()])
+        total = sum(values["Unrealized_P&L"] for label, values in groups)
+        unpriced = sum(values["Unpriced"] for label, values in groups)
+        self.risk_summary.config(text=f"Unrealized P&L: {total:.2f}" +
+                                 (f"  ({unpriced} legs without a price or lot size)" if unpriced else ""))
+
+    def create_diagnostics_tab(self):
+        self.diagnostics_tab = ttk.Frame(self.notebook, padding=10)
+        self.notebook.add(self.diagnostics_tab, text="Diagnostics")
+        controls = ttk.Frame(self.diagnostics_tab)
+        controls.pack(fill=tk.X, pady=(0, 6))
+        self.metrics_enabled = tk.BooleanVar(value=METRICS.enabled)
+        ttk.Checkbutton(controls, text="Record timings", variable=self.metrics_enabled,
+                        command=self.toggle_metrics).pack(side=tk.LEFT, padx=5)
+        ttk.Button(controls, text="Export Trace...", command=self.export_trace).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(controls, text="Reset", command=self.reset_metrics).pack(side=tk.RIGHT, padx=5)
+        ttk.Button(controls, text="Refresh", command=self.refresh_diagnostics).pack(side=tk.RIGHT, padx=5)
+
+        columns = ["Operation"] + SUMMARY_COLUMNS
+        self.diagnostics_table = ttk.Treeview(self.diagnostics_tab, show="headings", columns=columns, height=16)
+        for col in columns:
+            self.diagnostics_table.heading(col, text=col.replace("_", " "))
+            self.diagnostics_table.column(col, anchor=tk.CENTER, width=190 if col == "Operation" else 95)
+        self.diagnostics_table.pack(fill=tk.BOTH, expand=True)
+        ttk.Label(self.diagnostics_tab, text="Percentiles are read from log-spaced histograms and are "
+                                             "within about 20% of the true value.").pack(anchor=tk.W, pady=(6, 0))
+        self.notebook.bind("<<NotebookTabChanged>>", self.on_diagnostics_tab_changed, add="+")
+
+    def on_diagnostics_tab_changed(self, event):
+        if self.notebook.select() == str(self.diagnostics_tab):
+            self.refresh_diagnostics()
+
+    def toggle_metrics(self):
+        METRICS.enable(self.metrics_enabled.get())
+        if not METRICS.enabled:
+            self.timing_var.set("")
+
+    def refresh_diagnostics(self):
+        self.diagnostics_table.delete(*self.diagnostics_table.get_children())
+        for name, values in METRICS.summary():
+            self.diagnostics_table.insert("", tk.END, values=[name] + [format_summary(k, v) for k, v in values.items()])
+
+    def reset_metrics(self):
+        METRICS.reset()
+        self.timing_var.set("")
+        self.refresh_diagnostics()
+
+    def export_trace(self):
+        path = filedialog.asksaveasfilename(title="Export Trace", defaultextension=".json",
+                                            filetypes=[("Trace files", "*.json"), ("All files", "*.*")])
+        if not path:
+            return
+        try:
+            count = METRICS.export_trace(path)
+        except OSError as exc:
+            messagebox.showerror("Export Failed", f"Could not write the trace: {exc}")
+            return
+        self.status_var.set(f"Exported {count} timed operations to {path}.")
+
+    def draw_equity_curve(self, curve):
+        canvas = self.equity_canvas
+        canvas.delete("all")
+        width = max(canvas.winfo_width(), 200)
+        height = int(canvas["height"])
+        if len(curve) < 2:
+            return
+        # Never draw more points than there are pixels across.
+        step = max(1, len(curve) // width)
+        points = curve[::step]
+        low, high = min(points.min(), 0.0), max(points.max(), 0.0)
+        scale = (height - 10) / ((high - low) or 1.0)
+        zero_y = height - 5 - (0.0 - low) * scale
+        canvas.create_line(0, zero_y, width, zero_y, fill="#bbbbbb", dash=(2, 2))
+        coords = []
+        for i, value in enumerate(points.tolist()):
+            coords.extend((i * width / (len(points) - 1), height - 5 - (value - low) * scale))
+        canvas.create_line(*coords, fill="#506482", width=2)
+
+    def import_tradebook(self):
+        if not self.require_loaded():
+            return
+        path = filedialog.askopenfilename(title="Import Tradebook",
+                                          filetypes=[("CSV files", "*.csv"), ("All files", "*.*")])
+        if not path:
+            return
+        self.status_var.set("Importing tradebook...")
+        # The worker dedups against a snapshot of the keys; each batch is
+        # added on the Tk thread, where trades entered meanwhile are dropped.
+        existing = {canonical_key(key) for key in self.store.key_index}
+        lot_sizes = dict(self.lot_sizes.table())
+        self.import_dropped = 0
+        add_rows = lambda rows: self.io.call_soon(self.add_imported_trades, rows)
+        self.io.submit(lambda progress, cancelled: import_tradebook(
+                           path, add_rows, existing, lot_sizes=lot_sizes, progress=progress,
+                           cancelled=cancelled),
+                       on_done=self.on_tradebook_imported, on_error=self.on_import_error, cancellable=True)
+
+    def add_imported_trades(self, rows):
+        count = len(rows)
+        rows = [row for row in rows if stored_key(self.store, trade_key(row)) is None]
+        self.import_dropped += count - len(rows)
+        if rows:
+            self.store.add_many(rows)
+
+    def on_tradebook_imported(self, result):
+        # The worker counted every batch it handed over as imported; trades
+        # dropped here are duplicates after all. (Batches are added through
+        # the same callback queue, so all of them have run by now.)
+        result.imported -= self.import_dropped
+        result.duplicates += self.import_dropped
+        self.status_var.set(f"Imported {result.imported} trades.")
+        messagebox.showinfo("Import Complete", str(result))
+
+    def on_import_error(self, exc):
+        messagebox.showerror("Import Failed", f"Could not import tradebook: {exc}")
+        self.status_var.set("Import failed.")
+
+    def check_pnl(self):
+        if not self.require_loaded():
+            return
+        try:
+            from analytics import LegTable, PnlCheck
+        except ImportError:
+            messagebox.showwarning("Check P&L", "Checking P&L needs NumPy (pip install numpy).")
+            return
+        self.status_var.set("Checking P&L...")
+        self.update_idletasks()
+        if self.leg_table is None:
+            # Kept up to date from store notifications once built.
+            self.leg_table = LegTable(self.store)
+        check = PnlCheck(self.leg_table, self.lot_sizes.table(),
+                         self.analytics.arrays() if self.analytics is not None else None)
+        disagreeing = check.disagreeing()
+        missing = check.missing()
+        lines = [f"{len(disagreeing)} of {len(check)} trades have a P&L that differs from their legs; "
+                 f"{len(missing)} have none and can be filled in."]
+        for position in disagreeing[:PNL_SHOWN].tolist():
+            row = self.store.rows[check.ids[position]]
+            lines.append(f"  {row[0]} / {row[1]} / {row[2]}: {row[-1]}, computed {format_number(check.computed[position])}")
+        if check.unknown_lot_sizes:
+            names = check.unknown_lot_sizes
+            more = f" and {len(names) - PNL_SHOWN} more" if len(names) > PNL_SHOWN else ""
+            lines.append(f"No lot size is set for {', '.join(names[:PNL_SHOWN])}{more}; "
+                         f"add them to {self.lot_sizes.path}.")
+        self.status_var.set(f"{len(disagreeing)} trades with a differing P&L.")
+        if not (len(disagreeing) or len(missing)):
+            messagebox.showinfo("Check P&L", "\n".join(lines))
+            return
+        if messagebox.askyesno("Check P&L", "\n".join(lines + ["", "Replace them with the computed P&L?"])):
+            count = check.recompute(self.store)
+            self.status_var.set(f"P&L of {count} trades recomputed.")
+
+    def clear_all_records(self):
+        if not self.require_loaded():
+            return
+        if messagebox.askyesno("Clear All Trades Confirmation",
+                               "Are you sure you want to permanently clear ALL trade records?"):
+            self.store.clear()
+            messagebox.showinfo("Records Cleared", "All trade records have been cleared.")
+            self.status_var.set("All records cleared.")
@@ -0,0 +1,280 @@
+from itertools import islice
+
+from dates import parse_date, canonical_date, date_spellings
+from legs import parse_leg, trade_legs
+from pnl import LotSizes, lot_sizes_path, trade_pnl, format_number
+from storage import FILE_NAME, HEADERS, SQLITE_EXTENSIONS, SqliteBackend, open_backend
+from trade_store import TradeStore, TradeTotals, DuplicateTradeError, LOAD_CHUNK, trade_key
+
+HEDGE_FIELDS = ["Hedged_Strike_Price", "Hedged_Buy/Sell", "Hedged_Entry_Price", "Hedged_Exit_Price"]
+# P&L may be left blank; it is then worked out from the legs.
+REQUIRED_FIELDS = [h for h in HEADERS if h not in HEDGE_FIELDS and h != "P&L"]
+DATE_FIELDS = ("Trade_Date", "Expiry_Date")
+
+
+def field_label(header):
+    return header.replace("_", " ")
+
+
+def build_trade(values, hedged=False, lot_sizes=None, legs=()):
+    # `values` maps header -> text. Raises ValueError naming the first
+    # missing field; unhedged trades get "-" for every hedge field. A blank
+    # P&L is computed from all the legs (`legs` being the extra ones) with
+    # the lot size from `lot_sizes` (a dict).
+    values = {k: (v or "").strip() for k, v in values.items()}
+    for field in REQUIRED_FIELDS:
+        if not values.get(field):
+            raise ValueError(f"'{field_label(field)}' is required.")
+    if hedged:
+        if not all(values.get(field) for field in HEDGE_FIELDS):
+            raise ValueError("Please fill all hedged details or answer 'n' to hedged question.")
+    else:
+        values.update(dict.fromkeys(HEDGE_FIELDS, "-"))
+    for field in DATE_FIELDS:
+        values[field] = checked_date(field, values[field])
+    row = [values.get(h, "") for h in HEADERS]
+    if not values.get("P&L"):
+        row[-1] = fill_pnl(row, lot_sizes or {}, legs)
+    return row
+
+
+def fill_pnl(row, lot_sizes, legs=()):
+    instrument = row[HEADERS.index("Instrument")]
+    pnl = trade_pnl(row, lot_sizes.get(instrument), extra_legs=legs)
+    if pnl is None:
+        if instrument not in lot_sizes:
+            raise ValueError(f"'P&L' is required: no lot size is set for {instrument}.")
+        raise ValueError("'P&L' is required: it cannot be worked out from the prices entered.")
+    return format_number(pnl)
+
+
+def checked_date(field, text):
+    # Dates are stored as DD-MM-YYYY whichever format they were typed in.
+    if parse_date(text) is None:
+        raise ValueError(f"'{field_label(field)}' is not a valid date (DD-MM-YYYY or YYYY-MM-DD).")
+    return canonical_date(text)
+
+
+def merge_update(row, headers, values):
+    # Blank or missing values keep the current field; changed dates are
+    # validated like new ones.
+    updated = [(values.get(h) or "").strip() or row[i] for i, h in enumerate(headers)]
+    for field in DATE_FIELDS:
+        if field in headers:
+            i = headers.index(field)
+            if updated[i] != row[i]:
+                updated[i] = checked_date(field, updated[i])
+    return updated
+
+
+def stored_key(store, key):
+    # The key the trade is stored under, whichever format its date was
+    # written in (older rows may be YYYY-MM-DD); None if there is none.
+    for text in date_spellings(key[1]):
+        if (key[0], text, key[2]) in store:
+            return (key[0], text, key[2])
+    return None
+
+
+def resolve_key(store, key):
+    # A key typed with its date in another format finds the stored trade.
+    return stored_key(store, key) or canonical_key(key)
+
+
+def canonical_key(key):
+    return (key[0], canonical_date(key[1]), key[2])
+
+
+def totals_summary(totals):
+    counted = totals.winning_trades + totals.losing_trades
+    return {
+        "Total Trades": totals.total_trades,
+        # Rounding keeps float drift from the running sum out of the output.
+        "Total P&L": round(totals.total_pl, 2) + 0.0,
+        "Winning Trades": totals.winning_trades,
+        "Losing Trades": totals.losing_trades,
+        "Win Rate": round(totals.winning_trades / counted * 100, 2) if counted else 0.0,
+    }
+
+
+def journal_totals(file_name=FILE_NAME):
+    # Totals without building the in-memory store. When the backend has no
+    # journal records to replay the snapshot rows are final, so they are
+    # summed as they stream past; otherwise the store is loaded as usual.
+    backend = open_backend(file_name)
+    try:
+        headers, rows, records = backend.load()
+        records = list(records)
+        if not records:
+            totals = TradeTotals()
+            for row in rows:
+                totals.add(row)
+            return totals
+        store = TradeStore(backend=backend)
+        store.begin_load(headers)
+        rows = iter(rows)
+        chunk = list(islice(rows, LOAD_CHUNK))
+        while chunk:
+            store.load_rows(chunk)
+            chunk = list(islice(rows, LOAD_CHUNK))
+        store.end_load(records)
+        return store.totals
+    finally:
+        backend.close()
+
+
+# The search filters a SQLite journal's own indexes can serve.
+SQL_FILTERS = {"date_from", "date_to", "instrument", "prefix"}
+
+
+def sql_search(file_name, key=None, limit=None, **filters):
+    # A one-shot find (by `key`) or unsorted search straight from a SQLite
+    # journal through its indexes, without loading the store. Returns
+    # (headers, rows), or None for a CSV journal or filters beyond
+    # SQL_FILTERS, which need TradeBook. Filters mean what they do there.
+    filters = {k: v for k, v in filters.items() if v}
+    if not file_name.lower().endswith(SQLITE_EXTENSIONS) or not set(filters) <= SQL_FILTERS:
+        return None
+    from trade_view import TextIndex
+    backend = SqliteBackend(file_name)
+    try:
+        if key is not None:
+            rows = [row for row in map(backend.find, ((key[0], text, key[2]) for text in date_spellings(key[1])))
+                    if row is not None]
+            return list(HEADERS), rows[:1]
+        instruments = None
+        if filters.get("instrument"):
+            index = TextIndex(backend.instruments())
+            text = filters["instrument"]
+            instruments = index.prefixed(text) if filters.get("prefix") else index.containing(text)
+        first, last = (parse_date(filters[name]) if filters.get(name) else None for name in ("date_from", "date_to"))
+        return list(HEADERS), backend.trades_between(first, last, instruments, limit)
+    finally:
+        backend.close()
+
+
+class TradeBook:
+    # The trade operations behind the GUI, usable from scripts and the CLI.
+    # Nothing here imports tkinter; the store is loaded synchronously.
+    def __init__(self, file_name=FILE_NAME, backend=None):
+        self.file_name = file_name
+        self.store = TradeStore(file_name, backend)
+        self.store.load()
+        self.lot_sizes = LotSizes(lot_sizes_path(file_name))
+        self._view = None
+        self._legs = None
+        self._risk = None
+        self._analytics = None
+
+    def __len__(self):
+        return len(self.store)
+
+    @property
+    def view(self):
+        if self._view is None:
+            from trade_view import TradeView
+            self._view = TradeView(self.store)
+        return self._view
+
+    @property
+    def leg_table(self):
+        if self._legs is None:
+            from analytics import LegTable
+            self._legs = LegTable(self.store)
+        return self._legs
+
+    def add(self, values, hedged=False, legs=()):
+        # `legs` are extra legs in the written form of legs.parse_leg; a
+        # blank leg expiry takes the trade's.
+        legs = [parse_leg(text, values.get("Expiry_Date") or "") for text in legs]
+        row = build_trade(values, hedged, self.lot_sizes.table(), legs)
+        found = stored_key(self.store, trade_key(row))
+        if found is not None:
+            raise DuplicateTradeError(found)
+        self.store.add(row, legs)
+        return row
+
+    def refresh(self):
+        # Picks up what other writers saved to the journal since the load;
+        # returns the number of changes applied, or None after a reload.
+        count = self.store.follow()
+        if count is None:
+            self.store.load()
+        return count
+
+    def find(self, key):
+        return self.store.get(resolve_key(self.store, key))
+
+    def update(self, key, values):
+        key = resolve_key(self.store, key)
+        row = self.store.get(key)
+        if row is None:
+            raise KeyError(tuple(key))
+        updated = merge_update(row, self.store.headers, values)
+        found = stored_key(self.store, trade_key(updated))
+        if found not in (None, key):
+            raise DuplicateTradeError(found)
+        self.store.update(key, updated)
+        return updated
+
+    def legs(self, key):
+        # Every leg of a trade, main and hedge included.
+        key = resolve_key(self.store, key)
+        if key not in self.store:
+            raise KeyError(tuple(key))
+        return trade_legs(self.store, self.store.key_index[key])
+
+    def set_legs(self, key, legs):
+        # Replaces a trade's extra legs (written form, as for add).
+        key = resolve_key(self.store, key)
+        row = self.store.get(key)
+        if row is None:
+            raise KeyError(tuple(key))
+        expiry = row[self.store.headers.index("Expiry_Date")]
+        self.store.set_legs(key, [parse_leg(text, expiry) for text in legs])
+
+    def delete(self, key):
+        self.store.delete(resolve_key(self.store, key))
+
+    def clear(self):
+        self.store.clear()
+
+    def search(self, sort_column=None, descending=False, limit=None, **filters):
+        # Filters are those of TradeView.matching.
+        filters = {k: v for k, v in filters.items() if v}
+        ids = self.view.rows(sort_column, descending, filters)
+        return [self.store.rows[rid] for rid in islice(ids, limit)]
+
+    def totals(self):
+        return totals_summary(self.store.totals)
+
+    @property
+    def analytics(self):
+        if self._analytics is None:
+            from analytics import Analytics
+            self._analytics = Analytics(self.store)
+        return self._analytics
+
+    def stats(self, grouping=None):
+        return self.analytics.stats(grouping)
+
+    def check_pnl(self):
+        # A PnlCheck over the whole journal (needs NumPy).
+        from analytics import PnlCheck
+        return PnlCheck(self.leg_table, self.lot_sizes.table(), self.analytics.arrays())
+
+    def recompute_pnl(self, missing_only=False):
+        from analytics import recompute_pnl
+        return recompute_pnl(self.leg_table, self.lot_sizes.table(), missing_only, self.analytics.arrays())
+
+    def risk(self, prices=None):
+        # A risk.Risk over the open legs, priced from `prices` or the
+        # prices.csv next to the journal (needs NumPy).
+        from risk import Risk, PriceSnapshot, prices_path
+        path = prices or prices_path(self.file_name)
+        if self._risk is None or self._risk.snapshot.path != path:
+            self._risk = Risk(self.leg_table, PriceSnapshot(path), self.lot_sizes)
+        return self._risk
+
+    def close(self):
+        self.store.close()
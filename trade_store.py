@@ -0,0 +1,503 @@
+import gc
+import threading
+from contextlib import contextmanager
+from itertools import islice
+
+from dates import parse_date
+from journal import INSERT, UPDATE, DELETE, CLEAR, LEGS, LEG_FIELDS
+from storage import FILE_NAME, HEADERS, open_backend
+
+
+PL_INDEX = HEADERS.index("P&L")
+DATE_COLUMNS = ("Trade_Date", "Expiry_Date")
+
+ADDED = "added"
+UPDATED = "updated"
+DELETED = "deleted"
+LOADED = "loaded"
+RESET = "reset"
+
+LOAD_CHUNK = 50000
+# follow() tells listeners about each changed trade, up to this many; a
+# bigger batch, or one that changes a trade more than once, is announced
+# with a single RESET.
+FOLLOW_EVENTS = 1000
+
+
+@contextmanager
+def paused_gc():
+    # Loading allocates a few containers per row, none of them part of a
+    # reference cycle, so the cyclic collector is kept off while it runs
+    # rather than rescanning the growing store again and again. The switch
+    # is process-wide: pause one load at a time, from one thread.
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def trade_key(row):
+    return (row[0], row[1], row[2])
+
+
+def checked_legs(legs):
+    legs = [list(leg) for leg in legs]
+    for leg in legs:
+        if len(leg) != len(LEG_FIELDS):
+            raise ValueError(f"A leg has {len(LEG_FIELDS)} fields ({', '.join(LEG_FIELDS)}), not {len(leg)}.")
+    return legs
+
+
+class DuplicateTradeError(KeyError):
+    # A trade would take the key of one that is already stored. A KeyError
+    # so callers that only look for missing keys still catch it.
+    pass
+
+
+def parse_pl(row):
+    try:
+        return float(row[PL_INDEX])
+    except (ValueError, IndexError):
+        return None
+
+
+class TradeTotals:
+    # Running aggregates for the totals bar, adjusted per row on every
+    # mutation instead of being recomputed over the whole journal.
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.total_trades = 0
+        self.total_pl = 0.0
+        self.winning_trades = 0
+        self.losing_trades = 0
+
+    def add(self, row):
+        self._apply(row, 1)
+
+    def remove(self, row):
+        self._apply(row, -1)
+
+    def _apply(self, row, sign):
+        self.total_trades += sign
+        pl_value = parse_pl(row)
+        if pl_value is None:
+            return
+        self.total_pl += sign * pl_value
+        if pl_value > 0:
+            self.winning_trades += sign
+        elif pl_value < 0:
+            self.losing_trades += sign
+
+
+class TradeStore:
+    # Trades are loaded from the storage backend once and kept in memory.
+    # Every row gets a row id (its position in load order) and is reachable
+    # in O(1) through the (Strategy_Name, Trade_Date, Instrument) key index.
+    # `strategy_index` and `instrument_index` map each name to its row ids
+    # for the views' name searches, the P&L check and the risk grouping.
+    # Date columns are parsed as rows come in: `dates[column]` maps row id
+    # to ordinal (or None), and views and analytics read them from there.
+    # A trade's first two legs are its own main and hedge columns; `legs`
+    # maps the row ids of trades with more to their extra legs (lists of
+    # LEG_FIELDS text), which follow the trade through updates and go with
+    # it when it is deleted.
+    # Edits are handed to the backend (see storage.py) through `writer`. The
+    # default writer runs them inline; the GUI swaps in a background writer
+    # so the in-memory copy changes at once and the file catches up on a
+    # worker thread.
+    def __init__(self, file_name=FILE_NAME, backend=None):
+        self.backend = backend or open_backend(file_name)
+        self.headers = list(HEADERS)
+        self.rows = {}
+        self.key_index = {}
+        self.strategy_index = {}
+        self.instrument_index = {}
+        self.dates = {column: {} for column in DATE_COLUMNS}
+        self._date_columns()
+        self.legs = {}
+        self.totals = TradeTotals()
+        self.listeners = []
+        self._next_id = 0
+        self._lock = threading.RLock()
+        self.writer = lambda fn, *args: fn(*args)
+        self.loaded = True
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, key):
+        return tuple(key) in self.key_index
+
+    def __iter__(self):
+        return iter(self.rows.values())
+
+    def subscribe(self, callback):
+        # callback(event, rid, old_row, new_row) runs after every change; for
+        # LOADED, rid is the range of row ids that were just loaded.
+        self.listeners.append(callback)
+
+    def _notify(self, event, rid=None, old_row=None, new_row=None):
+        for callback in self.listeners:
+            callback(event, rid, old_row, new_row)
+
+    def load(self):
+        with paused_gc():
+            headers, rows, records = self.backend.load()
+            self.begin_load(headers)
+            rows = iter(rows)
+            chunk = list(islice(rows, LOAD_CHUNK))
+            while chunk:
+                self.load_rows(chunk)
+                chunk = list(islice(rows, LOAD_CHUNK))
+            self.end_load(records)
+
+    # A load can also be streamed: begin_load, then load_rows once per chunk
+    # as the backend produces them, then end_load with the journal records.
+    # Edits are refused until end_load so a partially loaded journal can
+    # never be compacted over the full one.
+    def begin_load(self, headers):
+        with self._lock:
+            self._reset()
+            self._next_id = 0
+            self.headers = headers
+            self._date_columns()
+            self.loaded = False
+        self._notify(RESET)
+
+    def load_rows(self, rows):
+        with self._lock:
+            first = self._next_id
+            for row in rows:
+                self._insert(row)
+        self._notify(LOADED, range(first, self._next_id))
+
+    def end_load(self, records):
+        with self._lock:
+            for leg in self.backend.load_legs():
+                rid = self.key_index.get(tuple(leg[:3]))
+                if rid is not None:
+                    self.legs.setdefault(rid, []).append(leg[3:])
+            for record in records:
+                self._replay(record)
+            self.loaded = True
+            self._write(self.backend.finish_load, self.headers, list(self.rows.values()), self.leg_rows())
+        self._notify(RESET)
+
+    def _write(self, fn, *args):
+        # Called after the in-memory change: a write that triggers compaction
+        # snapshots the rows, and the record being written must be in them.
+        self.writer(self._apply_write, fn, *args)
+
+    def _apply_write(self, fn, *args):
+        fn(*args)
+        self._maybe_compact()
+
+    def _check_loaded(self):
+        if not self.loaded:
+            raise RuntimeError("The journal has not finished loading.")
+
+    def _replay(self, record):
+        op, fields = record[0], record[1:]
+        width = len(self.headers)
+        if op == INSERT and len(fields) == width:
+            self._upsert(fields)
+        elif op == UPDATE and len(fields) == width + 3:
+            key, row = tuple(fields[:3]), fields[3:]
+            rid = self.key_index.get(key)
+            if rid is None:
+                self._upsert(row)
+                return
+            other = self.key_index.get(trade_key(row))
+            if other is not None and other != rid:
+                self._remove(other)
+            self._replace(rid, row)
+        elif op == DELETE and len(fields) == 3:
+            rid = self.key_index.get(tuple(fields))
+            if rid is not None:
+                self._remove(rid)
+        elif op == CLEAR:
+            self._reset()
+        elif op == LEGS and len(fields) >= 3 and (len(fields) - 3) % len(LEG_FIELDS) == 0:
+            rid = self.key_index.get(tuple(fields[:3]))
+            if rid is not None:
+                self._set_legs(rid, [fields[i:i + len(LEG_FIELDS)] for i in range(3, len(fields), len(LEG_FIELDS))])
+
+    def _replay_events(self, record):
+        # Replays one record and returns the (event, rid, old_row, new_row)
+        # notifications it amounts to. Trades left exactly as they were
+        # (this store's own records read back) give none.
+        op, fields = record[0], record[1:]
+        if op == CLEAR:
+            self._replay(record)
+            return [(RESET,)]
+        keys = [tuple(fields[:3])]
+        if op == INSERT:
+            keys = [trade_key(fields)]
+        elif op == UPDATE:
+            keys.append(trade_key(fields[3:]))
+        before = {rid: (self.rows[rid], self.legs.get(rid))
+                  for rid in (self.key_index.get(key) for key in keys) if rid is not None}
+        self._replay(record)
+        events = []
+        for rid in sorted(set(before) | {self.key_index.get(key) for key in keys} - {None}):
+            old_row, old_legs = before.get(rid, (None, None))
+            new_row = self.rows.get(rid)
+            if old_row is None:
+                events.append((ADDED, rid, None, new_row))
+            elif new_row is None:
+                events.append((DELETED, rid, old_row, None))
+            elif old_row != new_row or old_legs != self.legs.get(rid):
+                events.append((UPDATED, rid, old_row, new_row))
+        return events
+
+    def _date_columns(self):
+        self._date_positions = [(self.dates[column], self.headers.index(column))
+                                for column in DATE_COLUMNS if column in self.headers]
+
+    def _reset(self):
+        self.rows.clear()
+        self.key_index.clear()
+        self.strategy_index.clear()
+        self.instrument_index.clear()
+        for values in self.dates.values():
+            values.clear()
+        self.legs.clear()
+        self.totals.reset()
+
+    def _upsert(self, row):
+        rid = self.key_index.get(trade_key(row))
+        if rid is None:
+            return self._insert(row)
+        self._replace(rid, row)
+        return rid
+
+    def _insert(self, row):
+        rid = self._next_id
+        self._next_id += 1
+        self.rows[rid] = row
+        self._index(rid, row)
+        return rid
+
+    def _replace(self, rid, row):
+        old_row = self.rows[rid]
+        self.rows[rid] = row
+        if trade_key(old_row) != trade_key(row):
+            self._unindex(rid, old_row)
+            self._index(rid, row)
+            return
+        # Same key, so the key, strategy and instrument indexes stand.
+        for values, position in self._date_positions:
+            if old_row[position] != row[position]:
+                values[rid] = parse_date(row[position])
+        self.totals.remove(old_row)
+        self.totals.add(row)
+
+    def _remove(self, rid):
+        row = self.rows.pop(rid)
+        self._unindex(rid, row)
+        self.legs.pop(rid, None)
+        return row
+
+    def _set_legs(self, rid, legs):
+        if legs:
+            self.legs[rid] = [list(leg) for leg in legs]
+        else:
+            self.legs.pop(rid, None)
+
+    def leg_rows(self):
+        # Every extra leg as a (key + leg) row, grouped by trade, for
+        # snapshots and copies.
+        return [list(trade_key(self.rows[rid])) + leg for rid, legs in self.legs.items() for leg in legs]
+
+    def _index(self, rid, row):
+        self.key_index[trade_key(row)] = rid
+        self.strategy_index.setdefault(row[0], set()).add(rid)
+        self.instrument_index.setdefault(row[2], set()).add(rid)
+        for values, position in self._date_positions:
+            values[rid] = parse_date(row[position])
+        self.totals.add(row)
+
+    def _unindex(self, rid, row):
+        del self.key_index[trade_key(row)]
+        ids = self.strategy_index[row[0]]
+        ids.discard(rid)
+        if not ids:
+            del self.strategy_index[row[0]]
+        ids = self.instrument_index[row[2]]
+        ids.discard(rid)
+        if not ids:
+            del self.instrument_index[row[2]]
+        for values, position in self._date_positions:
+            del values[rid]
+        self.totals.remove(row)
+
+    def get(self, key):
+        rid = self.key_index.get(tuple(key))
+        if rid is None:
+            return None
+        return self.rows[rid]
+
+    def add(self, row, legs=()):
+        row = list(row)
+        legs = checked_legs(legs)
+        with self._lock:
+            self._check_loaded()
+            if trade_key(row) in self.key_index:
+                raise DuplicateTradeError(trade_key(row))
+            rid = self._insert(row)
+            self._set_legs(rid, legs)
+            self._write(self.backend.insert, row)
+            if legs:
+                self._write(self.backend.set_legs, trade_key(row), legs)
+        self._notify(ADDED, rid, None, row)
+        return rid
+
+    def add_many(self, rows):
+        # Bulk insert for importers: the whole batch is checked up front and
+        # written to the backend in one call. Listeners get a single LOADED
+        # event for the new row ids, as during a load.
+        rows = [list(row) for row in rows]
+        with self._lock:
+            self._check_loaded()
+            keys = set()
+            for row in rows:
+                key = trade_key(row)
+                if key in self.key_index or key in keys:
+                    raise DuplicateTradeError(key)
+                keys.add(key)
+            first = self._next_id
+            for row in rows:
+                self._insert(row)
+            self._write(self.backend.insert_many, rows)
+        self._notify(LOADED, range(first, self._next_id))
+        return range(first, self._next_id)
+
+    def update(self, key, row):
+        key = tuple(key)
+        row = list(row)
+        with self._lock:
+            self._check_loaded()
+            rid = self.key_index[key]
+            new_key = trade_key(row)
+            if new_key != key and new_key in self.key_index:
+                raise DuplicateTradeError(new_key)
+            old_row = self.rows[rid]
+            self._replace(rid, row)
+            self._write(self.backend.update, key, row)
+        self._notify(UPDATED, rid, old_row, row)
+        return rid
+
+    def update_many(self, pairs):
+        # Bulk update for whole-journal rewrites such as a P&L recompute:
+        # (key, row) pairs are checked up front and written to the backend
+        # in one call. Listeners get a single RESET rather than an event per
+        # row, so views rebuild once.
+        pairs = [(tuple(key), list(row)) for key, row in pairs]
+        with self._lock:
+            self._check_loaded()
+            # Journal records are replayed one at a time, so no row may
+            # take a key that is in use, even by another row in the batch.
+            keys = set()
+            for key, row in pairs:
+                new_key = trade_key(row)
+                if key not in self.key_index or key in keys:
+                    raise KeyError(key)
+                if new_key != key and (new_key in self.key_index or new_key in keys):
+                    raise DuplicateTradeError(new_key)
+                keys.add(key)
+                keys.add(new_key)
+            key_index = self.key_index
+            for key, row in pairs:
+                self._replace(key_index[key], row)
+            self._write(self.backend.update_many, pairs, self._snapshot)
+        self._notify(RESET)
+        return len(pairs)
+
+    def set_legs(self, key, legs):
+        # Replaces the trade's extra legs (an empty list removes them).
+        # Listeners see an update of the trade with its row unchanged.
+        legs = checked_legs(legs)
+        with self._lock:
+            self._check_loaded()
+            rid = self.key_index[tuple(key)]
+            self._set_legs(rid, legs)
+            self._write(self.backend.set_legs, tuple(key), legs)
+            row = self.rows[rid]
+        self._notify(UPDATED, rid, row, row)
+        return rid
+
+    def delete(self, key):
+        with self._lock:
+            self._check_loaded()
+            rid = self.key_index[tuple(key)]
+            old_row = self._remove(rid)
+            self._write(self.backend.delete, key)
+        self._notify(DELETED, rid, old_row, None)
+        return rid
+
+    def clear(self):
+        with self._lock:
+            self._check_loaded()
+            self._reset()
+            self._write(self.backend.clear)
+        self._notify(RESET)
+
+    def _maybe_compact(self):
+        if self.backend.needs_compaction():
+            self.compact()
+
+    def _snapshot(self):
+        with self._lock:
+            return list(self.headers), list(self.rows.values()), self.leg_rows()
+
+    def follow(self):
+        # Applies what other processes sharing the journal have written
+        # since the load or the last call. Returns the number of records
+        # replayed, or None when the files were rewritten and the store has
+        # to be loaded again.
+        records = self.changes()
+        if records is None:
+            return None
+        return self.apply_changes(records)
+
+    # follow() in two steps, for the GUI: changes() only reads the files and
+    # can run on the worker thread; apply_changes() takes what it returned.
+    # The backend counts the records as read only once they are applied,
+    # so an edit made in between neither compacts them away nor is left
+    # out of order.
+    def changes(self):
+        with self._lock:
+            if not self.loaded:
+                return []
+            return self.backend.changes()
+
+    def apply_changes(self, records):
+        # Events are only sent once the whole batch is in, so each must hold
+        # for the final state: a trade changed by two records (say added
+        # and deleted again) would be announced as it no longer is.
+        with self._lock:
+            if not self.loaded:
+                # A load began since the read; it reads these records too.
+                return 0
+            events = [event for record in records for event in self._replay_events(record)]
+            self.backend.changes_applied()
+        rids = [event[1] for event in events if event[0] != RESET]
+        if len(events) > FOLLOW_EVENTS or len(rids) < len(events) or len(set(rids)) < len(rids):
+            events = [(RESET,)]
+        for event in events:
+            self._notify(*event)
+        return len(records)
+
+    def compact(self, wait=False):
+        with self._lock:
+            compactor = self.backend.compact(self._snapshot)
+        if wait and compactor is not None:
+            compactor.join()
+
+    def close(self):
+        self.backend.close()
@@ -0,0 +1,363 @@
+import bisect
+from collections import Counter
+
+from dates import parse_date
+from trade_store import ADDED, UPDATED, DELETED
+
+NUMERIC_COLUMNS = {
+    "Strike_Price", "Lots", "Entry_Price", "Exit_Price",
+    "Hedged_Strike_Price", "Hedged_Entry_Price", "Hedged_Exit_Price",
+    "Margin_Used", "Holding_Period", "P&L"}
+DATE_COLUMNS = {"Trade_Date", "Expiry_Date"}
+# Building a set costs about this many times less per id than testing a row.
+SET_RATIO = 16
+# What a field left empty holds: the Exit_Price of a position that is still
+# open, or the hedge fields of a trade without a hedge.
+EMPTY_FIELDS = {"", "-"}
+
+
+def parse_number(text):
+    try:
+        value = float(text.replace(",", ""))
+    except ValueError:
+        return None
+    return value if value == value else None
+
+
+def parse_text(text):
+    return text.strip().casefold()
+
+
+def parser_for(column):
+    if column in NUMERIC_COLUMNS:
+        return parse_number
+    if column in DATE_COLUMNS:
+        return parse_date
+    return parse_text
+
+
+class SortOrder:
+    # Row ids of one column sorted by typed value. Rows whose value does not
+    # parse are kept apart in `missing` so they always sort last.
+    def __init__(self, typed):
+        # Sorted by row id first: `typed` is not in row id order once a row
+        # has been updated, and ties must not depend on that.
+        valid = sorted(rid for rid, value in typed.items() if value is not None)
+        valid.sort(key=typed.__getitem__)
+        self.keys = [typed[rid] for rid in valid]
+        self.ids = valid
+        self.missing = sorted(rid for rid, value in typed.items() if value is None)
+
+    def _position(self, rid, value):
+        # Equal keys are kept in row id order, the same order a fresh stable
+        # sort produces, so patched and rebuilt orders never diverge.
+        lo = bisect.bisect_left(self.keys, value)
+        hi = bisect.bisect_right(self.keys, value, lo)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ids[mid] < rid:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def add(self, rid, value):
+        if value is None:
+            bisect.insort(self.missing, rid)
+            return
+        i = self._position(rid, value)
+        self.keys.insert(i, value)
+        self.ids.insert(i, rid)
+
+    def remove(self, rid, value):
+        if value is None:
+            del self.missing[bisect.bisect_left(self.missing, rid)]
+            return
+        i = self._position(rid, value)
+        del self.keys[i]
+        del self.ids[i]
+
+    def ordered(self, descending=False):
+        if descending:
+            return self.ids[::-1] + self.missing
+        return self.ids + self.missing
+
+    def span(self, low=None, high=None, low_open=False, high_open=False):
+        # Slice bounds of the ids whose value lies between low and high
+        # (either may be None); the *_open flags exclude the bound itself.
+        if low is None:
+            start = 0
+        else:
+            start = (bisect.bisect_right if low_open else bisect.bisect_left)(self.keys, low)
+        if high is None:
+            stop = len(self.keys)
+        else:
+            stop = (bisect.bisect_left if high_open else bisect.bisect_right)(self.keys, high)
+        return start, max(start, stop)
+
+
+class TextIndex:
+    # The distinct values of a text column, case-folded and sorted. Prefix
+    # queries bisect it; substring queries scan each distinct name once
+    # instead of every row.
+    def __init__(self, names):
+        self.entries = sorted((parse_text(name), name) for name in names)
+        self.keys = [key for key, name in self.entries]
+
+    def prefixed(self, prefix):
+        prefix = parse_text(prefix)
+        start = bisect.bisect_left(self.keys, prefix)
+        stop = bisect.bisect_left(self.keys, prefix + "\U0010ffff", start)
+        return [name for key, name in self.entries[start:stop]]
+
+    def containing(self, text):
+        text = parse_text(text)
+        return [name for key, name in self.entries if text in key]
+
+
+class NameMatch:
+    # Rows whose text column is one of `names`, through the store's
+    # name -> row ids index.
+    def __init__(self, store, index, column, names):
+        self.rows = store.rows
+        self.index = index
+        self.column = store.headers.index(column)
+        self.names = set(names)
+
+    def __len__(self):
+        return sum(len(self.index[name]) for name in self.names)
+
+    def ids(self):
+        return set().union(*(self.index[name] for name in self.names))
+
+    def test(self, rid):
+        return self.rows[rid][self.column] in self.names
+
+
+class RangeMatch:
+    # Rows whose typed value lies in a range, as a slice of a SortOrder.
+    def __init__(self, order, values, low=None, high=None, low_open=False, high_open=False):
+        self.order = order
+        self.values = values
+        self.low, self.high = low, high
+        self.low_open, self.high_open = low_open, high_open
+        self.start, self.stop = order.span(low, high, low_open, high_open)
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def ids(self):
+        return set(self.order.ids[self.start:self.stop])
+
+    def test(self, rid):
+        value = self.values[rid]
+        if value is None:
+            return False
+        if self.low is not None and (value <= self.low if self.low_open else value < self.low):
+            return False
+        if self.high is not None and (value >= self.high if self.high_open else value > self.high):
+            return False
+        return True
+
+
+class ExpiryCounts:
+    # Trades and open positions per expiry ordinal (None for no valid
+    # expiry), counted once and then adjusted per row, as TradeTotals is.
+    def __init__(self, store):
+        self.expiry = store.headers.index("Expiry_Date")
+        self.exit = store.headers.index("Exit_Price")
+        dates = store.dates["Expiry_Date"]
+        self.trades = Counter(dates.values())
+        self.open = Counter(dates[rid] for rid, row in store.rows.items()
+                            if row[self.exit].strip() in EMPTY_FIELDS)
+
+    def add(self, row, expiry):
+        self._apply(row, expiry, 1)
+
+    def remove(self, row, expiry):
+        self._apply(row, expiry, -1)
+
+    def _apply(self, row, expiry, sign):
+        for counts, counted in ((self.trades, True), (self.open, row[self.exit].strip() in EMPTY_FIELDS)):
+            if counted:
+                counts[expiry] += sign
+                if not counts[expiry]:
+                    del counts[expiry]
+
+    def groups(self):
+        groups = [(expiry, self.trades[expiry], self.open.get(expiry, 0))
+                  for expiry in sorted(expiry for expiry in self.trades if expiry is not None)]
+        if None in self.trades:
+            groups.append((None, self.trades[None], self.open.get(None, 0)))
+        return groups
+
+
+class TradeView:
+    # Sorted and filtered projections of a TradeStore. Each column is parsed
+    # into typed values once, and each sort order is computed once; both are
+    # then patched per row from store notifications, so re-sorting or
+    # changing a filter never re-parses the journal.
+    def __init__(self, store):
+        self.store = store
+        self._typed = {}
+        self._orders = {}
+        self._text_indexes = {}
+        self._expiries = None
+        store.subscribe(self._on_change)
+
+    def typed(self, column):
+        # Date columns are parsed by the store as rows arrive and shared
+        # from there; other columns are parsed here on first use.
+        values = self._typed.get(column)
+        if values is None:
+            values = self.store.dates.get(column)
+            if values is None:
+                index = self.store.headers.index(column)
+                parse = parser_for(column)
+                values = {rid: parse(row[index]) for rid, row in self.store.rows.items()}
+            self._typed[column] = values
+        return values
+
+    def order(self, column):
+        order = self._orders.get(column)
+        if order is None:
+            order = SortOrder(self.typed(column))
+            self._orders[column] = order
+        return order
+
+    def text_index(self, column):
+        index = self._text_indexes.get(column)
+        if index is None:
+            index = TextIndex(self._name_index(column))
+            self._text_indexes[column] = index
+        return index
+
+    def _name_index(self, column):
+        return self.store.strategy_index if column == "Strategy_Name" else self.store.instrument_index
+
+    def _on_change(self, event, rid, old_row, new_row):
+        if event not in (ADDED, UPDATED, DELETED):
+            self._typed.clear()
+            self._orders.clear()
+            self._text_indexes.clear()
+            self._expiries = None
+            return
+        if self._expiries is not None:
+            # The store's Expiry_Date values already belong to new_row.
+            if old_row is not None:
+                self._expiries.remove(old_row, parse_date(old_row[self._expiries.expiry]))
+            if new_row is not None:
+                self._expiries.add(new_row, self.store.dates["Expiry_Date"][rid])
+        for column in list(self._text_indexes):
+            # Only a name appearing or disappearing changes the index.
+            index = self._name_index(column)
+            position = self.store.headers.index(column)
+            if (old_row is not None and old_row[position] not in index) or \
+                    (new_row is not None and len(index[new_row[position]]) == 1):
+                del self._text_indexes[column]
+        for column, values in self._typed.items():
+            # The store has already updated its own date columns.
+            shared = column in self.store.dates
+            position = self.store.headers.index(column)
+            order = self._orders.get(column)
+            if old_row is not None:
+                value = parser_for(column)(old_row[position]) if shared else values.pop(rid)
+                if order is not None:
+                    order.remove(rid, value)
+            if new_row is not None:
+                if shared:
+                    value = values[rid]
+                else:
+                    value = values[rid] = parser_for(column)(new_row[position])
+                if order is not None:
+                    order.add(rid, value)
+
+    def _range(self, column, low=None, high=None, low_open=False, high_open=False):
+        return RangeMatch(self.order(column), self.typed(column), low, high, low_open, high_open)
+
+    def _names(self, column, text, prefix):
+        index = self.text_index(column)
+        names = index.prefixed(text) if prefix else index.containing(text)
+        return NameMatch(self.store, self._name_index(column), column, names)
+
+    def matching(self, strategy="", instrument="", option_type="", date_from="", date_to="", pl_sign="",
+                 prefix=False, strike_min="", strike_max="", expiry_from="", expiry_to="", pl_min="", pl_max=""):
+        # Returns the set of row ids passing every given filter, or None when
+        # no filter is set. Text filters match case-insensitively, as a
+        # prefix or anywhere in the name; the rest are inclusive ranges.
+        # Filters are applied most selective first. A filter that matches
+        # many more rows than are left is checked row by row; otherwise its
+        # ids are intersected as a set, which costs far less per row.
+        conditions = []
+        if strategy:
+            conditions.append(self._names("Strategy_Name", strategy, prefix))
+        if instrument:
+            conditions.append(self._names("Instrument", instrument, prefix))
+        if option_type:
+            conditions.append(self._range("Type", parse_text(option_type), parse_text(option_type)))
+        for column, low, high, parse in (("Trade_Date", date_from, date_to, parse_date),
+                                         ("Expiry_Date", expiry_from, expiry_to, parse_date),
+                                         ("Strike_Price", strike_min, strike_max, parse_number),
+                                         ("P&L", pl_min, pl_max, parse_number)):
+            if low or high:
+                conditions.append(self._range(column, parse(low) if low else None, parse(high) if high else None))
+        if pl_sign == "profit":
+            conditions.append(self._range("P&L", 0.0, low_open=True))
+        elif pl_sign == "loss":
+            conditions.append(self._range("P&L", high=0.0, high_open=True))
+        if not conditions:
+            return None
+        conditions.sort(key=len)
+        matched = conditions[0].ids()
+        for condition in conditions[1:]:
+            if len(condition) > len(matched) * SET_RATIO:
+                matched = {rid for rid in matched if condition.test(rid)}
+            else:
+                matched &= condition.ids()
+        return matched
+
+    def date_range(self, start=None, end=None, column="Trade_Date"):
+        # Row ids dated between two ordinals (inclusive), in date order.
+        order = self.order(column)
+        first, stop = order.span(start, end)
+        return order.ids[first:stop]
+
+    def expiries(self):
+        # [(expiry ordinal, trades, open positions)] in expiry order; rows
+        # without a valid expiry come last under None.
+        if self._expiries is None:
+            self._expiries = ExpiryCounts(self.store)
+        return self._expiries.groups()
+
+    def expiry_rows(self, expiry):
+        # Row ids expiring on `expiry` (None for no valid expiry), open
+        # positions first.
+        order = self.order("Expiry_Date")
+        ids = order.missing if expiry is None else self.date_range(expiry, expiry, "Expiry_Date")
+        position = self.store.headers.index("Exit_Price")
+        rows = self.store.rows
+        return sorted(ids, key=lambda rid: rows[rid][position].strip() not in EMPTY_FIELDS)
+
+    def rows(self, sort_column=None, descending=False, filters=None):
+        matched = self.matching(**filters) if filters else None
+        if matched is not None and len(matched) * 8 < len(self.store):
+            # Few matches: sorting them directly beats walking the full
+            # order. Ties stay in row id order, as in SortOrder.
+            if not sort_column:
+                return sorted(matched)
+            values = self.typed(sort_column)
+            ids = sorted(matched)
+            missing = [rid for rid in ids if values[rid] is None]
+            if missing:
+                ids = [rid for rid in ids if values[rid] is not None]
+            ids.sort(key=values.__getitem__)
+            if descending:
+                ids.reverse()
+            return ids + missing
+        if sort_column:
+            ordered = self.order(sort_column).ordered(descending)
+        else:
+            ordered = list(self.store.rows)
+        if matched is None:
+            return ordered
+        return [rid for rid in ordered if rid in matched]
@@ -0,0 +1,318 @@
+import os
+import re
+import csv
+import argparse
+from datetime import date, timedelta
+
+from dates import parse_date, format_date
+from pnl import LotSizes, lot_sizes_path, format_number
+from storage import FILE_NAME
+from trade_api import canonical_key
+from trade_store import TradeStore, trade_key
+
+CHUNK_SIZE = 50000
+PRICE_PLACES = 6
+
+# Tradebook header names tried for each field, compared case-insensitively.
+# The defaults cover Zerodha-style tradebooks and most contract-note exports;
+# anything else can be mapped with --map FIELD=COLUMN.
+COLUMN_ALIASES = {
+    "symbol": ["symbol", "tradingsymbol", "trading_symbol", "scrip", "contract"],
+    "trade_date": ["trade_date", "date", "trade date"],
+    "side": ["trade_type", "buy/sell", "side", "transaction_type"],
+    "quantity": ["quantity", "qty", "filled_qty"],
+    "price": ["price", "trade_price", "rate"],
+    "expiry": ["expiry_date", "expiry"],
+}
+
+# NIFTY25JUN24500PE (monthly) or NIFTY2561924500PE (weekly: year, month
+# 1-9/O/N/D, day).
+SYMBOL_RE = re.compile(
+    r"^(?P<underlying>[A-Z&-]+?)(?P<year>\d{2})"
+    r"(?:(?P<month>[A-Z]{3})|(?P<wmonth>[1-9OND])(?P<day>\d{2}))"
+    r"(?P<strike>\d+(?:\.\d+)?)(?P<type>CE|PE)$")
+MONTHS = {m: i for i, m in enumerate(
+    ["JAN", "FEB", "MAR", "APR", "MAY", "JUN", "JUL", "AUG", "SEP", "OCT", "NOV", "DEC"], 1)}
+WEEKLY_MONTHS = {**{str(i): i for i in range(1, 10)}, "O": 10, "N": 11, "D": 12}
+
+
+class ImportResult:
+    def __init__(self):
+        self.fills = 0
+        self.skipped_fills = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.renamed = 0
+        self.open_positions = 0
+        self.cancelled = False
+
+    def __str__(self):
+        text = (f"{self.imported} trades imported from {self.fills} fills; "
+                f"{self.duplicates} duplicates skipped, {self.renamed} repeated strategies numbered, "
+                f"{self.skipped_fills} unusable fills skipped, "
+                f"{self.open_positions} positions still open")
+        return text + " (cancelled)" if self.cancelled else text
+
+
+def resolve_columns(headers, overrides=None):
+    lookup = {h.strip().lower(): i for i, h in enumerate(headers)}
+    columns = {}
+    for field, aliases in COLUMN_ALIASES.items():
+        names = [overrides[field]] if overrides and field in overrides else aliases
+        for name in names:
+            if name.strip().lower() in lookup:
+                columns[field] = lookup[name.strip().lower()]
+                break
+    missing = [f for f in ("symbol", "trade_date", "side", "quantity", "price") if f not in columns]
+    if missing:
+        raise ValueError(f"Tradebook has no column for: {', '.join(missing)}")
+    return columns
+
+
+def last_thursday(year, month):
+    # NSE monthly expiry convention, used only when the tradebook has no
+    # expiry column.
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    day = next_month - timedelta(days=1)
+    return day - timedelta(days=(day.weekday() - 3) % 7)
+
+
+def parse_symbol(symbol, expiry_text=""):
+    # Returns (underlying, expiry ordinal, strike text, CE/PE) or None for
+    # anything that is not an option contract.
+    match = SYMBOL_RE.match(symbol.strip().upper())
+    if not match:
+        return None
+    expiry = parse_date(expiry_text) if expiry_text else None
+    if expiry is None:
+        year = 2000 + int(match["year"])
+        if match["month"]:
+            if match["month"] not in MONTHS:
+                return None
+            expiry = last_thursday(year, MONTHS[match["month"]]).toordinal()
+        else:
+            try:
+                expiry = date(year, WEEKLY_MONTHS[match["wmonth"]], int(match["day"])).toordinal()
+            except ValueError:
+                return None
+    return match["underlying"], expiry, match["strike"], match["type"]
+
+
+class Leg:
+    # One contract from its opening fill until the position is flat again.
+    __slots__ = ("contract", "side", "opened", "closed", "open_qty", "open_value",
+                 "close_qty", "close_value", "net")
+
+    def __init__(self, contract, side, opened):
+        self.contract = contract
+        self.side = side
+        self.opened = opened
+        self.closed = opened
+        self.open_qty = self.open_value = 0
+        self.close_qty = self.close_value = 0
+        self.net = 0
+
+    @property
+    def strike(self):
+        return float(self.contract[2])
+
+    def pnl(self):
+        if self.side == "SELL":
+            return self.open_value - self.close_value
+        return self.close_value - self.open_value
+
+
+def format_price(value):
+    # Average fill prices keep enough decimals that the P&L check, which
+    # works from the journal's prices, agrees with the P&L of the fills.
+    return format_number(value, PRICE_PLACES)
+
+
+def strategy_name(main, hedge):
+    kind = "CALL" if main.contract[3] == "CE" else "PUT"
+    if main.side == "BUY":
+        return f"LONG {kind}"
+    if hedge is None:
+        return f"SHORT {kind}"
+    if kind == "PUT":
+        return "BULL PUT SPREAD" if hedge.strike < main.strike else "BEAR PUT SPREAD"
+    return "BEAR CALL SPREAD" if hedge.strike > main.strike else "BULL CALL SPREAD"
+
+
+def trade_row(main, hedge, lot_sizes):
+    underlying, expiry, strike, option_type = main.contract
+    lot_size = lot_sizes.get(underlying, 1)
+    closed = max(main.closed, hedge.closed) if hedge else main.closed
+    if hedge is not None:
+        hedge_fields = [hedge.contract[2], hedge.side, format_price(hedge.open_value / hedge.open_qty),
+                        format_price(hedge.close_value / hedge.close_qty)]
+        pnl = main.pnl() + hedge.pnl()
+    else:
+        hedge_fields = ["-", "-", "-", "-"]
+        pnl = main.pnl()
+    return [
+        strategy_name(main, hedge), format_date(main.opened), underlying, strike, main.side,
+        format_date(expiry), option_type, format_number(main.open_qty / lot_size),
+        format_price(main.open_value / main.open_qty), format_price(main.close_value / main.close_qty)
+    ] + hedge_fields + ["-", str(closed - main.opened), format_number(pnl)]
+
+
+class PositionBook:
+    # Pairs fills into round trips as they stream past. Only contracts that
+    # are still open are held in memory; a group of legs opened on the same
+    # underlying, expiry, type and day is turned into journal rows (each
+    # short leg with a long leg as its hedge) as soon as every leg in it is
+    # flat.
+    def __init__(self, lot_sizes=None):
+        self.lot_sizes = lot_sizes or {}
+        self.positions = {}
+        self.groups = {}
+
+    def feed(self, contract, side, quantity, price, traded):
+        rows = []
+        leg = self.positions.get(contract)
+        if leg is None:
+            leg = Leg(contract, side, traded)
+            self.positions[contract] = leg
+            group = self.groups.setdefault((contract[0], contract[1], contract[3], traded), [0, []])
+            group[0] += 1
+        if side == leg.side:
+            leg.open_qty += quantity
+            leg.open_value += quantity * price
+            leg.net += quantity
+            return rows
+        closing = min(quantity, leg.net)
+        leg.close_qty += closing
+        leg.close_value += closing * price
+        leg.net -= closing
+        leg.closed = traded
+        if leg.net == 0:
+            del self.positions[contract]
+            key = (contract[0], contract[1], contract[3], leg.opened)
+            group = self.groups[key]
+            group[0] -= 1
+            group[1].append(leg)
+            if group[0] == 0:
+                del self.groups[key]
+                rows.extend(self._rows(group[1]))
+        if quantity > closing:
+            # The fill flipped the position; the excess opens a new one.
+            rows.extend(self.feed(contract, side, quantity - closing, price, traded))
+        return rows
+
+    def _rows(self, legs):
+        shorts = [leg for leg in legs if leg.side == "SELL"]
+        longs = [leg for leg in legs if leg.side == "BUY"]
+        rows = []
+        for i, main in enumerate(shorts):
+            rows.append(trade_row(main, longs[i] if i < len(longs) else None, self.lot_sizes))
+        for main in longs[len(shorts):]:
+            rows.append(trade_row(main, None, self.lot_sizes))
+        return rows
+
+
+def import_tradebook(path, add_rows, existing_keys, lot_sizes=None, column_map=None,
+                     chunk_size=CHUNK_SIZE, progress=None, cancelled=None):
+    # Streams the tradebook in chunk_size fills. Completed trades whose key
+    # is in `existing_keys` (the journal's keys before the import, dates as
+    # DD-MM-YYYY) are duplicates; the rest are handed to add_rows in
+    # batches. Fills must be in the order they happened.
+    # Round trips in one tradebook can share a key, e.g. a re-entry on the
+    # same day: the second gets " #2" after its strategy name, the third
+    # " #3", and so on. The numbering follows the tradebook's order, so
+    # importing the same file again finds them all as duplicates.
+    result = ImportResult()
+    book = PositionBook(lot_sizes)
+    batch = []
+    repeats = {}
+    size = os.path.getsize(path) or 1
+    with open(path, "r", newline='') as file:
+        reader = csv.reader(file)
+        columns = resolve_columns(next(reader), column_map)
+        symbol_index, date_index = columns["symbol"], columns["trade_date"]
+        side_index, quantity_index, price_index = columns["side"], columns["quantity"], columns["price"]
+        expiry_index = columns.get("expiry")
+        # A tradebook repeats the same few symbols on every line, so each
+        # distinct one is parsed only once.
+        contracts = {}
+        for count, record in enumerate(reader, 1):
+            try:
+                symbol = (record[symbol_index], record[expiry_index] if expiry_index is not None else "")
+                contract = contracts.get(symbol, False)
+                if contract is False:
+                    contract = contracts[symbol] = parse_symbol(*symbol)
+                traded = parse_date(record[date_index].split()[0])
+                side = record[side_index].strip().upper()
+                side = "BUY" if side.startswith("B") else "SELL" if side.startswith("S") else None
+                quantity = int(float(record[quantity_index]))
+                price = float(record[price_index])
+            except (IndexError, ValueError):
+                contract = None
+            if contract is None or side is None or traded is None or quantity <= 0:
+                result.skipped_fills += 1
+                continue
+            result.fills += 1
+            for row in book.feed(contract, side, quantity, price, traded):
+                key = trade_key(row)
+                repeat = repeats[key] = repeats.get(key, 0) + 1
+                if repeat > 1:
+                    row[0] = f"{row[0]} #{repeat}"
+                    key = trade_key(row)
+                if key in existing_keys:
+                    result.duplicates += 1
+                    continue
+                result.renamed += repeat > 1
+                batch.append(row)
+            if count % chunk_size == 0:
+                if batch:
+                    add_rows(batch)
+                    result.imported += len(batch)
+                    batch = []
+                if progress is not None:
+                    progress(min(file.buffer.tell() / size, 1.0), f"Importing tradebook... {result.imported} trades")
+                if cancelled is not None and cancelled():
+                    result.cancelled = True
+                    break
+    if batch:
+        add_rows(batch)
+        result.imported += len(batch)
+    result.open_positions = len(book.positions)
+    return result
+
+
+def parse_pairs(values, convert=str):
+    pairs = {}
+    for value in values:
+        name, _, setting = value.partition("=")
+        pairs[name.strip()] = convert(setting.strip())
+    return pairs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import a broker tradebook into the trade journal.")
+    parser.add_argument("tradebook", help="tradebook or contract-note CSV, fills in time order")
+    parser.add_argument("--journal", default=FILE_NAME, help="journal to import into (CSV or SQLite)")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="fills per batch")
+    parser.add_argument("--lot-size", action="append", default=[], metavar="SYMBOL=N",
+                        help="lot size of an underlying, over the journal's lot size table; "
+                             "without either Lots holds the quantity")
+    parser.add_argument("--map", action="append", default=[], metavar="FIELD=COLUMN",
+                        help=f"tradebook column for a field ({', '.join(COLUMN_ALIASES)})")
+    args = parser.parse_args(argv)
+    lot_sizes = dict(LotSizes(lot_sizes_path(args.journal)).table())
+    try:
+        lot_sizes.update(parse_pairs(args.lot_size, int))
+    except ValueError:
+        parser.error("--lot-size takes SYMBOL=N with N a whole number")
+    store = TradeStore(args.journal)
+    store.load()
+    existing = {canonical_key(key) for key in store.key_index}
+    result = import_tradebook(args.tradebook, store.add_many, existing,
+                              lot_sizes=lot_sizes, column_map=parse_pairs(args.map),
+                              chunk_size=args.chunk_size)
+    store.close()
+    print(result)
+
+
+if __name__ == "__main__":
+    main()
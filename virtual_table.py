@@ -0,0 +1,162 @@
+import bisect
+import tkinter as tk
+from tkinter import ttk
+
+PAGE_SIZE = 64
+WHEEL_STEP = 3
+
+
+class VirtualTable(ttk.Frame):
+    # A Treeview that only materializes a window of rows. The full sequence
+    # of row ids lives in `source`; scrolling moves the window and rewrites
+    # the values of a fixed pool of items, so the cost of scrolling does not
+    # depend on how many rows the journal holds. `page_size` is the size of
+    # the pool (visible rows plus a buffer); it grows if the widget is taller.
+    def __init__(self, master, get_row, page_size=PAGE_SIZE, **kwargs):
+        super().__init__(master)
+        self.get_row = get_row
+        self.page_size = page_size
+        self.source = []
+        self.first = 0
+        self.selected = set()
+        self._items = []
+        self._item_rids = {}
+        self._rowheight = int(ttk.Style(self).lookup("Treeview", "rowheight") or 20)
+
+        scroll_x = ttk.Scrollbar(self, orient=tk.HORIZONTAL)
+        scroll_x.pack(side=tk.TOP, fill=tk.X)
+        self.scroll_y = ttk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
+        self.tree = ttk.Treeview(self, show="headings", xscrollcommand=scroll_x.set, **kwargs)
+        self.tree.pack(fill=tk.BOTH, expand=True)
+        scroll_x.config(command=self.tree.xview)
+
+        self.tree.bind("<Configure>", lambda e: self.render())
+        self.tree.bind("<<TreeviewSelect>>", self._on_select)
+        self.tree.bind("<MouseWheel>", self._on_wheel)
+        self.tree.bind("<Button-4>", lambda e: self._scroll_by(-WHEEL_STEP))
+        self.tree.bind("<Button-5>", lambda e: self._scroll_by(WHEEL_STEP))
+        self.tree.bind("<Prior>", lambda e: self._scroll_by(-self.visible_rows()))
+        self.tree.bind("<Next>", lambda e: self._scroll_by(self.visible_rows()))
+        self.tree.bind("<Up>", lambda e: self._move_selection(-1))
+        self.tree.bind("<Down>", lambda e: self._move_selection(1))
+
+    def set_source(self, row_ids):
+        self.source = row_ids
+        self.selected.clear()
+        self.render()
+
+    def append(self, rid):
+        self.source.append(rid)
+        if len(self.source) - 1 < self.first + self.window_size():
+            self.render()
+        else:
+            self._update_scrollbar()
+
+    def extend(self, row_ids):
+        visible_before = len(self.source) < self.first + self.window_size()
+        self.source.extend(row_ids)
+        if visible_before:
+            self.render()
+        else:
+            self._update_scrollbar()
+
+    def remove(self, rid):
+        # Row ids in store order are ascending, so the position is a bisect
+        # away; fall back to a scan for sorted or filtered sources.
+        i = bisect.bisect_left(self.source, rid)
+        if i >= len(self.source) or self.source[i] != rid:
+            try:
+                i = self.source.index(rid)
+            except ValueError:
+                return
+        del self.source[i]
+        self.selected.discard(rid)
+        if i < self.first + len(self._items):
+            self.render()
+        else:
+            self._update_scrollbar()
+
+    def refresh_row(self, rid):
+        for iid in self._items:
+            if self._item_rids.get(iid) == rid:
+                self.tree.item(iid, values=self.get_row(rid))
+                return
+
+    def selection(self):
+        return list(self.selected)
+
+    def visible_rows(self):
+        # One row's worth of height is taken by the headings.
+        return max(1, self.tree.winfo_height() // self._rowheight - 1)
+
+    def window_size(self):
+        return max(self.page_size, self.visible_rows() + 1)
+
+    def yview(self, *args):
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * len(self.source)))
+        elif args[0] == "scroll":
+            step = int(args[1])
+            if args[2] == "pages":
+                step *= self.visible_rows()
+            self._scroll_by(step)
+
+    def scroll_to(self, first):
+        first = max(0, min(first, len(self.source) - self.visible_rows()))
+        if first != self.first:
+            self.first = first
+            self.render()
+
+    def _scroll_by(self, step):
+        self.scroll_to(self.first + step)
+        return "break"
+
+    def _on_wheel(self, event):
+        return self._scroll_by(-WHEEL_STEP if event.delta > 0 else WHEEL_STEP)
+
+    def _move_selection(self, step):
+        window = self.source[self.first:self.first + len(self._items)]
+        current = [i for i, rid in enumerate(window) if rid in self.selected]
+        index = self.first + current[0] + step if current else self.first
+        if 0 <= index < len(self.source):
+            self.selected = {self.source[index]}
+            if index < self.first:
+                self.first = index
+            elif index >= self.first + self.visible_rows():
+                self.first = index - self.visible_rows() + 1
+            self.render()
+        return "break"
+
+    def _on_select(self, event):
+        # render() keeps the item selection in step with `selected`, so
+        # recomputing the window's share of it here is always safe.
+        window = set(self._item_rids[iid] for iid in self._items)
+        self.selected -= window
+        self.selected.update(self._item_rids[iid] for iid in self.tree.selection())
+
+    def render(self):
+        self.first = max(0, min(self.first, len(self.source) - 1))
+        rows = self.source[self.first:self.first + self.window_size()]
+        while len(self._items) < len(rows):
+            self._items.append(self.tree.insert("", tk.END))
+        while len(self._items) > len(rows):
+            iid = self._items.pop()
+            self._item_rids.pop(iid, None)
+            self.tree.delete(iid)
+        selection = []
+        for iid, rid in zip(self._items, rows):
+            self.tree.item(iid, values=self.get_row(rid))
+            self._item_rids[iid] = rid
+            if rid in self.selected:
+                selection.append(iid)
+        self.tree.selection_set(selection)
+        self.tree.yview_moveto(0)
+        self._update_scrollbar()
+
+    def _update_scrollbar(self):
+        total = len(self.source)
+        if not total:
+            self.scroll_y.set(0, 1)
+            return
+        self.scroll_y.set(self.first / total, min(1.0, (self.first + self.visible_rows()) / total))